@@ -1,11 +1,9 @@
 import streamlit as st
-import pandas as pd
-from datetime import datetime
 import time
+from datetime import datetime
 
-from mood_analyzer import analyze_mood
-from data_manager import load_journal_entries, save_journal_entry, delete_journal_entry, update_journal_entry
-from visualization import plot_mood_history, plot_mood_distribution
+import metrics
+from mood_analyzer import analyze_mood, analysis_cache, warm_up, IncrementalAnalyzer, PREVIEW_DEBOUNCE
 
 # Set page configuration
 st.set_page_config(
@@ -14,25 +12,164 @@ st.set_page_config(
     layout="wide"
 )
 
+# Time the whole rerun for the Diagnostics panel
+rerun_start = time.perf_counter()
+
 # App title and description
 st.title("📔 MoodJournal")
 st.subheader("AI-Powered Mood Tracking Journal")
 
+# The data layer imports pandas, NumPy and pyarrow, which take a few hundred
+# milliseconds on the first run; importing it after the title lets the browser
+# show the page header meanwhile. The rest of the run needs pandas either way,
+# since every rerun draws the Analytics and Entries tabs from DataFrames
+import pandas as pd
+from data_manager import (
+    get_journal_entry, load_journal_entries, query_journal_entries, search_journal_entries, list_journal_entries,
+    get_journal_date_range, get_mood_statistics, get_journal_version, get_journal_changes, with_pending_changes,
+    submit_journal_entry, submit_journal_update, submit_journal_deletion, set_journal_user, PAGE_SIZE
+)
+import data_manager
+from trends import journal_trends, TREND_COLUMNS
+from visualization import (
+    plot_mood_history, plot_mood_distribution, plot_rolling_mood, plot_weekday_profile, plot_mood_transitions,
+    cached_figure, CHART_COLUMNS
+)
+
+# Request header naming the signed-in user, set by an authenticating reverse proxy
+# in front of the app
+USER_HEADER = "X-Forwarded-User"
+
+# Whether to trust USER_HEADER; any client reaching the app directly can send it,
+# so only turn this on when the app cannot be reached around the proxy
+TRUST_USER_HEADER = False
+
+def current_user():
+    """
+    Get the signed-in user, whose journal this session reads and writes.
+    
+    Returns:
+        str: The email of the user signed in with Streamlit's authentication, or the
+            user named by USER_HEADER when TRUST_USER_HEADER is set, in lowercase, or
+            None if nobody is signed in.
+    """
+    user = getattr(st, 'user', None)
+    if user is not None and getattr(user, 'is_logged_in', False) and user.get('email'):
+        return user.get('email').strip().lower() or None
+    if not TRUST_USER_HEADER:
+        return None
+    context = getattr(st, 'context', None)
+    headers = getattr(context, 'headers', None) or {}
+    return (headers.get(USER_HEADER) or "").strip().lower() or None
+
+# With per-user journals, every rerun reads and writes the signed-in user's journal only
+user = current_user()
+if data_manager.SHARD_DIR is not None and user is None:
+    st.warning("Please sign in to open your journal.")
+    st.stop()
+set_journal_user(user)
+
 # Initialize session state variables
-if 'entries' not in st.session_state:
-    st.session_state.entries = load_journal_entries()
 if 'current_entry_id' not in st.session_state:
     st.session_state.current_entry_id = None
 if 'edit_mode' not in st.session_state:
     st.session_state.edit_mode = False
 if 'filter_mood' not in st.session_state:
     st.session_state.filter_mood = "All"
+if 'notice' not in st.session_state:
+    st.session_state.notice = None
+if 'pending_writes' not in st.session_state:
+    st.session_state.pending_writes = []
+if 'mood_preview' not in st.session_state:
+    # Streamlit versions without fragments cannot rerun the preview on a timer, so
+    # they analyze every change straight away
+    st.session_state.mood_preview = IncrementalAnalyzer(PREVIEW_DEBOUNCE if hasattr(st, 'fragment') else 0)
+    st.session_state.preview_timer = False
+if 'page_filters' not in st.session_state:
+    # Filters the Entries tab was paged with, and the cursor of every page visited
+    st.session_state.page_filters = None
+    st.session_state.page_cursors = [None]
+
+# Show the outcome of the last save or delete, and report background writes that failed
+if st.session_state.notice:
+    st.success(st.session_state.notice)
+    st.session_state.notice = None
+for error_message, future in list(st.session_state.pending_writes):
+    if future.done():
+        st.session_state.pending_writes.remove((error_message, future))
+        if future.exception() is not None or not future.result():
+            st.error(error_message)
 
 # Function to reset the current entry
 def reset_entry():
     st.session_state.current_entry_id = None
     st.session_state.edit_mode = False
 
+# Function to show a number of days
+def days_label(days):
+    return f"{days} day" if days == 1 else f"{days} days"
+
+# Function to show the mood of the entry being written; while a newer text waits
+# to be analyzed it is drawn as a fragment, whose timer reruns just the preview
+def show_mood_preview(content):
+    preview = st.session_state.mood_preview
+    mood, mood_score, quote = preview.analyze(content)
+    if st.session_state.preview_timer and not preview.pending():
+        # The text has been analyzed; rerun the page to draw the preview without a timer
+        st.session_state.preview_timer = False
+        st.rerun()
+    
+    # Display the detected mood
+    mood_emoji = {
+        "Joyful": "😊",
+        "Peaceful": "😌",
+        "Energetic": "⚡",
+        "Creative": "🎨",
+        "Neutral": "😐",
+        "Reflective": "🤔",
+        "Anxious": "😰",
+        "Sad": "😢",
+        "Angry": "😠",
+        "Confused": "😕"
+    }
+    
+    st.markdown(f"### {mood_emoji.get(mood, '😐')} {mood}")
+    if preview.pending():
+        st.caption("Updating as you write...")
+    
+    # Display mood score
+    st.progress(
+        (mood_score + 1) / 2,  # Convert from [-1, 1] to [0, 1]
+        text=f"Mood Score: {mood_score:.2f}"
+    )
+    
+    # Display motivational quote
+    st.markdown("### Motivational Quote")
+    st.info(quote)
+    
+    # Tips based on mood
+    st.markdown("### Tips")
+    if mood == "Joyful":
+        st.info("Great mood! Consider journaling about what made you happy today to remember it in the future.")
+    elif mood == "Peaceful":
+        st.info("Your peaceful state is valuable. Consider practicing mindfulness to maintain this balance.")
+    elif mood == "Energetic":
+        st.info("Channel your energy into productive activities or creative pursuits.")
+    elif mood == "Creative":
+        st.info("Your creative energy is flowing! Consider starting a new project or exploring new ideas.")
+    elif mood == "Reflective":
+        st.info("Your reflective state is perfect for personal growth. Consider setting new goals or intentions.")
+    elif mood == "Anxious":
+        st.info("Practice deep breathing exercises or try the 5-4-3-2-1 grounding technique to reduce anxiety.")
+    elif mood == "Sad":
+        st.info("Take a deep breath. Consider doing something you enjoy or reach out to a friend.")
+    elif mood == "Angry":
+        st.info("Try taking a short walk or practice deep breathing to calm down.")
+    elif mood == "Confused":
+        st.info("It's okay to feel uncertain. Take time to reflect and break down your thoughts into smaller pieces.")
+    else:
+        st.info("Keep journaling regularly to track changes in your mood over time.")
+
 # Main layout with tabs
 tab1, tab2, tab3 = st.tabs(["✏️ Journal", "📊 Analytics", "📝 Entries"])
 
@@ -43,43 +180,40 @@ with tab1:
     with col1:
         st.header("Today's Entry" if not st.session_state.edit_mode else "Edit Entry")
         
+        # Look up the entry being edited
+        current_entry = None
+        if st.session_state.edit_mode and st.session_state.current_entry_id:
+            current_entry = get_journal_entry(st.session_state.current_entry_id)
+        
         # Date selection and input fields
         date = st.date_input(
             "Date",
-            value=datetime.now().date() if not st.session_state.edit_mode else 
-                  pd.to_datetime(st.session_state.entries[
-                      st.session_state.entries['id'] == st.session_state.current_entry_id
-                  ]['date'].values[0]).date() if st.session_state.current_entry_id else datetime.now().date()
+            value=pd.to_datetime(current_entry['date']).date() if current_entry else datetime.now().date()
         )
         
         title = st.text_input(
             "Title",
-            value="" if not st.session_state.edit_mode else 
-                  st.session_state.entries[
-                      st.session_state.entries['id'] == st.session_state.current_entry_id
-                  ]['title'].values[0] if st.session_state.current_entry_id else ""
+            value=current_entry['title'] if current_entry else ""
         )
         
         content = st.text_area(
             "Journal Entry",
             height=300,
-            value="" if not st.session_state.edit_mode else 
-                  st.session_state.entries[
-                      st.session_state.entries['id'] == st.session_state.current_entry_id
-                  ]['content'].values[0] if st.session_state.current_entry_id else ""
+            value=current_entry['content'] if current_entry else ""
         )
         
         if st.button("Save Entry", key="save_button"):
             if not title or not content:
                 st.error("Please provide both a title and content for your journal entry.")
             else:
-                # Analyze the mood of the entry
+                # Analyze the mood of the entry; the preview only estimates it, so the
+                # saved mood comes from the same analysis as rescoring and the service
                 mood, mood_score, quote = analyze_mood(content)
 
                 
-                # Save the entry
+                # Queue the entry; it is stored in the background and shown straight away
                 if st.session_state.edit_mode and st.session_state.current_entry_id:
-                    update_journal_entry(
+                    submitted = submit_journal_update(
                         st.session_state.current_entry_id,
                         date.strftime("%Y-%m-%d"),
                         title,
@@ -87,24 +221,28 @@ with tab1:
                         mood,
                         mood_score
                     )
-                    st.success(f"Journal entry updated successfully! Detected mood: {mood}")
+                    notice = f"Journal entry updated successfully! Detected mood: {mood}"
+                    error_message = f"Failed to update journal entry \"{title}\"."
                 else:
-                    save_journal_entry(
+                    submitted = submit_journal_entry(
                         date.strftime("%Y-%m-%d"),
                         title,
                         content,
                         mood,
                         mood_score
                     )
-                    st.success(f"Journal entry saved successfully! Detected mood: {mood}")
+                    notice = f"Journal entry saved successfully! Detected mood: {mood}"
+                    error_message = f"Failed to save journal entry \"{title}\"."
                 
-                # Reload the journal entries
-                st.session_state.entries = load_journal_entries()
-                
-                # Reset edit mode and current entry
-                reset_entry()
-                time.sleep(2)
-                st.rerun()
+                if submitted is None:
+                    st.error(error_message)
+                else:
+                    st.session_state.pending_writes.append((error_message, submitted[1]))
+                    st.session_state.notice = notice
+                    
+                    # Reset edit mode and current entry
+                    reset_entry()
+                    st.rerun()
         
         if st.session_state.edit_mode:
             if st.button("Cancel Editing", key="cancel_button"):
@@ -114,56 +252,15 @@ with tab1:
     with col2:
         st.header("Your Mood")
         if content:
-            mood, mood_score, quote = analyze_mood(content)
-            
-            # Display the detected mood
-            mood_emoji = {
-                "Joyful": "😊",
-                "Peaceful": "😌",
-                "Energetic": "⚡",
-                "Creative": "🎨",
-                "Neutral": "😐",
-                "Reflective": "🤔",
-                "Anxious": "😰",
-                "Sad": "😢",
-                "Angry": "😠",
-                "Confused": "😕"
-            }
-            
-            st.markdown(f"### {mood_emoji.get(mood, '😐')} {mood}")
-            
-            # Display mood score
-            st.progress(
-                (mood_score + 1) / 2,  # Convert from [-1, 1] to [0, 1]
-                text=f"Mood Score: {mood_score:.2f}"
-            )
-            
-            # Display motivational quote
-            st.markdown("### Motivational Quote")
-            st.info(quote)
-            
-            # Tips based on mood
-            st.markdown("### Tips")
-            if mood == "Joyful":
-                st.info("Great mood! Consider journaling about what made you happy today to remember it in the future.")
-            elif mood == "Peaceful":
-                st.info("Your peaceful state is valuable. Consider practicing mindfulness to maintain this balance.")
-            elif mood == "Energetic":
-                st.info("Channel your energy into productive activities or creative pursuits.")
-            elif mood == "Creative":
-                st.info("Your creative energy is flowing! Consider starting a new project or exploring new ideas.")
-            elif mood == "Reflective":
-                st.info("Your reflective state is perfect for personal growth. Consider setting new goals or intentions.")
-            elif mood == "Anxious":
-                st.info("Practice deep breathing exercises or try the 5-4-3-2-1 grounding technique to reduce anxiety.")
-            elif mood == "Sad":
-                st.info("Take a deep breath. Consider doing something you enjoy or reach out to a friend.")
-            elif mood == "Angry":
-                st.info("Try taking a short walk or practice deep breathing to calm down.")
-            elif mood == "Confused":
-                st.info("It's okay to feel uncertain. Take time to reflect and break down your thoughts into smaller pieces.")
+            # Text that is still changing is analyzed once it stays unchanged for
+            # PREVIEW_DEBOUNCE seconds, rerunning just the preview until then; only
+            # the sentences changed since the last analysis are analyzed again
+            st.session_state.mood_preview.analyze(content)
+            st.session_state.preview_timer = st.session_state.mood_preview.pending()
+            if st.session_state.preview_timer:
+                st.fragment(show_mood_preview, run_every=PREVIEW_DEBOUNCE)(content)
             else:
-                st.info("Keep journaling regularly to track changes in your mood over time.")
+                show_mood_preview(content)
         else:
             st.info("Start writing your entry to see mood analysis.")
 
@@ -172,7 +269,8 @@ with tab2:
     st.header("Mood Analytics")
     
     # Check if there are entries to analyze
-    if st.session_state.entries.empty:
+    date_range = get_journal_date_range()
+    if date_range is None:
         st.info("No journal entries yet. Start writing to see your mood analytics!")
     else:
         # Date range filter
@@ -180,19 +278,18 @@ with tab2:
         with col1:
             start_date = st.date_input(
                 "Start Date",
-                value=pd.to_datetime(st.session_state.entries['date'].min()).date()
+                value=pd.to_datetime(date_range[0]).date()
             )
         with col2:
             end_date = st.date_input(
                 "End Date",
-                value=pd.to_datetime(st.session_state.entries['date'].max()).date()
+                value=pd.to_datetime(date_range[1]).date()
             )
         
-        # Filter data by date range
-        filtered_entries = st.session_state.entries[
-            (pd.to_datetime(st.session_state.entries['date']) >= pd.to_datetime(start_date)) &
-            (pd.to_datetime(st.session_state.entries['date']) <= pd.to_datetime(end_date))
-        ]
+        # Filter data by date range. The version is read first, so charts cached for
+        # it were built from data at least that new
+        journal_version = get_journal_version()
+        filtered_entries = query_journal_entries(start_date=start_date, end_date=end_date, columns=CHART_COLUMNS)
         
         if filtered_entries.empty:
             st.warning("No entries found in the selected date range.")
@@ -202,29 +299,83 @@ with tab2:
             
             with col1:
                 st.subheader("Mood History Over Time")
-                fig1 = plot_mood_history(filtered_entries)
-                st.plotly_chart(fig1, use_container_width=True)
+                fig1 = cached_figure(
+                    ('history', user, journal_version, start_date, end_date),
+                    lambda: plot_mood_history(filtered_entries)
+                )
+                st.plotly_chart(fig1, width="stretch")
             
             with col2:
                 st.subheader("Mood Distribution")
-                fig2 = plot_mood_distribution(filtered_entries)
-                st.plotly_chart(fig2, use_container_width=True)
+                fig2 = cached_figure(
+                    ('distribution', user, journal_version, start_date, end_date),
+                    lambda: plot_mood_distribution(filtered_entries)
+                )
+                st.plotly_chart(fig2, width="stretch")
             
             # Display some statistics
             st.subheader("Mood Statistics")
+            stats = get_mood_statistics(start_date=start_date, end_date=end_date)
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.metric("Most Common Mood", stats['most_common_mood'] if stats else "-")
+            
+            with col2:
+                avg_score = stats['average_score'] if stats else None
+                st.metric("Average Mood Score", f"{avg_score:.2f}" if avg_score is not None else "-")
+            
+            with col3:
+                st.metric("Total Entries", stats['entries'] if stats else len(filtered_entries))
+            
+            # Trends are computed over the whole journal, so the rolling averages of
+            # the first days include the entries before them; after new entries are
+            # saved, only the newest pages of the journal are read again
+            st.subheader("Mood Trends")
+            trends = journal_trends(
+                user, journal_version, lambda: load_journal_entries(columns=TREND_COLUMNS),
+                get_journal_changes, lambda after: list_journal_entries(after=after)
+            )
+            fig3 = cached_figure(
+                ('rolling', user, journal_version, start_date, end_date),
+                lambda: plot_rolling_mood(trends, start_date, end_date)
+            )
+            st.plotly_chart(fig3, width="stretch")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.subheader("Mood by Day of the Week")
+                fig4 = cached_figure(
+                    ('weekdays', user, journal_version, start_date, end_date),
+                    lambda: plot_weekday_profile(trends, start_date, end_date)
+                )
+                st.plotly_chart(fig4, width="stretch")
+            
+            with col2:
+                st.subheader("Mood Transitions")
+                fig5 = cached_figure(
+                    ('transitions', user, journal_version, start_date, end_date),
+                    lambda: plot_mood_transitions(trends, start_date, end_date)
+                )
+                st.plotly_chart(fig5, width="stretch")
+            
+            streaks = trends.streaks(start_date, end_date)
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                most_common_mood = filtered_entries['mood'].mode()[0]
-                st.metric("Most Common Mood", most_common_mood)
+                longest = streaks['longest_positive']
+                st.metric("Longest Positive Streak", days_label(longest[0]) if longest else "-",
+                          help=f"{longest[1]:%Y-%m-%d} to {longest[2]:%Y-%m-%d}" if longest else None)
             
             with col2:
-                avg_score = filtered_entries['mood_score'].mean()
-                st.metric("Average Mood Score", f"{avg_score:.2f}")
+                longest = streaks['longest_negative']
+                st.metric("Longest Negative Streak", days_label(longest[0]) if longest else "-",
+                          help=f"{longest[1]:%Y-%m-%d} to {longest[2]:%Y-%m-%d}" if longest else None)
             
             with col3:
-                entry_count = len(filtered_entries)
-                st.metric("Total Entries", entry_count)
+                sign, days = streaks['current']
+                st.metric("Current Streak", f"{sign.capitalize()}, {days_label(days)}" if sign else "-")
 
 # Tab 3: Entry Management
 with tab3:
@@ -243,31 +394,46 @@ with tab3:
     with col2:
         search_query = st.text_input("Search in titles and content", key="search_query")
     
-    # Apply filters
-    filtered_entries = st.session_state.entries.copy()
-    
-    if mood_filter != "All":
-        filtered_entries = filtered_entries[filtered_entries['mood'] == mood_filter]
+    # Start from the first page whenever the filters change
+    if st.session_state.page_filters != (mood_filter, search_query):
+        st.session_state.page_filters = (mood_filter, search_query)
+        st.session_state.page_cursors = [None]
+    page_number = len(st.session_state.page_cursors) - 1
     
+    # Apply filters, loading only the current page
+    mood = None if mood_filter == "All" else mood_filter
     if search_query:
-        filtered_entries = filtered_entries[
-            filtered_entries['title'].str.contains(search_query, case=False) |
-            filtered_entries['content'].str.contains(search_query, case=False)
-        ]
+        filtered_entries = search_journal_entries(
+            search_query, mood=mood, limit=PAGE_SIZE + 1, offset=page_number * PAGE_SIZE
+        )
+        next_cursor = page_number + 1 if len(filtered_entries) > PAGE_SIZE else None
+        filtered_entries = filtered_entries.iloc[:PAGE_SIZE]
+    else:
+        filtered_entries, next_cursor = list_journal_entries(
+            mood=mood, after=st.session_state.page_cursors[-1]
+        )
+    
+    # Include saves, edits and deletes still being written in the background;
+    # new entries are the newest, so they go on the first page
+    filtered_entries = with_pending_changes(
+        filtered_entries, mood=mood, include_new=not search_query and page_number == 0
+    )
     
     # Display entries
     if filtered_entries.empty:
         st.info("No journal entries found with the current filters.")
     else:
-        # Sort entries by date (newest first)
-        filtered_entries = filtered_entries.sort_values(by='date', ascending=False)
+        # Keep entries newest first after adding queued ones, and search results in ranked order
+        if not search_query:
+            filtered_entries = filtered_entries.sort_values(by='date', ascending=False, kind='stable')
         
         for _, entry in filtered_entries.iterrows():
-            with st.expander(f"{entry['date']} - {entry['title']} ({entry['mood']})"):
+            entry_date = entry['date'].strftime("%Y-%m-%d") if pd.notna(entry['date']) else ""
+            with st.expander(f"{entry_date} - {entry['title']} ({entry['mood']})"):
                 col1, col2 = st.columns([4, 1])
                 
                 with col1:
-                    st.markdown(f"**Date:** {entry['date']}")
+                    st.markdown(f"**Date:** {entry_date}")
                     st.markdown(f"**Mood:** {entry['mood']} (Score: {entry['mood_score']:.2f})")
                     st.write(entry['content'])
                 
@@ -280,14 +446,74 @@ with tab3:
                     
                     # Delete button
                     if st.button("Delete", key=f"delete_{entry['id']}"):
-                        if delete_journal_entry(entry['id']):
-                            st.success("Entry deleted successfully!")
-                            # Reload the journal entries
-                            st.session_state.entries = load_journal_entries()
-                            time.sleep(1)
+                        future = submit_journal_deletion(entry['id'])
+                        if future is not None:
+                            st.session_state.pending_writes.append(("Failed to delete entry.", future))
+                            st.session_state.notice = "Entry deleted successfully!"
                             st.rerun()
                         else:
                             st.error("Failed to delete entry.")
+    
+    # Page through the entries
+    if page_number > 0 or next_cursor is not None:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if page_number > 0 and st.button("← Newer", key="newer_page"):
+                st.session_state.page_cursors.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"Page {page_number + 1}")
+        with col3:
+            if next_cursor is not None and st.button("Older →", key="older_page"):
+                st.session_state.page_cursors.append(next_cursor)
+                st.rerun()
+
+# Diagnostics: where this process spends its time, and the metrics exports
+with st.expander("🔧 Diagnostics"):
+    operations = metrics.snapshot()
+    if not operations:
+        st.info("Nothing has been recorded yet.")
+    else:
+        diagnostics = pd.DataFrame.from_dict(operations, orient='index').rename_axis('operation')
+        diagnostics['mean_ms'] = diagnostics['seconds'] / diagnostics['count'] * 1000
+        diagnostics['max_ms'] = diagnostics['max_seconds'] * 1000
+        diagnostics['last_ms'] = diagnostics['last_seconds'] * 1000
+        st.dataframe(
+            diagnostics.sort_values(by='seconds', ascending=False)[
+                ['count', 'seconds', 'mean_ms', 'max_ms', 'last_ms', 'rows', 'bytes']
+            ],
+            width="stretch"
+        )
+        st.caption("The last_ms of app.rerun is from the previous rerun.")
+    
+    cache = analysis_cache.stats()
+    st.caption(
+        f"Mood analysis cache: {cache['hits']} hits, {cache['misses']} misses, "
+        f"{cache['size']} of {cache['maxsize']} results kept."
+    )
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button(
+            "Export Prometheus metrics", metrics.to_prometheus(), file_name="journal_metrics.prom",
+            mime="text/plain", key="export_prometheus"
+        )
+    with col2:
+        st.download_button(
+            "Export JSON metrics", metrics.to_json(), file_name="journal_metrics.json",
+            mime="application/json", key="export_json"
+        )
+    with col3:
+        if st.button("Reset metrics", key="reset_metrics"):
+            metrics.reset()
+            st.rerun()
+
+metrics.record("app.rerun", time.perf_counter() - rerun_start)
+if metrics.EXPORT_FILE:
+    metrics.export(metrics.EXPORT_FILE)
 
 st.markdown("---")
 st.markdown("MoodJournal - Track your emotional wellbeing with AI-powered insights.")
+
+# Load the mood analyzer in the background now that the page is rendered
+warm_up()
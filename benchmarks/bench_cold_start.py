@@ -0,0 +1,88 @@
+"""
+Measure how long the app's modules take to import and the first page to render.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--runs N]
+
+Every measurement runs in a fresh Python process, so nothing is imported yet.
+The first analysis is timed both straight after import, when it loads NLTK and
+the lexicon itself, and after mood_analyzer.warm_up has done that in the
+background. The first render uses Streamlit's AppTest on a copy of the sample
+journal.
+"""
+import argparse
+import importlib.util
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_journal import ROOT
+
+# Python code run in a fresh process for each measurement; each prints milliseconds
+MEASUREMENTS = {
+    "import mood_analyzer": "import mood_analyzer",
+    "import data_manager": "import data_manager",
+    "import visualization": "import visualization",
+    "first analyze_mood": (
+        "import mood_analyzer\n"
+        "start = time.perf_counter()\n"
+        "mood_analyzer.analyze_mood('A calm and happy day.')"
+    ),
+    "first analyze_mood after warm_up": (
+        "import mood_analyzer\n"
+        "mood_analyzer.warm_up().join()\n"
+        "start = time.perf_counter()\n"
+        "mood_analyzer.analyze_mood('A calm and happy day.')"
+    ),
+    "first render": (
+        "from streamlit.testing.v1 import AppTest\n"
+        "start = time.perf_counter()\n"
+        f"AppTest.from_file({os.path.join(ROOT, 'app.py')!r}, default_timeout=120).run()"
+    ),
+}
+
+def measure(code, directory):
+    """Run code in a fresh process in directory and return the milliseconds it took."""
+    script = (
+        "import sys, time\n"
+        f"sys.path.insert(0, {ROOT!r})\n"
+        "start = time.perf_counter()\n"
+        f"{code}\n"
+        "print((time.perf_counter() - start) * 1000)\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=directory, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="processes per measurement; the median counts")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ["mood_keywords.json", "journal_entries.csv", "vader_lexicon.txt"]:
+            if os.path.exists(os.path.join(ROOT, name)):
+                shutil.copy(os.path.join(ROOT, name), directory)
+    
+        print(f"{'':36}{'median ms':>12}")
+        for name, code in MEASUREMENTS.items():
+            if name == "first render" and importlib.util.find_spec("streamlit") is None:
+                print(f"{name:36}{'skipped, streamlit is not installed':>12}")
+                continue
+            times = []
+            for _ in range(args.runs):
+                # Start from the sample journal every time, as a fresh install would
+                for stale in os.listdir(directory):
+                    if stale.startswith("journal_entries") and stale != "journal_entries.csv":
+                        os.remove(os.path.join(directory, stale))
+                times.append(measure(code, directory))
+            print(f"{name:36}{statistics.median(times):>12.1f}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
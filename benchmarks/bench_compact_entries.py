@@ -0,0 +1,88 @@
+"""
+Compare the memory use and filter speed of raw and compact journal DataFrames.
+
+Usage:
+    python benchmarks/bench_compact_entries.py [--entries N]
+
+A synthetic journal is written to a temporary CSV file and loaded twice: with
+object-dtype text columns, as pd.read_csv returns them before pandas 3, and
+converted with storage.compact_entries.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import MOODS, compact_entries
+
+WORDS = ["today", "felt", "really", "work", "friends", "walk", "tired", "happy", "calm",
+         "worried", "dinner", "morning", "rain", "project", "family", "sleep"]
+
+def make_journal(path, count, seed=0):
+    """Write count synthetic entries to a CSV file."""
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    pd.DataFrame({
+        'id': [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(count)],
+        'date': [(start + timedelta(days=rng.randrange(3650))).isoformat() for _ in range(count)],
+        'title': [" ".join(rng.choices(WORDS, k=3)) for _ in range(count)],
+        'content': [" ".join(rng.choices(WORDS, k=60)) for _ in range(count)],
+        'mood': [rng.choice(MOODS) for _ in range(count)],
+        'mood_score': [round(rng.uniform(-1, 1), 4) for _ in range(count)],
+    }).to_csv(path, index=False)
+
+def best_time(func, repeat=5):
+    """Return the fastest of several runs of func, in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000, help="number of synthetic entries")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.csv")
+        make_journal(path, args.entries)
+        raw = pd.read_csv(path, dtype={column: object for column in ['id', 'date', 'title', 'content', 'mood']})
+        compact = compact_entries(raw)
+    
+    start, end = pd.Timestamp("2018-01-01"), pd.Timestamp("2018-12-31")
+    
+    # The date filter on the raw frame parses the dates every time, as the app used to
+    def filter_raw_dates():
+        dates = pd.to_datetime(raw['date'])
+        return raw[(dates >= start) & (dates <= end)]
+    
+    results = [
+        ("memory (MB)",
+         raw.memory_usage(deep=True).sum() / 2**20, compact.memory_usage(deep=True).sum() / 2**20),
+        ("date range filter (ms)",
+         best_time(filter_raw_dates), best_time(lambda: compact[(compact['date'] >= start) & (compact['date'] <= end)])),
+        ("mood filter (ms)",
+         best_time(lambda: raw[raw['mood'] == "Sad"]), best_time(lambda: compact[compact['mood'] == "Sad"])),
+    ]
+    
+    print(f"{args.entries} entries")
+    print(f"{'':24}{'raw':>10}{'compact':>10}")
+    for name, raw_value, compact_value in results:
+        print(f"{name:24}{raw_value:>10.1f}{compact_value:>10.1f}")
+    print("\nPer-column memory (MB):")
+    for column in raw.columns:
+        print(f"{column:24}{raw[column].memory_usage(deep=True) / 2**20:>10.1f}"
+              f"{compact[column].memory_usage(deep=True) / 2**20:>10.1f}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
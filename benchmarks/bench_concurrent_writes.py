@@ -0,0 +1,80 @@
+"""
+Measure concurrent save throughput with and without group commit.
+
+Usage:
+    python benchmarks/bench_concurrent_writes.py [--threads N] [--saves N] [--entries N]
+
+Every thread saves entries at the same time, as Streamlit sessions do. With group
+commit, saves queued while another one is being written are stored together;
+without it, each save takes the write lock and stores its change on its own.
+Both runs check that every save made it into the journal.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import CachedBackend, CsvBackend, LogBackend, SQLiteBackend
+from bench_compact_entries import make_journal
+
+def make_backend(mode, directory, csv_file):
+    """Create a backend of the given storage mode in a directory."""
+    if mode == "csv":
+        return CsvBackend(csv_file)
+    if mode == "log":
+        return LogBackend(csv_file, os.path.join(directory, "journal.log"), 1000)
+    return SQLiteBackend(os.path.join(directory, "journal.db"), import_file=csv_file)
+
+def run(backend, save, threads, saves):
+    """Save entries from several threads at once and return the elapsed seconds."""
+    def worker():
+        for _ in range(saves):
+            save({
+                'id': str(uuid.uuid4()), 'date': '2025-01-01', 'title': 'Benchmark',
+                'content': 'Saved concurrently.', 'mood': 'Neutral', 'mood_score': 0.0
+            })
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8, help="number of saving threads")
+    parser.add_argument("--saves", type=int, default=25, help="saves per thread")
+    parser.add_argument("--entries", type=int, default=10000, help="entries in the journal beforehand")
+    args = parser.parse_args()
+    total = args.threads * args.saves
+    
+    print(f"{args.threads} threads x {args.saves} saves, {args.entries} entries beforehand")
+    print(f"{'':8}{'one at a time':>18}{'group commit':>18}")
+    for mode in ["csv", "log", "sqlite"]:
+        rates = []
+        for grouped in [False, True]:
+            with tempfile.TemporaryDirectory() as tmp:
+                csv_file = os.path.join(tmp, "journal.csv")
+                make_journal(csv_file, args.entries)
+                backend = make_backend(mode, tmp, csv_file)
+                if grouped:
+                    save = CachedBackend(backend).create
+                else:
+                    def save(entry, backend=backend):
+                        with backend.write_lock():
+                            backend.create(entry)
+                elapsed = run(backend, save, args.threads, args.saves)
+                stored = len(backend.load(['id']))
+                if stored != args.entries + total:
+                    print(f"{mode}: lost {args.entries + total - stored} saves")
+                rates.append(total / elapsed)
+        print(f"{mode:8}{rates[0]:>12.0f} /sec{rates[1]:>12.0f} /sec")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
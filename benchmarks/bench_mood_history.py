@@ -0,0 +1,50 @@
+"""
+Measure how long the mood history chart takes to build and how large it gets.
+
+Usage:
+    python benchmarks/bench_mood_history.py [--entries N ...]
+
+Compares drawing every entry with the default, which aggregates per day, week
+or month above visualization.MAX_CHART_POINTS entries, and with a cached figure.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import CsvBackend
+from visualization import CHART_COLUMNS, cached_figure, plot_mood_history
+from bench_compact_entries import make_journal
+
+def measure(build):
+    """Build a figure and return the build time in milliseconds and its JSON size in MB."""
+    start = time.perf_counter()
+    fig = build()
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000, len(fig.to_json()) / 2**20
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="journal sizes to measure")
+    args = parser.parse_args()
+    
+    print(f"{'entries':>10}{'every entry (ms)':>18}{'(MB)':>8}{'default (ms)':>14}{'(MB)':>8}{'cached (ms)':>13}")
+    for count in args.entries:
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_file = os.path.join(tmp, "journal.csv")
+            make_journal(csv_file, count)
+            entries = CsvBackend(csv_file).load(CHART_COLUMNS)
+        
+        full_ms, full_mb = measure(lambda: plot_mood_history(entries, max_points=len(entries)))
+        default_ms, default_mb = measure(lambda: plot_mood_history(entries))
+        key = ('bench', count)
+        cached_figure(key, lambda: plot_mood_history(entries))
+        cached_ms, _ = measure(lambda: cached_figure(key, lambda: plot_mood_history(entries)))
+        print(f"{count:>10}{full_ms:>18.0f}{full_mb:>8.1f}{default_ms:>14.0f}{default_mb:>8.2f}{cached_ms:>13.3f}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
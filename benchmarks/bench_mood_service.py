@@ -0,0 +1,87 @@
+"""
+Load-test the HTTP mood-analysis service, with and without micro-batching.
+
+Usage:
+    python benchmarks/bench_mood_service.py [--clients N] [--requests N] [--workers N]
+
+Starts mood_service on a free localhost port for each setting, then sends
+requests of one synthetic entry each from --clients concurrent connections and
+prints the p50 and p99 latency seen by the clients and the throughput. A batch
+size of 1 sends every request to the workers on its own, as a service without
+micro-batching would.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mood_service
+from synthetic_journal import ROOT, generate_entries
+
+async def client(host, port, texts, latencies):
+    """Send one request per text over a keep-alive connection, recording each latency."""
+    reader, writer = await asyncio.open_connection(host, port)
+    for text in texts:
+        body = json.dumps({'text': text}).encode('utf-8')
+        start = time.perf_counter()
+        writer.write(b"POST /analyze HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                     b"Content-Length: %d\r\n\r\n" % len(body) + body)
+        await writer.drain()
+        await reader.readline()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+async def run(texts, args, batch_size):
+    """Serve with a batch size, load it from the clients and return the client-side results."""
+    address = asyncio.get_running_loop().create_future()
+    server = asyncio.create_task(mood_service.serve("127.0.0.1", 0, args.workers, batch_size,
+                                                    args.batch_wait / 1000, ready=address.set_result))
+    host, port = await address
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[client(host, port, texts[i::args.clients], latencies) for i in range(args.clients)])
+    elapsed = time.perf_counter() - start
+    server.cancel()
+    try:
+        await server
+    except asyncio.CancelledError:
+        pass
+    latencies.sort()
+    return (mood_service.ServiceStats.percentile(latencies, 0.50) * 1000,
+            mood_service.ServiceStats.percentile(latencies, 0.99) * 1000,
+            len(latencies) / elapsed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=5000, help="requests sent in all")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes of the service")
+    parser.add_argument("--words", type=int, default=60, help="words per synthetic entry")
+    parser.add_argument("--batch-wait", type=float, default=mood_service.BATCH_WAIT * 1000,
+                        help="milliseconds the service waits for more requests")
+    args = parser.parse_args()
+    
+    # The analyzer reads its keywords relative to the working directory
+    os.chdir(ROOT)
+    texts = generate_entries(args.requests, words=args.words)['content'].tolist()
+    print(f"{args.requests} requests from {args.clients} clients, {args.workers} workers")
+    print(f"{'batch size':>12}{'p50 ms':>10}{'p99 ms':>10}{'requests/s':>12}")
+    for batch_size in [1, mood_service.MAX_BATCH_SIZE]:
+        p50, p99, throughput = asyncio.run(run(texts, args, batch_size))
+        print(f"{batch_size:>12}{p50:>10.1f}{p99:>10.1f}{throughput:>12.0f}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""
+Compare cold-start analytics reads from the CSV and Arrow storage backends.
+
+Usage:
+    python benchmarks/bench_storage_formats.py [--entries N]
+
+The Analytics tab only needs dates, titles, moods and scores. The CSV backend
+has to parse the whole file to get them, the Arrow backend maps only the file
+without contents.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import ArrowBackend, CsvBackend
+from visualization import CHART_COLUMNS
+from bench_compact_entries import make_journal
+
+def timed(func, repeat=3):
+    """Return the result of func and the fastest of several runs, in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, min(times) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000, help="number of synthetic entries")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, "journal.csv")
+        make_journal(csv_file, args.entries)
+        csv_backend = CsvBackend(csv_file)
+        arrow_backend = ArrowBackend(os.path.join(tmp, "journal.arrow"),
+                                     os.path.join(tmp, "journal.content.arrow"),
+                                     import_file=csv_file)
+        
+        results = [
+            ("csv, all columns", *timed(csv_backend.load)),
+            ("csv, chart columns", *timed(lambda: csv_backend.load(CHART_COLUMNS))),
+            ("arrow, all columns", *timed(arrow_backend.load)),
+            ("arrow, chart columns", *timed(lambda: arrow_backend.load(CHART_COLUMNS))),
+        ]
+        
+        print(f"{args.entries} entries")
+        print(f"{'':24}{'load (ms)':>12}{'memory (MB)':>14}")
+        for name, entries, elapsed in results:
+            print(f"{name:24}{elapsed:>12.1f}{entries.memory_usage(deep=True).sum() / 2**20:>14.1f}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Measure how long the mood trends of the Analytics tab take to compute and chart.
+
+Usage:
+    python benchmarks/bench_trends.py [--years N ...] [--per-day N]
+
+Times, for journals of --per-day entries a day over each number of years:
+building the trends from every entry and computing the rolling averages,
+streaks, weekday profile and mood transitions; getting them again through
+trends.journal_trends while the journal version is unchanged, and after one new
+entry, for which only the newest page of entries is read and the new entry is
+added; and building the three trend charts.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from data_manager import PAGE_SIZE
+from storage import compact_entries
+from trends import ROLLING_WINDOWS, TREND_COLUMNS, MoodTrends, journal_trends
+from visualization import plot_mood_transitions, plot_rolling_mood, plot_weekday_profile
+from synthetic_journal import generate_entries
+
+def best_time(func, repeat):
+    """Run func repeat times and return the fastest run in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+def compute_all(entries):
+    """Build the trends of entries and compute every statistic the Analytics tab shows."""
+    trends = MoodTrends()
+    trends.add(entries)
+    for window in ROLLING_WINDOWS:
+        trends.rolling_mean(window)
+    trends.daily_scores()
+    trends.streaks()
+    trends.weekday_profile()
+    trends.transitions()
+    return trends
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 10, 50], help="journal lengths to measure")
+    parser.add_argument("--per-day", type=int, default=1, help="entries per day")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each benchmark; the fastest counts")
+    args = parser.parse_args()
+    
+    print(f"{'years':>6}{'entries':>9}{'rebuild ms':>12}{'cached ms':>11}{'append ms':>11}{'charts ms':>11}")
+    for years in args.years:
+        days = years * 365
+        entries = generate_entries(days * args.per_day, words=5, days=days)
+        entries = compact_entries(entries[TREND_COLUMNS].sort_values('date', kind='stable'))
+        new_entry = compact_entries(pd.DataFrame([{
+            'id': 'new', 'date': entries['date'].max(), 'mood': 'Joyful', 'mood_score': 0.5
+        }]))
+        appended = pd.concat([entries, new_entry], ignore_index=True)
+        # The first page of the journal after the new entry, as list_journal_entries
+        # returns it, newest first
+        first_page = appended.sort_values(['date', 'id'], ascending=False).head(PAGE_SIZE)
+        def list_page(after):
+            return first_page, (first_page['date'].iloc[-1], first_page['id'].iloc[-1])
+        
+        rebuild_ms = best_time(lambda: compute_all(entries), args.repeat)
+        
+        key = ('bench', years)
+        journal_trends(key, 1, lambda: entries)
+        cached_ms = best_time(lambda: journal_trends(key, 1, lambda: entries), args.repeat)
+        
+        def append():
+            journal_trends(key, 1, lambda: entries, lambda: (0, 0), list_page)
+            start = time.perf_counter()
+            journal_trends(key, 2, lambda: appended, lambda: (1, 0), list_page)
+            return time.perf_counter() - start
+        append_ms = min(append() for _ in range(args.repeat)) * 1000
+        
+        trends = compute_all(entries)
+        charts_ms = best_time(lambda: [plot(trends) for plot in [
+            plot_rolling_mood, plot_weekday_profile, plot_mood_transitions
+        ]], args.repeat)
+        print(f"{years:>6}{len(entries):>9}{rebuild_ms:>12.1f}{cached_ms:>11.3f}{append_ms:>11.1f}{charts_ms:>11.1f}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
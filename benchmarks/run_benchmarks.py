@@ -0,0 +1,222 @@
+"""
+Benchmark suite for the analyzer, storage and chart hot paths.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes N ...] [--modes MODE ...]
+        [--output results.json] [--baseline baseline.json] [--threshold 0.2]
+
+Every run generates the same synthetic journals (see synthetic_journal.py) and
+times, for each journal size:
+    analyze_mood on one entry at a time, with and without the result cache, and
+        analyze_moods over the whole journal (up to --analyze-limit entries)
+    load_journal_entries, cold and from the shared cache, and save, update and
+        delete through data_manager, in each storage mode
+    plot_mood_history and plot_mood_distribution, building the mood trends
+        (trends.MoodTrends), and the trend charts drawn from them
+
+Results are printed and, with --output, written as JSON. With --baseline, each
+result is compared with the same benchmark in an earlier output file, and the
+exit status is 1 if any is slower by more than --threshold (0.2 = 20%).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import data_manager
+import mood_analyzer
+from mood_analyzer import analysis_cache, analyze_mood, analyze_moods
+from storage import compact_entries
+from trends import TREND_COLUMNS, MoodTrends
+from visualization import (
+    CHART_COLUMNS, plot_mood_distribution, plot_mood_history, plot_mood_transitions, plot_rolling_mood,
+    plot_weekday_profile
+)
+from synthetic_journal import ROOT, generate_entries, parse_mood_mix
+
+def best_time(func, repeat):
+    """Return the fastest of several runs of func, in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+def mean_time(funcs):
+    """Run each function once and return the mean run time, in milliseconds."""
+    start = time.perf_counter()
+    for func in funcs:
+        func()
+    return (time.perf_counter() - start) * 1000 / len(funcs)
+
+def use_storage(directory, mode):
+    """Point data_manager at journal files in a directory, with a fresh backend."""
+    data_manager.STORAGE_MODE = mode
+    data_manager.DATA_FILE = os.path.join(directory, "journal_entries.csv")
+    data_manager.LOG_FILE = os.path.join(directory, "journal_entries.log")
+    data_manager.DB_FILE = os.path.join(directory, "journal_entries.db")
+    data_manager.ARROW_FILE = os.path.join(directory, "journal_entries.arrow")
+    data_manager.ARROW_CONTENT_FILE = os.path.join(directory, "journal_entries.content.arrow")
+    data_manager.QUEUE_FILE = os.path.join(directory, "journal_entries.pending")
+    data_manager.reset_backends()
+
+def bench_analyzer(entries, args):
+    """Time the mood analyzer on the journal's contents."""
+    texts = entries['content'].tolist()
+    sample = texts[:min(len(texts), 1000)]
+    analyze_mood(sample[0])
+    
+    def uncached():
+        analysis_cache.clear()
+        for text in sample:
+            analyze_mood(text)
+    def cached():
+        for text in sample:
+            analyze_mood(text)
+    
+    bulk = texts[:args.analyze_limit]
+    return [
+        ("analyze_mood.per_entry", best_time(uncached, args.repeat) / len(sample)),
+        ("analyze_mood.cached", best_time(cached, args.repeat) / len(sample)),
+        ("analyze_moods.bulk", best_time(lambda: analyze_moods(bulk), 1)),
+    ]
+
+def bench_storage(entries, mode, args):
+    """Time loading and writing the journal through data_manager in a storage mode."""
+    with tempfile.TemporaryDirectory() as tmp:
+        use_storage(tmp, mode)
+        entries.to_csv(data_manager.DATA_FILE, index=False)
+        data_manager.get_backend()
+        
+        def cold_load():
+            data_manager.reset_backends()
+            data_manager.load_journal_entries()
+        results = [
+            ("load_journal_entries.cold", best_time(cold_load, args.repeat)),
+            ("load_journal_entries.warm", best_time(data_manager.load_journal_entries, args.repeat)),
+        ]
+        
+        rng = random.Random(0)
+        ids = rng.sample(entries['id'].tolist(), min(len(entries) // 2, args.ops) * 2)
+        results.append(("save_journal_entry", mean_time([
+            lambda: data_manager.save_journal_entry("2025-01-01", "Benchmark", "A new entry.", "Neutral", 0.0)
+            for _ in range(args.ops)
+        ])))
+        results.append(("update_journal_entry", mean_time([
+            lambda entry_id=entry_id: data_manager.update_journal_entry(
+                entry_id, "2025-01-02", "Benchmark", "An edited entry.", "Joyful", 0.5)
+            for entry_id in ids[:args.ops]
+        ])))
+        results.append(("delete_journal_entry", mean_time([
+            lambda entry_id=entry_id: data_manager.delete_journal_entry(entry_id)
+            for entry_id in ids[args.ops:]
+        ])))
+        data_manager.reset_backends()
+    return results
+
+def bench_charts(entries, args):
+    """Time building the analytics charts and mood trends for the whole journal."""
+    chart_entries = compact_entries(entries[CHART_COLUMNS])
+    trend_entries = compact_entries(entries[TREND_COLUMNS])
+    trends = MoodTrends()
+    trends.add(trend_entries)
+    return [
+        ("plot_mood_history", best_time(lambda: plot_mood_history(chart_entries), args.repeat)),
+        ("plot_mood_distribution", best_time(lambda: plot_mood_distribution(chart_entries), args.repeat)),
+        ("trends.MoodTrends.add", best_time(lambda: MoodTrends().add(trend_entries), args.repeat)),
+        ("plot_rolling_mood", best_time(lambda: plot_rolling_mood(trends), args.repeat)),
+        ("plot_weekday_profile", best_time(lambda: plot_weekday_profile(trends), args.repeat)),
+        ("plot_mood_transitions", best_time(lambda: plot_mood_transitions(trends), args.repeat)),
+    ]
+
+def compare(results, baseline, threshold):
+    """
+    Print each result next to its baseline.
+    
+    Returns:
+        int: The number of results slower than the baseline by more than threshold.
+    """
+    before = {(r['name'], r['entries'], r['mode']): r['ms'] for r in baseline['results']}
+    regressions = 0
+    print(f"\n{'benchmark':32}{'entries':>9}{'mode':>8}{'baseline ms':>14}{'ms':>12}{'change':>9}")
+    for r in results:
+        old = before.get((r['name'], r['entries'], r['mode']))
+        if old is None:
+            continue
+        change = r['ms'] / old - 1 if old else 0.0
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{r['name']:32}{r['entries']:>9}{r['mode'] or '':>8}{old:>14.3f}{r['ms']:>12.3f}{change:>+9.0%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000],
+                        help="journal sizes to benchmark")
+    parser.add_argument("--modes", nargs="+", default=["sqlite"],
+                        choices=["sqlite", "csv", "log", "arrow"], help="storage modes to benchmark")
+    parser.add_argument("--words", type=int, default=60, help="words per synthetic entry")
+    parser.add_argument("--mood-mix", default="", help='mood weights, like "Sad=3,Joyful=1" (default: even)')
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic journal")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each read benchmark; the fastest counts")
+    parser.add_argument("--ops", type=int, default=5, help="saves, updates and deletes timed per size")
+    parser.add_argument("--analyze-limit", type=int, default=100000,
+                        help="most entries analyzed by the bulk analyzer benchmark")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown over the baseline reported as a regression")
+    args = parser.parse_args()
+    
+    # The analyzer reads its keywords relative to the working directory
+    mood_analyzer.MOOD_DATA_FILE = os.path.join(ROOT, "mood_keywords.json")
+    
+    results = []
+    def record(rows, count, mode=None):
+        for name, ms in rows:
+            results.append({'name': name, 'entries': count, 'mode': mode, 'ms': ms})
+            print(f"{name:32}{count:>9}{mode or '':>8}{ms:>12.3f} ms", flush=True)
+    
+    for count in args.sizes:
+        entries = generate_entries(count, words=args.words, mood_mix=parse_mood_mix(args.mood_mix),
+                                   seed=args.seed)
+        record(bench_analyzer(entries, args), count)
+        for mode in args.modes:
+            record(bench_storage(entries, mode, args), count, mode)
+        record(bench_charts(entries, args), count)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'settings': {key: value for key, value in vars(args).items()
+                             if key not in ('output', 'baseline', 'threshold')},
+                'machine': {
+                    'python': platform.python_version(),
+                    'pandas': pd.__version__,
+                    'platform': platform.platform(),
+                    'processor': platform.processor() or platform.machine(),
+                },
+                'results': results,
+            }, f, indent=2)
+        print(f"\nWrote {len(results)} results to {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{regressions} benchmark(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
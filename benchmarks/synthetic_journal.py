@@ -0,0 +1,87 @@
+"""
+Generate reproducible synthetic journals for the benchmarks.
+
+Each entry's content mixes filler words with keywords of its mood, taken from
+mood_keywords.json, so the analyzer has realistic work to do. The same seed and
+settings always give the same journal.
+"""
+import json
+import os
+import random
+import uuid
+from datetime import date, timedelta
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FILLER_WORDS = ["today", "i", "the", "a", "and", "was", "with", "after", "work", "friends",
+                "walk", "morning", "evening", "rain", "project", "family", "dinner", "sleep",
+                "felt", "really", "then", "not", "very", "but", "we", "my"]
+
+def parse_mood_mix(text):
+    """
+    Parse a mood mix like "Sad=3,Joyful=1" into relative weights.
+    
+    Args:
+        text (str): Comma-separated mood=weight pairs; empty for an even mix.
+        
+    Returns:
+        dict: Weight of each mood listed.
+    """
+    mix = {}
+    for part in filter(None, (part.strip() for part in text.split(','))):
+        mood, _, weight = part.partition('=')
+        mix[mood.strip()] = float(weight) if weight else 1.0
+    return mix
+
+def generate_entries(count, words=60, mood_mix=None, seed=0, days=3650):
+    """
+    Generate synthetic journal entries.
+    
+    Args:
+        count (int): The number of entries.
+        words (int): The number of words in each entry's content.
+        mood_mix (dict, optional): Relative weight of each mood; an even mix over
+            every mood in mood_keywords.json when not given.
+        seed (int): Seed of the random generator.
+        days (int): Entries are dated over this many days from 2015-01-01.
+        
+    Returns:
+        pandas.DataFrame: The entries, with the columns of the journal.
+    """
+    with open(os.path.join(ROOT, "mood_keywords.json")) as f:
+        keywords = {mood: data['keywords'] for mood, data in json.load(f)['moods'].items()}
+    mood_mix = mood_mix or {mood: 1.0 for mood in keywords}
+    moods = list(mood_mix)
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    
+    entry_moods = rng.choices(moods, weights=[mood_mix[mood] for mood in moods], k=count)
+    contents = []
+    for mood in entry_moods:
+        # About one word in eight is a keyword of the entry's mood
+        text = rng.choices(FILLER_WORDS, k=words)
+        for i in rng.sample(range(words), max(1, words // 8)):
+            text[i] = rng.choice(keywords[mood])
+        contents.append(" ".join(text).capitalize() + ".")
+    
+    return pd.DataFrame({
+        'id': [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(count)],
+        'date': [(start + timedelta(days=rng.randrange(days))).isoformat() for _ in range(count)],
+        'title': [" ".join(rng.choices(FILLER_WORDS, k=3)).title() for _ in range(count)],
+        'content': contents,
+        'mood': entry_moods,
+        'mood_score': [round(rng.uniform(-1, 1), 4) for _ in range(count)],
+    })
+
+def write_journal(path, count, **options):
+    """
+    Write a synthetic journal to a CSV file.
+    
+    Args:
+        path (str): The CSV file to write.
+        count (int): The number of entries.
+        **options: Passed on to generate_entries.
+    """
+    generate_entries(count, **options).to_csv(path, index=False)
\ No newline at end of file
@@ -1,32 +1,444 @@
 import pandas as pd
+import hashlib
 import os
+import re
+import threading
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 
+from storage import (
+    COLUMNS, ArrowBackend, CachedBackend, CsvBackend, LogBackend, SQLiteBackend, WriteQueue, YearlyBackend,
+    apply_change, format_date
+)
+import metrics
+
 # Path to the journal entries CSV file
 DATA_FILE = "journal_entries.csv"
 
-def load_journal_entries():
+# Path to the append-only change log used by the "log" storage mode
+LOG_FILE = "journal_entries.log"
+
+# Path to the SQLite database used by the "sqlite" storage mode
+DB_FILE = "journal_entries.db"
+
+# Paths to the Arrow files used by the "arrow" storage mode: one for every column
+# but content, one for the contents
+ARROW_FILE = "journal_entries.arrow"
+ARROW_CONTENT_FILE = "journal_entries.content.arrow"
+
+# How entries are stored:
+#   "sqlite" keeps them in DB_FILE, indexed by id, date and mood; an existing
+#            DATA_FILE is imported when the database is first created
+#   "csv"    rewrites DATA_FILE on every change
+#   "log"    appends each change to LOG_FILE and only rewrites DATA_FILE when compacting
+#   "arrow"  keeps them in memory-mapped Arrow files, so analytics can read dates,
+#            moods and scores without loading contents (requires pyarrow)
+STORAGE_MODE = "sqlite"
+
+# Number of logged changes after which the log is compacted into DATA_FILE
+COMPACT_THRESHOLD = 1000
+
+# Path to the queue of saves, edits and deletes waiting to be stored in the background
+QUEUE_FILE = "journal_entries.pending"
+
+# Number of entries per page of the Entries tab
+PAGE_SIZE = 20
+
+# Directory of per-user journals for multi-tenant deployments: each user's files,
+# named like the paths above, are kept in SHARD_DIR/<user>/, so loading, saving and
+# searching only touch that user's files. None keeps one journal at the paths above.
+SHARD_DIR = None
+
+# Whether each user's journal is also split by year, into SHARD_DIR/<user>/<year>/,
+# so reads bounded by dates and pages of recent entries only open the years they
+# need (only used with SHARD_DIR)
+SHARD_BY_YEAR = False
+
+# Most journals kept open at once; the least recently used one is closed, and
+# reloaded from its files when its user comes back
+MAX_OPEN_JOURNALS = 64
+
+# User names used as directory names as they are; any other name is hashed
+USER_DIRECTORY_NAME = re.compile(r'[a-z0-9][a-z0-9_.@-]{0,63}')
+
+# Open journals for the current settings, least recently used first: the backend
+# and write queue of each journal directory (None without SHARD_DIR), shared by
+# every session and closed when the settings change; guarded by _journals_lock
+_journals = OrderedDict()
+_journals_settings = None
+_journals_lock = threading.RLock()
+
+# The user whose journal the current thread reads and writes
+_journal_user = threading.local()
+
+def set_journal_user(user):
+    """
+    Choose whose journal the current thread reads and writes when SHARD_DIR is set.
+    
+    Streamlit runs each session's script in its own thread, so the app sets the
+    user at the start of every rerun.
+    
+    Args:
+        user (str): The user's name or email, or None for no user.
+    """
+    _journal_user.user = user
+
+def get_journal_user():
     """
-    Load all journal entries from the CSV file.
+    Get the user whose journal the current thread reads and writes.
     
     Returns:
-        pandas.DataFrame: A DataFrame containing all journal entries.
+        str: The user set with set_journal_user, or None if there is none.
+    """
+    return getattr(_journal_user, 'user', None)
+
+def journal_directory():
+    """
+    Get the directory of the current user's journal.
+    
+    Returns:
+        str: SHARD_DIR/<user>, where names that are not safe as directory names are
+            replaced by a hash, or None when SHARD_DIR is not set.
+    """
+    if SHARD_DIR is None:
+        return None
+    user = get_journal_user()
+    if not user:
+        raise ValueError("No journal user is set; call set_journal_user first")
+    name = user if USER_DIRECTORY_NAME.fullmatch(user) else "u-" + hashlib.sha256(user.encode('utf-8')).hexdigest()[:32]
+    return os.path.join(SHARD_DIR, name)
+
+def open_backend(directory=None):
     """
-    if os.path.exists(DATA_FILE):
-        try:
-            entries = pd.read_csv(DATA_FILE)
-            return entries
-        except Exception as e:
-            print(f"Error loading journal entries: {e}")
-            return pd.DataFrame(columns=['id', 'date', 'title', 'content', 'mood', 'mood_score'])
+    Open the storage backend for the configured STORAGE_MODE.
+    
+    The backend is wrapped in a storage.CachedBackend, so every session in the
+    process shares one loaded copy of the journal.
+    
+    Args:
+        directory (str, optional): Keep the files in this directory, under the names
+            of the configured paths, instead of at those paths.
+    
+    Returns:
+        storage.CachedBackend: The backend storing the journal entries.
+    """
+    def path(file):
+        return file if directory is None else os.path.join(directory, os.path.basename(file))
+    
+    if STORAGE_MODE == "sqlite":
+        backend = SQLiteBackend(path(DB_FILE), import_file=path(DATA_FILE))
+    elif STORAGE_MODE == "log":
+        backend = LogBackend(path(DATA_FILE), path(LOG_FILE), COMPACT_THRESHOLD)
+    elif STORAGE_MODE == "csv":
+        backend = CsvBackend(path(DATA_FILE))
+    elif STORAGE_MODE == "arrow":
+        backend = ArrowBackend(path(ARROW_FILE), path(ARROW_CONTENT_FILE), import_file=path(DATA_FILE))
     else:
-        # Create a new DataFrame if the file doesn't exist
-        return pd.DataFrame(columns=['id', 'date', 'title', 'content', 'mood', 'mood_score'])
+        raise ValueError(f"Unknown storage mode: {STORAGE_MODE}")
+    return CachedBackend(backend)
+
+def open_journal():
+    """
+    Get the open journal of the current user, opening it if needed.
+    
+    Returns:
+        dict: The journal's directory, backend and write queue (None until
+            get_write_queue creates it).
+    """
+    global _journals_settings
+    settings = (STORAGE_MODE, DATA_FILE, LOG_FILE, DB_FILE, ARROW_FILE, ARROW_CONTENT_FILE, COMPACT_THRESHOLD,
+                QUEUE_FILE, SHARD_DIR, SHARD_BY_YEAR)
+    directory = journal_directory()
+    closed = []
+    with _journals_lock:
+        if settings != _journals_settings:
+            closed = list(_journals.values())
+            _journals.clear()
+            _journals_settings = settings
+        journal = _journals.get(directory)
+        if journal is None:
+            if directory is None:
+                backend = open_backend()
+            else:
+                os.makedirs(directory, exist_ok=True)
+                backend = YearlyBackend(directory, open_backend) if SHARD_BY_YEAR else open_backend(directory)
+            journal = _journals[directory] = {'directory': directory, 'backend': backend, 'queue': None}
+            while len(_journals) > MAX_OPEN_JOURNALS:
+                closed.append(_journals.popitem(last=False)[1])
+        else:
+            _journals.move_to_end(directory)
+    # Finish the closed journals' queued changes, outside the lock so other users
+    # are not kept waiting
+    for old in closed:
+        if old['queue'] is not None:
+            old['queue'].close()
+    return journal
+
+def get_backend():
+    """
+    Get the storage backend of the current user's journal.
+    
+    Returns:
+        storage.JournalBackend: The backend storing the journal entries: a
+            storage.CachedBackend, or a storage.YearlyBackend of them with
+            SHARD_BY_YEAR.
+    """
+    return open_journal()['backend']
+
+def get_write_queue():
+    """
+    Get the queue storing changes in the background for the current user's journal.
+    
+    Returns:
+        storage.WriteQueue: The queue, shared by every session in the process.
+    """
+    journal = open_journal()
+    with _journals_lock:
+        if journal['queue'] is None:
+            queue_file = QUEUE_FILE
+            if journal['directory'] is not None:
+                queue_file = os.path.join(journal['directory'], os.path.basename(QUEUE_FILE))
+            journal['queue'] = WriteQueue(journal['backend'], queue_file)
+        return journal['queue']
+
+def reset_backends():
+    """
+    Close every open journal, finishing its queued changes first.
+    
+    The next call opens the journal again from its files, so this is mostly
+    useful for benchmarks and tests that change the files behind the app's back.
+    """
+    global _journals_settings
+    with _journals_lock:
+        closed = list(_journals.values())
+        _journals.clear()
+        _journals_settings = None
+    for journal in closed:
+        if journal['queue'] is not None:
+            journal['queue'].close()
+
+def entry_read_size(entry, args, kwargs):
+    """
+    Measure a looked-up entry for the metrics.
+    
+    Returns:
+        tuple: (rows, nbytes), with the size of the entry's text fields.
+    """
+    if entry is None:
+        return 0, 0
+    return 1, metrics.text_size(entry.values())
+
+def entry_write_size(result, args, kwargs):
+    """
+    Measure a save, edit or delete for the metrics.
+    
+    Returns:
+        tuple: (rows, nbytes), with one row and the size of the text arguments if
+            the change was stored or queued, and none otherwise.
+    """
+    if result is None or result is False:
+        return 0, 0
+    return 1, metrics.text_size(list(args) + list(kwargs.values()))
+
+@metrics.instrument("data_manager.load_journal_entries")
+def load_journal_entries(columns=None):
+    """
+    Load all journal entries.
+    
+    The entries come from a cache shared by the whole process, which is only
+    reloaded after the journal changes; treat the returned values as read-only.
+    
+    Args:
+        columns (list, optional): Only load these columns, which columnar storage
+            modes read without touching the others.
+        
+    Returns:
+        pandas.DataFrame: A DataFrame containing all journal entries.
+    """
+    try:
+        return get_backend().load(columns)
+    except Exception as e:
+        print(f"Error loading journal entries: {e}")
+        return pd.DataFrame(columns=columns or COLUMNS)
+
+@metrics.instrument("data_manager.get_journal_version")
+def get_journal_version():
+    """
+    Get a token that changes whenever the journal changes.
+    
+    Returns:
+        A comparable value, or None if the storage mode cannot tell or it could not
+        be read.
+    """
+    try:
+        return get_backend().version()
+    except Exception as e:
+        print(f"Error reading journal version: {e}")
+        return None
+
+@metrics.instrument("data_manager.get_journal_changes")
+def get_journal_changes():
+    """
+    Count the changes made to the journal since this process opened it.
+    
+    Returns:
+        tuple: (creates, edits), where edits counts updates, deletes and changes
+            made by other processes; None if the storage mode cannot tell or they
+            could not be read.
+    """
+    try:
+        return get_backend().change_counts()
+    except Exception as e:
+        print(f"Error reading journal changes: {e}")
+        return None
 
+@metrics.instrument("data_manager.get_journal_entry", measure=entry_read_size)
+def get_journal_entry(entry_id):
+    """
+    Look up a single journal entry.
+    
+    Args:
+        entry_id (str): The ID of the entry.
+        
+    Returns:
+        dict: The entry's fields, or None if it does not exist.
+    """
+    try:
+        return get_backend().get(entry_id)
+    except Exception as e:
+        print(f"Error loading journal entry: {e}")
+        return None
+
+@metrics.instrument("data_manager.query_journal_entries")
+def query_journal_entries(start_date=None, end_date=None, mood=None, columns=None):
+    """
+    Load the journal entries within a date range and with a given mood.
+    
+    Args:
+        start_date (optional): Earliest date to include, as a date or YYYY-MM-DD string.
+        end_date (optional): Latest date to include, as a date or YYYY-MM-DD string.
+        mood (str, optional): Only include entries with this mood.
+        columns (list, optional): Only load these columns.
+        
+    Returns:
+        pandas.DataFrame: A DataFrame containing the matching journal entries.
+    """
+    try:
+        return get_backend().query(start_date, end_date, mood, columns)
+    except Exception as e:
+        print(f"Error loading journal entries: {e}")
+        return pd.DataFrame(columns=columns or COLUMNS)
+
+@metrics.instrument("data_manager.search_journal_entries")
+def search_journal_entries(text, mood=None, limit=None, offset=0):
+    """
+    Search journal titles and contents.
+    
+    Every word of the query must appear, matching the start of words in the entry,
+    case-insensitively.
+    
+    Args:
+        text (str): The search query.
+        mood (str, optional): Only include entries with this mood.
+        limit (int, optional): The most entries to return.
+        offset (int): The number of best matches to skip, to page through results.
+        
+    Returns:
+        pandas.DataFrame: A DataFrame containing the matching entries, best matches first.
+    """
+    try:
+        return get_backend().search(text, mood, limit, offset)
+    except Exception as e:
+        print(f"Error searching journal entries: {e}")
+        return pd.DataFrame(columns=COLUMNS)
+
+@metrics.instrument("data_manager.list_journal_entries")
+def list_journal_entries(mood=None, after=None, limit=PAGE_SIZE):
+    """
+    Load one page of journal entries, newest first.
+    
+    Only the entries of the page are read when the storage mode has indexes.
+    
+    Args:
+        mood (str, optional): Only include entries with this mood.
+        after (tuple, optional): The cursor returned with the previous page; the
+            first page is loaded without one.
+        limit (int): The number of entries per page.
+        
+    Returns:
+        tuple: (entries, next_cursor) with a DataFrame of the page's entries and the
+            cursor to pass for the next page, or None on the last page.
+    """
+    try:
+        # One entry more than the page tells whether another page follows
+        entries = get_backend().page(mood, after, limit + 1)
+    except Exception as e:
+        print(f"Error loading journal entries: {e}")
+        return pd.DataFrame(columns=COLUMNS), None
+    if len(entries) <= limit:
+        return entries, None
+    entries = entries.iloc[:limit]
+    last = entries.iloc[-1]
+    return entries, (format_date(last['date']) if pd.notna(last['date']) else None, last['id'])
+
+@metrics.instrument("data_manager.get_journal_date_range")
+def get_journal_date_range():
+    """
+    Get the dates of the oldest and newest journal entries.
+    
+    Returns:
+        tuple: (first_date, last_date) as YYYY-MM-DD strings, or None if there are no entries.
+    """
+    try:
+        return get_backend().date_range()
+    except Exception as e:
+        print(f"Error loading journal entries: {e}")
+        return None
+
+@metrics.instrument("data_manager.get_mood_statistics")
+def get_mood_statistics(start_date=None, end_date=None):
+    """
+    Summarize the moods of the journal entries in a date range.
+    
+    Args:
+        start_date (optional): Earliest date to include, as a date or YYYY-MM-DD string.
+        end_date (optional): Latest date to include, as a date or YYYY-MM-DD string.
+        
+    Returns:
+        dict: entries (the number of entries), mood_counts (entries per mood),
+            most_common_mood and average_score, or None if loading failed.
+    """
+    try:
+        return get_backend().mood_stats(start_date, end_date)
+    except Exception as e:
+        print(f"Error loading mood statistics: {e}")
+        return None
+
+@metrics.instrument("data_manager.get_mood_rollup")
+def get_mood_rollup(period, start_date=None, end_date=None):
+    """
+    Get the number of entries and mood score totals per mood for each day, week or month.
+    
+    Args:
+        period (str): "day", "week" (starting on Monday) or "month".
+        start_date (optional): Only include periods starting on or after this date.
+        end_date (optional): Only include periods starting on or before this date.
+        
+    Returns:
+        pandas.DataFrame: Columns bucket (first day of the period), mood, entries,
+            score_count and score_sum.
+    """
+    try:
+        return get_backend().mood_rollup(period, start_date, end_date)
+    except Exception as e:
+        print(f"Error loading mood rollup: {e}")
+        return pd.DataFrame(columns=['bucket', 'mood', 'entries', 'score_count', 'score_sum'])
+
+@metrics.instrument("data_manager.save_journal_entry", measure=entry_write_size)
 def save_journal_entry(date, title, content, mood, mood_score):
     """
-    Save a new journal entry to the CSV file.
+    Save a new journal entry.
     
     Args:
         date (str): The date of the entry in YYYY-MM-DD format.
@@ -39,30 +451,20 @@ def save_journal_entry(date, title, content, mood, mood_score):
         bool: True if the entry was saved successfully, False otherwise.
     """
     try:
-        # Load existing entries
-        entries = load_journal_entries()
-        
-        # Create a new entry
-        new_entry = pd.DataFrame({
-            'id': [str(uuid.uuid4())],
-            'date': [date],
-            'title': [title],
-            'content': [content],
-            'mood': [mood],
-            'mood_score': [mood_score]
+        get_backend().create({
+            'id': str(uuid.uuid4()),
+            'date': date,
+            'title': title,
+            'content': content,
+            'mood': mood,
+            'mood_score': mood_score
         })
-        
-        # Append the new entry
-        entries = pd.concat([entries, new_entry], ignore_index=True)
-        
-        # Save the updated entries to the CSV file
-        entries.to_csv(DATA_FILE, index=False)
-        
         return True
     except Exception as e:
         print(f"Error saving journal entry: {e}")
         return False
 
+@metrics.instrument("data_manager.update_journal_entry", measure=entry_write_size)
 def update_journal_entry(entry_id, date, title, content, mood, mood_score):
     """
     Update an existing journal entry.
@@ -79,31 +481,22 @@ def update_journal_entry(entry_id, date, title, content, mood, mood_score):
         bool: True if the entry was updated successfully, False otherwise.
     """
     try:
-        # Load existing entries
-        entries = load_journal_entries()
-        
-        # Find the entry with the given ID
-        entry_index = entries[entries['id'] == entry_id].index
-        
-        if len(entry_index) > 0:
-            # Update the entry
-            entries.loc[entry_index, 'date'] = date
-            entries.loc[entry_index, 'title'] = title
-            entries.loc[entry_index, 'content'] = content
-            entries.loc[entry_index, 'mood'] = mood
-            entries.loc[entry_index, 'mood_score'] = mood_score
-            
-            # Save the updated entries to the CSV file
-            entries.to_csv(DATA_FILE, index=False)
-            
-            return True
-        else:
+        updated = get_backend().update({
+            'id': entry_id,
+            'date': date,
+            'title': title,
+            'content': content,
+            'mood': mood,
+            'mood_score': mood_score
+        })
+        if not updated:
             print(f"Entry with ID {entry_id} not found.")
-            return False
+        return updated
     except Exception as e:
         print(f"Error updating journal entry: {e}")
         return False
 
+@metrics.instrument("data_manager.delete_journal_entry", measure=entry_write_size)
 def delete_journal_entry(entry_id):
     """
     Delete a journal entry.
@@ -115,21 +508,219 @@ def delete_journal_entry(entry_id):
         bool: True if the entry was deleted successfully, False otherwise.
     """
     try:
-        # Load existing entries
-        entries = load_journal_entries()
-        
-        # Check if the entry exists
-        if entry_id not in entries['id'].values:
+        deleted = get_backend().delete(entry_id)
+        if not deleted:
             print(f"Entry with ID {entry_id} not found.")
-            return False
+        return deleted
+    except Exception as e:
+        print(f"Error deleting journal entry: {e}")
+        return False
+
+@metrics.instrument("data_manager.submit_journal_entry", measure=entry_write_size)
+def submit_journal_entry(date, title, content, mood, mood_score):
+    """
+    Queue a new journal entry to be saved in the background.
+    
+    The entry is recorded in QUEUE_FILE before returning, so it is saved even if
+    the app stops before the background write runs.
+    
+    Args:
+        date (str): The date of the entry in YYYY-MM-DD format.
+        title (str): The title of the entry.
+        content (str): The content of the entry.
+        mood (str): The mood analyzed from the entry.
+        mood_score (float): The mood score from the sentiment analysis.
         
-        # Remove the entry
-        entries = entries[entries['id'] != entry_id]
+    Returns:
+        tuple: (entry, future) with the queued entry and a concurrent.futures.Future
+            resolving to True once it is saved, or None if it could not be queued.
+    """
+    entry = {
+        'id': str(uuid.uuid4()),
+        'date': date,
+        'title': title,
+        'content': content,
+        'mood': mood,
+        'mood_score': mood_score
+    }
+    try:
+        return entry, get_write_queue().submit('create', entry)
+    except Exception as e:
+        print(f"Error queueing journal entry: {e}")
+        return None
+
+@metrics.instrument("data_manager.submit_journal_update", measure=entry_write_size)
+def submit_journal_update(entry_id, date, title, content, mood, mood_score):
+    """
+    Queue an update of an existing journal entry, stored in the background.
+    
+    Args:
+        entry_id (str): The ID of the entry to update.
+        date (str): The updated date of the entry.
+        title (str): The updated title of the entry.
+        content (str): The updated content of the entry.
+        mood (str): The updated mood analyzed from the entry.
+        mood_score (float): The updated mood score.
         
-        # Save the updated entries to the CSV file
-        entries.to_csv(DATA_FILE, index=False)
+    Returns:
+        tuple: (entry, future) with the updated entry and a concurrent.futures.Future
+            resolving to True once it is stored, or False if the entry was not
+            found; None if the update could not be queued.
+    """
+    entry = {
+        'id': entry_id,
+        'date': date,
+        'title': title,
+        'content': content,
+        'mood': mood,
+        'mood_score': mood_score
+    }
+    try:
+        return entry, get_write_queue().submit('update', entry)
+    except Exception as e:
+        print(f"Error queueing journal entry update: {e}")
+        return None
+
+@metrics.instrument("data_manager.submit_journal_deletion", measure=entry_write_size)
+def submit_journal_deletion(entry_id):
+    """
+    Queue the deletion of a journal entry, carried out in the background.
+    
+    Args:
+        entry_id (str): The ID of the entry to delete.
         
+    Returns:
+        concurrent.futures.Future: Resolves to True once the entry is deleted, or
+            False if it was not found; None if the deletion could not be queued.
+    """
+    try:
+        return get_write_queue().submit('delete', entry_id)
+    except Exception as e:
+        print(f"Error queueing journal entry deletion: {e}")
+        return None
+
+@metrics.instrument("data_manager.with_pending_changes")
+def with_pending_changes(entries, mood=None, include_new=True):
+    """
+    Show the queued changes that are not stored yet in loaded journal entries.
+    
+    Lets the app display a save, edit or delete straight away, while it is still
+    waiting in the write queue.
+    
+    Args:
+        entries (pandas.DataFrame): Entries as returned by query_journal_entries.
+        mood (str, optional): The mood the entries were filtered by, if any.
+        include_new (bool): Whether to add queued new entries.
+        
+    Returns:
+        pandas.DataFrame: The entries with the queued changes applied.
+    """
+    try:
+        for op, arg in get_write_queue().pending_changes():
+            if op == 'create' and (not include_new or (entries['id'] == arg['id']).any()):
+                # A create can be stored between loading the entries and reading the
+                # queue; it is then in the entries already
+                continue
+            entries, _ = apply_change(entries, op, arg)
+        if mood is not None:
+            entries = entries[entries['mood'] == mood]
+        return entries
+    except Exception as e:
+        print(f"Error applying queued changes: {e}")
+        return entries
+
+@metrics.instrument("data_manager.compact_journal")
+def compact_journal():
+    """
+    Fold the change log into the CSV file when using the "log" storage mode.
+    
+    Returns:
+        bool: True if the journal was compacted successfully, False otherwise.
+    """
+    try:
+        backend = get_backend()
+        for cached in (backend.shards() if isinstance(backend, YearlyBackend) else [backend]):
+            if isinstance(cached.backend, LogBackend):
+                with cached.lock:
+                    cached.backend.compact()
         return True
     except Exception as e:
-        print(f"Error deleting journal entry: {e}")
-        return False
\ No newline at end of file
+        print(f"Error compacting journal: {e}")
+        return False
+
+@metrics.instrument("data_manager.import_journal_csv", measure=lambda count, args, kwargs: (count, None))
+def import_journal_csv(csv_file=DATA_FILE):
+    """
+    Import journal entries from a CSV file into the SQLite database.
+    
+    Entries whose id is already in the database are skipped, so importing the same
+    file twice is harmless. With SHARD_DIR, the entries go to the current user's
+    database; journals split by year are not supported.
+    
+    Args:
+        csv_file (str): Path to a CSV file of journal entries.
+        
+    Returns:
+        int: The number of entries imported.
+    """
+    directory = journal_directory()
+    if directory is None:
+        return SQLiteBackend(DB_FILE).import_csv(csv_file)
+    if SHARD_BY_YEAR:
+        raise ValueError("Cannot import into a journal split by year; use replace_journal_entries")
+    os.makedirs(directory, exist_ok=True)
+    return SQLiteBackend(os.path.join(directory, os.path.basename(DB_FILE))).import_csv(csv_file)
+
+def iter_journal_entries(chunksize):
+    """
+    Load journal entries in chunks.
+    
+    Args:
+        chunksize (int): The number of entries per chunk.
+        
+    Yields:
+        pandas.DataFrame: Consecutive chunks of journal entries, in storage order.
+    """
+    yield from get_backend().iter_chunks(chunksize)
+
+@metrics.instrument("data_manager.replace_journal_entries", measure=lambda count, args, kwargs: (count, None))
+def replace_journal_entries(chunks):
+    """
+    Replace all journal entries with the given chunks.
+    
+    The new entries only become visible once every chunk has been written.
+    
+    Args:
+        chunks (iterable): DataFrames of journal entries, in the order to store them.
+        
+    Returns:
+        int: The number of entries written.
+    """
+    return get_backend().replace(chunks)
+
+@metrics.instrument("data_manager.import_journal_entries", measure=lambda count, args, kwargs: (count, None))
+def import_journal_entries(chunks):
+    """
+    Add journal entries in chunks, skipping ids that are already stored.
+    
+    Entries whose id appeared in an earlier chunk are skipped too. Only the chunk
+    being written is held in memory, plus the stored ids in the file-based modes.
+    
+    Args:
+        chunks (iterable): DataFrames of journal entries with every column in COLUMNS.
+        
+    Returns:
+        int: The number of entries added.
+    """
+    return get_backend().import_entries(chunks)
+
+if __name__ == "__main__":
+    import sys
+    
+    # python data_manager.py import [entries.csv]
+    if len(sys.argv) >= 2 and sys.argv[1] == "import":
+        csv_file = sys.argv[2] if len(sys.argv) > 2 else DATA_FILE
+        count = import_journal_csv(csv_file)
+        print(f"Imported {count} journal entries from {csv_file} into {DB_FILE}")
+    else:
+        print("Usage: python data_manager.py import [entries.csv]")
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""
+Import and export journal entries as CSV or JSON Lines files of any size.
+
+Usage:
+    python journal_io.py import FILE [--analyze] [--format csv|jsonl] [--chunksize N]
+    python journal_io.py export FILE [--start YYYY-MM-DD] [--end YYYY-MM-DD] [--mood MOOD]
+        [--format csv|jsonl] [--chunksize N]
+
+Files are read and written a chunk of entries at a time, so memory use does not
+grow with the file; importing into the csv, log and arrow storage modes also
+keeps the ids already in the journal in memory. Progress is printed after every
+chunk.
+
+Imported entries need a content, and a date in YYYY-MM-DD format; without
+--analyze they also need one of the analyzer's moods, and a mood_score between
+-1 and 1 if they have one. Invalid entries are skipped and counted. Entries
+whose id is already in the journal, or earlier in the file, are skipped too, and
+entries without an id get a new one. With --analyze, the mood and mood_score of
+every entry come from the mood analyzer instead of the file.
+"""
+import argparse
+import json
+import time
+import uuid
+from collections import Counter
+
+import pandas as pd
+
+import mood_analyzer
+from data_manager import import_journal_entries, iter_journal_entries
+from storage import COLUMNS, MOODS, atomic_file, compact_entries, format_date, storable_entries
+
+# Number of entries read or written at a time
+DEFAULT_CHUNKSIZE = 10000
+
+# File extensions read and written as JSON Lines; any other file is CSV
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+
+def detect_format(path, file_format=None):
+    """Get the format of a file: file_format if given, else "jsonl" or "csv" by its extension."""
+    if file_format is not None:
+        return file_format
+    return 'jsonl' if path.lower().endswith(JSONL_EXTENSIONS) else 'csv'
+
+def read_chunks(path, file_format, chunksize):
+    """
+    Read a file of journal entries in chunks.
+    
+    Args:
+        path (str): The CSV or JSON Lines file.
+        file_format (str): "csv" or "jsonl".
+        chunksize (int): The number of entries per chunk.
+    
+    Yields:
+        pandas.DataFrame: Consecutive chunks of the file's rows, with the values
+            as written (no type conversion).
+    """
+    if file_format == 'jsonl':
+        with pd.read_json(path, lines=True, chunksize=chunksize, dtype=False, convert_dates=False) as reader:
+            yield from reader
+    else:
+        # Read every column as text, so ids and titles like "001" or "NA" survive
+        with pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False, na_values=['']) as reader:
+            yield from reader
+
+def known_moods():
+    """Get the moods an imported entry may have: those of the mood keywords file."""
+    mood_data = mood_analyzer.load_mood_data()
+    return set(mood_data['moods']) if mood_data else set(MOODS)
+
+def validate_chunk(chunk, moods, analyze=False):
+    """
+    Check and normalize a chunk of imported entries.
+    
+    Args:
+        chunk (pandas.DataFrame): Rows read from an import file.
+        moods (set): The valid moods.
+        analyze (bool): Take the mood and mood_score from the analyzer instead of
+            the file, which then need not have them.
+    
+    Returns:
+        tuple: (entries, rejected), where entries is a DataFrame of the valid
+            entries with the column types of compact_entries, and rejected a
+            Counter of the invalid ones by reason.
+    """
+    chunk = chunk.reindex(columns=COLUMNS).reset_index(drop=True)
+    rejected = Counter()
+    
+    def reject(mask, reason):
+        rejected[reason] += int(mask.sum())
+        return mask
+    
+    text = chunk['content'].where(chunk['content'].notna(), None)
+    invalid = reject(text.map(lambda value: not isinstance(value, str) or not value.strip()), "missing content")
+    dates = pd.to_datetime(chunk['date'].astype(str), format='%Y-%m-%d', errors='coerce')
+    invalid |= reject(~invalid & dates.isna(), "invalid date")
+    if not analyze:
+        invalid |= reject(~invalid & ~chunk['mood'].isin(list(moods)), "invalid mood")
+        scores = pd.to_numeric(chunk['mood_score'], errors='coerce')
+        bad_scores = (chunk['mood_score'].notna() & scores.isna()) | (scores < -1) | (scores > 1)
+        invalid |= reject(~invalid & bad_scores, "invalid mood_score")
+        chunk['mood_score'] = scores
+    
+    entries = chunk[~invalid].copy()
+    entries['date'] = dates[~invalid].dt.strftime('%Y-%m-%d')
+    entries['title'] = entries['title'].fillna('').astype(str)
+    entries['id'] = [
+        str(value) if not pd.isna(value) and str(value).strip() else str(uuid.uuid4()) for value in entries['id']
+    ]
+    if analyze and len(entries):
+        results = mood_analyzer.analyze_moods(entries['content'].tolist())
+        entries['mood'] = [mood for mood, _, _ in results]
+        entries['mood_score'] = [float(score) for _, score, _ in results]
+    return compact_entries(entries), rejected
+
+def report_progress(action, count, start_time):
+    """Print how many entries were processed so far, and how fast."""
+    elapsed = max(time.perf_counter() - start_time, 1e-9)
+    print(f"{action} {count} entries ({count / elapsed:.0f} entries/s)")
+
+def import_journal(path, file_format=None, analyze=False, chunksize=DEFAULT_CHUNKSIZE, progress=report_progress):
+    """
+    Import the entries of a CSV or JSON Lines file into the journal.
+    
+    Args:
+        path (str): The file to import.
+        file_format (str, optional): "csv" or "jsonl"; guessed from the extension if not given.
+        analyze (bool): Take the mood and mood_score of every entry from the analyzer.
+        chunksize (int): The number of entries read at a time.
+        progress (callable, optional): Called after every chunk with "Read", the
+            number of rows read so far and the start time.
+    
+    Returns:
+        dict: The number of rows read, entries imported and duplicates skipped,
+            and the number of invalid rows by reason.
+    """
+    file_format = detect_format(path, file_format)
+    moods = known_moods()
+    totals = {'read': 0, 'rejected': Counter()}
+    start_time = time.perf_counter()
+    
+    def valid_chunks():
+        for chunk in read_chunks(path, file_format, chunksize):
+            entries, rejected = validate_chunk(chunk, moods, analyze)
+            totals['read'] += len(chunk)
+            totals['rejected'] += rejected
+            yield entries
+            if progress is not None:
+                progress("Read", totals['read'], start_time)
+    
+    imported = import_journal_entries(valid_chunks())
+    rejected = sum(totals['rejected'].values())
+    return {
+        'read': totals['read'],
+        'imported': imported,
+        'duplicates': totals['read'] - rejected - imported,
+        'rejected': dict(totals['rejected']),
+    }
+
+def export_journal(path, file_format=None, start_date=None, end_date=None, mood=None, chunksize=DEFAULT_CHUNKSIZE,
+                   progress=report_progress):
+    """
+    Export journal entries to a CSV or JSON Lines file, replacing it in one step.
+    
+    Args:
+        path (str): The file to write.
+        file_format (str, optional): "csv" or "jsonl"; guessed from the extension if not given.
+        start_date (optional): Only export entries on or after this date.
+        end_date (optional): Only export entries on or before this date.
+        mood (str, optional): Only export entries with this mood.
+        chunksize (int): The number of entries read at a time.
+        progress (callable, optional): Called after every chunk with "Exported", the
+            number of entries written so far and the start time.
+    
+    Returns:
+        int: The number of entries exported.
+    """
+    file_format = detect_format(path, file_format)
+    count = 0
+    start_time = time.perf_counter()
+    with atomic_file(path) as temp_file:
+        with open(temp_file, 'w', newline='', encoding='utf-8') as f:
+            for chunk in iter_journal_entries(chunksize):
+                dates = pd.to_datetime(chunk['date'], errors='coerce')
+                mask = pd.Series(True, index=chunk.index)
+                if start_date is not None:
+                    mask &= dates >= pd.Timestamp(format_date(start_date))
+                if end_date is not None:
+                    mask &= dates <= pd.Timestamp(format_date(end_date))
+                if mood is not None:
+                    mask &= chunk['mood'] == mood
+                chunk = storable_entries(chunk[mask])
+                if file_format == 'jsonl':
+                    for record in chunk.to_dict('records'):
+                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                else:
+                    chunk.to_csv(f, index=False, header=(count == 0))
+                count += len(chunk)
+                if progress is not None:
+                    progress("Exported", count, start_time)
+            if file_format == 'csv' and count == 0:
+                f.write(','.join(COLUMNS) + '\n')
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import or export journal entries as CSV or JSON Lines.")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("file", help="the file to read or write")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None,
+                        help="file format (default: from the extension, .jsonl or .ndjson for JSON Lines)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="entries per chunk")
+    parser.add_argument("--analyze", action="store_true", help="import: classify every entry's mood again")
+    parser.add_argument("--start", help="export: earliest date, YYYY-MM-DD")
+    parser.add_argument("--end", help="export: latest date, YYYY-MM-DD")
+    parser.add_argument("--mood", help="export: only entries with this mood")
+    args = parser.parse_args()
+    
+    if args.command == "import":
+        result = import_journal(args.file, args.format, args.analyze, args.chunksize)
+        print(f"Done: read {result['read']} rows, imported {result['imported']}, "
+              f"skipped {result['duplicates']} duplicates")
+        for reason, count in sorted(result['rejected'].items()):
+            print(f"Skipped {count} rows: {reason}")
+    else:
+        count = export_journal(args.file, args.format, args.start, args.end, args.mood, args.chunksize)
+        print(f"Done: exported {count} entries to {args.file}")
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""
+Compiled mood keyword lexicon.
+
+compile_lexicon turns the moods of mood_keywords.json into a table from each token
+to the moods it counts for, so classifying a text takes one dictionary lookup per
+token. write_lexicon saves the table to a versioned file that read_lexicon loads
+much faster than the JSON can be parsed and compiled again.
+
+A keyword is either a string or an object with a weight, like
+{"keyword": "ecstatic", "weight": 2}; plain strings weigh 1. Keywords of several
+words, like "feel down", match those words in a row.
+"""
+import hashlib
+import os
+import pickle
+import re
+
+# A keyword made of word characters only matches exactly one token of the text
+WORD_PATTERN = re.compile(r'\w+')
+
+# Version of the compiled lexicon's layout; files of another version are rebuilt
+LEXICON_FORMAT = 1
+
+def source_hash(path):
+    """
+    Get a digest of a mood keywords file, identifying the lexicon compiled from it.
+
+    Args:
+        path (str): The mood keywords JSON file.
+
+    Returns:
+        str: The SHA-256 of the file, or None if it does not exist.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def inflect(word):
+    """
+    Get common inflections of an English word: plurals, past tense, -ing and -ly forms.
+
+    Args:
+        word (str): A lowercase word.
+
+    Returns:
+        set: The inflected forms, which need not all be real words.
+    """
+    variants = {word + 's', word + 'ed', word + 'ing', word + 'ly'}
+    if word.endswith('e'):
+        variants |= {word + 'd', word[:-1] + 'ing'}
+    if word.endswith(('s', 'x', 'z', 'ch', 'sh')):
+        variants.add(word + 'es')
+    if len(word) > 2 and word.endswith('y') and word[-2] not in 'aeiou':
+        variants |= {word[:-1] + 'ies', word[:-1] + 'ied', word[:-1] + 'ily'}
+    variants.discard(word)
+    return variants
+
+def compile_lexicon(mood_data, inflections=False, source=None):
+    """
+    Compile mood keywords into a token lookup table.
+
+    Args:
+        mood_data (dict): Parsed mood keywords and quotes.
+        inflections (bool): Also match inflections of single-word keywords (see
+            inflect), with the weights of the keyword; listed keywords take
+            precedence over inflections.
+        source (str, optional): The source_hash of the keywords file.
+
+    Returns:
+        dict: The lexicon, with:
+            moods: each mood's quote, in mood_keywords.json order
+            tokens: for each token, a tuple of (mood index, weight) pairs and a tuple
+                of the phrases starting with it, as (words, weights) pairs
+            patterns: (regex, mood index, weight) for keywords that are not words
+            and the format, source and inflections it was compiled with.
+    """
+    words = {}
+    phrases = {}
+    patterns = []
+    for index, (mood, data) in enumerate(mood_data['moods'].items()):
+        for item in data['keywords']:
+            if isinstance(item, dict):
+                keyword, weight = item['keyword'], item.get('weight', 1)
+            else:
+                keyword, weight = item, 1
+            tokens = tuple(WORD_PATTERN.findall(keyword.lower()))
+            if WORD_PATTERN.fullmatch(keyword):
+                weights = words.setdefault(keyword.lower(), {})
+            elif len(tokens) > 1 and keyword.lower() == ' '.join(tokens):
+                weights = phrases.setdefault(tokens, {})
+            else:
+                patterns.append((keyword, index, weight))
+                continue
+            # A keyword listed twice for a mood counts twice
+            weights[index] = weights.get(index, 0) + weight
+
+    if inflections:
+        variants = {}
+        for word, weights in words.items():
+            for variant in inflect(word):
+                if variant not in words:
+                    merged = variants.setdefault(variant, {})
+                    for index, weight in weights.items():
+                        merged[index] = max(merged.get(index, 0), weight)
+        words.update(variants)
+
+    starts = {}
+    for tokens, weights in phrases.items():
+        starts.setdefault(tokens[0], []).append((tokens, tuple(sorted(weights.items()))))
+    table = {}
+    for token in set(words) | set(starts):
+        table[token] = (tuple(sorted(words.get(token, {}).items())), tuple(starts.get(token, ())))
+
+    return {
+        'format': LEXICON_FORMAT,
+        'source': source,
+        'inflections': inflections,
+        'moods': {mood: {'quote': data['quote']} for mood, data in mood_data['moods'].items()},
+        'tokens': table,
+        'patterns': patterns,
+    }
+
+def write_lexicon(lexicon, path):
+    """
+    Save a compiled lexicon, replacing the file in one step.
+
+    Args:
+        lexicon (dict): As returned by compile_lexicon.
+        path (str): The file to write.
+
+    Returns:
+        bool: True if the file was written successfully, False otherwise.
+    """
+    temp_file = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_file, 'wb') as f:
+            pickle.dump(lexicon, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, path)
+        return True
+    except Exception as e:
+        print(f"Error writing lexicon: {e}")
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        return False
+
+def read_lexicon(path, source=None, inflections=False):
+    """
+    Load a compiled lexicon, unless it is missing or out of date.
+
+    The file is unpickled, so only load lexicons written by write_lexicon.
+
+    Args:
+        path (str): The file written by write_lexicon.
+        source (str, optional): The source_hash of the current keywords file; if
+            given, a lexicon compiled from another version of it is out of date.
+        inflections (bool): Whether the lexicon should include inflections.
+
+    Returns:
+        dict: The lexicon, or None if it has to be compiled again.
+    """
+    try:
+        with open(path, 'rb') as f:
+            lexicon = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading lexicon: {e}")
+        return None
+    if (not isinstance(lexicon, dict) or lexicon.get('format') != LEXICON_FORMAT
+            or lexicon.get('inflections') != inflections
+            or (source is not None and lexicon.get('source') != source)):
+        return None
+    return lexicon
\ No newline at end of file
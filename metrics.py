@@ -0,0 +1,214 @@
+"""
+Lightweight timings and counts for the app's hot paths.
+
+Every instrumented operation, such as an analyzer phase, a data_manager call or a
+chart build, adds its duration, and the rows and bytes it read or wrote, to a
+process-wide registry. The app shows the registry in its Diagnostics panel, and
+it can be exported as JSON or in the Prometheus text format.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Set to False to skip recording altogether
+ENABLED = True
+
+# File the app writes the metrics to after every rerun, for example
+# "journal_metrics.prom" for a Prometheus textfile collector or "journal_metrics.json";
+# None to not write one
+EXPORT_FILE = None
+
+# Prefix of the exported Prometheus metric names
+PROMETHEUS_PREFIX = "moodjournal"
+
+# Totals of each operation by name, guarded by _lock
+_operations = {}
+_lock = threading.Lock()
+
+def record(name, seconds, rows=None, nbytes=None):
+    """
+    Add one run of an operation to the registry.
+
+    Args:
+        name (str): The operation, like "data_manager.load_journal_entries".
+        seconds (float): How long the run took.
+        rows (int, optional): The number of entries it read or wrote.
+        nbytes (int, optional): The number of bytes it read or wrote.
+    """
+    if not ENABLED:
+        return
+    with _lock:
+        stats = _operations.get(name)
+        if stats is None:
+            stats = _operations[name] = {
+                'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'last_seconds': 0.0,
+                'rows': 0, 'bytes': 0
+            }
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        stats['last_seconds'] = seconds
+        if rows is not None:
+            stats['rows'] += int(rows)
+        if nbytes is not None:
+            stats['bytes'] += int(nbytes)
+
+class Timer:
+    """The run of an operation being timed by timer; set rows and nbytes to record them."""
+
+    def __init__(self):
+        self.rows = None
+        self.nbytes = None
+
+@contextmanager
+def timer(name):
+    """
+    Time a block of code as one run of an operation.
+
+    Args:
+        name (str): The operation.
+
+    Yields:
+        Timer: Set its rows and nbytes attributes to record them too.
+    """
+    run = Timer()
+    start = time.perf_counter()
+    try:
+        yield run
+    finally:
+        record(name, time.perf_counter() - start, run.rows, run.nbytes)
+
+def frame_size(result, args, kwargs):
+    """
+    Measure the entries an operation returned.
+
+    Args:
+        result: A DataFrame, or a tuple starting with one.
+        args (tuple): The positional arguments of the call.
+        kwargs (dict): The keyword arguments of the call.
+
+    Returns:
+        tuple: (rows, nbytes), with the in-memory size of the DataFrame, or
+            (None, None) for other results.
+    """
+    # Told apart by attributes, so the module loads without importing pandas
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if hasattr(result, 'memory_usage') and hasattr(result, 'columns'):
+        return len(result), int(result.memory_usage(index=False).sum())
+    return None, None
+
+def text_size(values):
+    """
+    Count the UTF-8 bytes of the strings among some values.
+
+    Args:
+        values (iterable): Any values; those that are not strings are skipped.
+
+    Returns:
+        int: The total size of the strings.
+    """
+    return sum(len(value.encode('utf-8')) for value in values if isinstance(value, str))
+
+def instrument(name, measure=frame_size):
+    """
+    Decorate a function to time every call as one run of an operation.
+
+    Args:
+        name (str): The operation.
+        measure (callable): Takes the result, positional and keyword arguments of a
+            call and returns the (rows, nbytes) it read or wrote.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            rows, nbytes = measure(result, args, kwargs)
+            record(name, elapsed, rows, nbytes)
+            return result
+        return wrapper
+    return decorate
+
+def snapshot():
+    """
+    Get the totals of every operation recorded so far.
+
+    Returns:
+        dict: For each operation name, count, seconds, max_seconds, last_seconds,
+            rows and bytes.
+    """
+    with _lock:
+        return {name: dict(stats) for name, stats in _operations.items()}
+
+def reset():
+    """Forget everything recorded so far."""
+    with _lock:
+        _operations.clear()
+
+def to_json():
+    """
+    Export the metrics as JSON.
+
+    Returns:
+        str: A JSON object with the export time and the snapshot of every operation.
+    """
+    return json.dumps({'time': time.time(), 'operations': snapshot()}, indent=2, sort_keys=True)
+
+def to_prometheus():
+    """
+    Export the metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: One metric family per statistic, labelled by operation.
+    """
+    families = [
+        ('calls_total', 'counter', 'count', "Number of runs of each operation."),
+        ('seconds_total', 'counter', 'seconds', "Time spent in each operation."),
+        ('seconds_max', 'gauge', 'max_seconds', "Longest run of each operation."),
+        ('seconds_last', 'gauge', 'last_seconds', "Duration of the latest run of each operation."),
+        ('rows_total', 'counter', 'rows', "Journal entries read or written by each operation."),
+        ('bytes_total', 'counter', 'bytes', "Bytes read or written by each operation."),
+    ]
+    operations = snapshot()
+    lines = []
+    for suffix, kind, key, help_text in families:
+        metric = f"{PROMETHEUS_PREFIX}_operation_{suffix}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name in sorted(operations):
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'{metric}{{operation="{label}"}} {operations[name][key]}')
+    return "\n".join(lines) + "\n"
+
+def export(path):
+    """
+    Write the metrics to a file, replacing it in one step.
+
+    Files ending in .json get JSON, any other file the Prometheus text format.
+
+    Args:
+        path (str): The file to write.
+
+    Returns:
+        bool: True if the file was written successfully, False otherwise.
+    """
+    try:
+        text = to_json() if path.endswith('.json') else to_prometheus()
+        temp_file = f"{path}.{os.getpid()}.tmp"
+        with open(temp_file, 'w') as f:
+            f.write(text)
+        os.replace(temp_file, path)
+        return True
+    except Exception as e:
+        print(f"Error exporting metrics: {e}")
+        return False
\ No newline at end of file
@@ -1,26 +1,691 @@
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
 import re
 import json
+import math
 import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 
-# Download necessary NLTK resources
-try:
-    nltk.data.find('vader_lexicon')
-except LookupError:
-    nltk.download('vader_lexicon')
-    nltk.download('punkt')
+import metrics
+from lexicon import WORD_PATTERN, compile_lexicon, read_lexicon, source_hash, write_lexicon
+
+# Directory of this module, holding the data files shipped with the app, so they
+# are found whatever the working directory
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Path to the mood keywords and quotes JSON file
+MOOD_DATA_FILE = os.path.join(APP_DIR, "mood_keywords.json")
+
+# Compiled keyword lexicon, next to MOOD_DATA_FILE. Only written at build time, with:
+# python mood_analyzer.py build-lexicon; when it is missing or was compiled from
+# another version of MOOD_DATA_FILE, the keywords are compiled in memory instead
+LEXICON_FILE = os.path.join(APP_DIR, "mood_keywords.lexicon")
+
+# Whether keywords also match their plurals, past tense, -ing and -ly forms
+LEXICON_INFLECTIONS = False
+
+# Number of texts classified together by the batch API
+BATCH_SIZE = 10000
+
+# Maximum number of analyze_mood results kept in memory
+ANALYSIS_CACHE_SIZE = 1024
+
+# Where the live preview splits cleaned text into sentences
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Seconds the text of the live preview must stay unchanged before a change that
+# followed another one within this time is analyzed
+PREVIEW_DEBOUNCE = 0.3
+
+# Constant VADER normalizes summed valences with: compound = sum / sqrt(sum^2 + alpha)
+VADER_ALPHA = 15
+
+# Sentiment lexicon shipped with the app, used instead of NLTK's data when it exists;
+# create it with: python mood_analyzer.py bundle-lexicon
+VADER_LEXICON_FILE = os.path.join(APP_DIR, "vader_lexicon.txt")
+
+# NLTK resource holding the VADER lexicon
+VADER_LEXICON_RESOURCE = "sentiment/vader_lexicon.zip/vader_lexicon/vader_lexicon.txt"
+
+# Whether to download the VADER lexicon when neither VADER_LEXICON_FILE nor NLTK's
+# data has it. Off by default, since the download hangs on hosts without network
+# access; the app ships VADER_LEXICON_FILE instead
+DOWNLOAD_NLTK_DATA = False
 
 # Load mood keywords and quotes
 def load_mood_data():
     """Load mood keywords and quotes from JSON file."""
     try:
-        with open('mood_keywords.json', 'r') as f:
+        with open(MOOD_DATA_FILE, 'r') as f:
             return json.load(f)
     except FileNotFoundError:
-        print("Error: mood_keywords.json not found")
+        print(f"Error: {MOOD_DATA_FILE} not found")
+        return None
+
+def load_lexicon():
+    """
+    Load the compiled lexicon of the mood keywords file.
+    
+    LEXICON_FILE is used if it was compiled from the current MOOD_DATA_FILE (or
+    MOOD_DATA_FILE does not exist); otherwise the keywords are compiled in memory.
+    The app never writes LEXICON_FILE, which is unpickled, so it only trusts a
+    file built with python mood_analyzer.py build-lexicon.
+    
+    Returns:
+        dict: The lexicon, as returned by lexicon.compile_lexicon, or None if there
+            are no mood keywords.
+    """
+    source = source_hash(MOOD_DATA_FILE)
+    lexicon = read_lexicon(LEXICON_FILE, source, LEXICON_INFLECTIONS)
+    if lexicon is None and source is not None:
+        mood_data = load_mood_data()
+        if mood_data is not None:
+            lexicon = compile_lexicon(mood_data, LEXICON_INFLECTIONS, source)
+    elif lexicon is None:
+        print(f"Error: {MOOD_DATA_FILE} not found")
+    return lexicon
+
+def ensure_vader_lexicon():
+    """
+    Download the VADER lexicon into NLTK's data if no copy of it is available.
+    
+    Does nothing if VADER_LEXICON_FILE exists, NLTK's data has the lexicon, or
+    DOWNLOAD_NLTK_DATA is not set. get_classifier calls this before taking its
+    lock, so a slow download does not hold up other sessions' analyses.
+    """
+    if not DOWNLOAD_NLTK_DATA or os.path.exists(VADER_LEXICON_FILE):
+        return
+    import nltk
+    try:
+        nltk.data.find(VADER_LEXICON_RESOURCE)
+    except LookupError:
+        nltk.download('vader_lexicon', quiet=True)
+
+def load_sentiment_analyzer():
+    """
+    Create the VADER sentiment analyzer, importing NLTK on first use.
+    
+    The lexicon is read from VADER_LEXICON_FILE if it exists, otherwise from NLTK's
+    data, which is downloaded first if it is missing and DOWNLOAD_NLTK_DATA is set.
+    
+    Returns:
+        nltk.sentiment.SentimentIntensityAnalyzer: The analyzer.
+        
+    Raises:
+        LookupError: If the lexicon is not available.
+    """
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer, VaderConstants
+    if os.path.exists(VADER_LEXICON_FILE):
+        # Set up the way SentimentIntensityAnalyzer.__init__ does, but with the file
+        # read directly, since nltk.data only opens files under NLTK's data paths
+        sia = SentimentIntensityAnalyzer.__new__(SentimentIntensityAnalyzer)
+        with open(VADER_LEXICON_FILE, encoding='utf-8') as f:
+            sia.lexicon_file = f.read()
+        sia.lexicon = sia.make_lex_dict()
+        sia.constants = VaderConstants()
+        return sia
+    
+    import nltk
+    ensure_vader_lexicon()
+    try:
+        nltk.data.find(VADER_LEXICON_RESOURCE)
+    except LookupError:
+        raise LookupError(
+            f"VADER lexicon not found: add {VADER_LEXICON_FILE} (python mood_analyzer.py "
+            f"bundle-lexicon) or run nltk.download('vader_lexicon')"
+        )
+    return SentimentIntensityAnalyzer(lexicon_file=VADER_LEXICON_RESOURCE)
+
+def bundle_lexicon(path=VADER_LEXICON_FILE):
+    """
+    Copy the VADER lexicon from NLTK's data to a file shipped with the app.
+    
+    Args:
+        path (str): The file to write.
+        
+    Returns:
+        int: The number of bytes written.
+    """
+    import nltk
+    try:
+        nltk.data.find(VADER_LEXICON_RESOURCE)
+    except LookupError:
+        nltk.download('vader_lexicon', quiet=True)
+    with nltk.data.find(VADER_LEXICON_RESOURCE).open() as f:
+        lexicon = f.read()
+    with open(path, 'wb') as f:
+        f.write(lexicon)
+    return len(lexicon)
+
+def mood_data_version():
+    """
+    Get a version stamp for the mood keywords file.
+    
+    Returns:
+        tuple: (mtime_ns, size) of the file, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(MOOD_DATA_FILE)
+    except OSError:
         return None
+    return stat.st_mtime_ns, stat.st_size
 
+class MoodClassifier:
+    """
+    Long-lived mood classifier holding the sentiment model and keyword matcher.
+    
+    The VADER analyzer is created and the compiled keyword lexicon is loaded once,
+    when the classifier is built. Keywords and phrases are looked up by token, so
+    all per-mood counts are produced in one pass over the text.
+    """
+    
+    def __init__(self, mood_data=None):
+        """
+        Build the classifier.
+        
+        Args:
+            mood_data (dict, optional): Parsed mood keywords and quotes, compiled on
+                the spot. The compiled lexicon of MOOD_DATA_FILE is used when not given.
+        """
+        self.version = mood_data_version()
+        self.sia = load_sentiment_analyzer()
+        with metrics.timer("analyze_mood.load_lexicon"):
+            if mood_data is not None:
+                self.lexicon = compile_lexicon(mood_data, LEXICON_INFLECTIONS)
+            else:
+                self.lexicon = load_lexicon()
+        
+        # The moods and their quotes, in mood_keywords.json order
+        self.mood_data = {'moods': self.lexicon['moods']} if self.lexicon else None
+        self.moods = list(self.lexicon['moods'].keys()) if self.lexicon else []
+        # Keywords that are not words or phrases of words keep their own regex
+        self.phrase_patterns = [
+            (re.compile(r'\b' + keyword + r'\b', re.IGNORECASE), index, weight)
+            for keyword, index, weight in (self.lexicon['patterns'] if self.lexicon else [])
+        ]
+    
+    def count_keywords(self, clean_text):
+        """
+        Count keyword matches for each mood.
+        
+        Args:
+            clean_text (str): Text returned by clean_text_for_analysis.
+            
+        Returns:
+            dict: Mapping of mood label to the weighted number of keyword matches.
+        """
+        scores = [0] * len(self.moods)
+        table = self.lexicon['tokens']
+        tokens = WORD_PATTERN.findall(clean_text)
+        # Where each phrase last matched, so repeats do not overlap (as with a regex)
+        phrase_ends = {}
+        
+        for i, token in enumerate(tokens):
+            entry = table.get(token)
+            if entry is None:
+                continue
+            weights, phrases = entry
+            for index, weight in weights:
+                scores[index] += weight
+            for words, phrase_weights in phrases:
+                if i >= phrase_ends.get(words, 0) and tuple(tokens[i:i + len(words)]) == words:
+                    phrase_ends[words] = i + len(words)
+                    for index, weight in phrase_weights:
+                        scores[index] += weight
+        
+        for pattern, index, weight in self.phrase_patterns:
+            scores[index] += weight * len(pattern.findall(clean_text))
+        
+        return dict(zip(self.moods, scores))
+    
+    def pick_mood(self, mood_scores, mood_score):
+        """
+        Choose the mood label from keyword counts, falling back to the sentiment score.
+        
+        Args:
+            mood_scores (dict): Keyword match counts per mood.
+            mood_score (float): Compound sentiment score between -1 and 1.
+            
+        Returns:
+            str: The detected mood label.
+        """
+        # Get the mood with the highest score
+        max_mood = max(mood_scores.items(), key=lambda x: x[1])[0]
+        
+        # If no keywords matched, use sentiment analysis
+        if mood_scores[max_mood] == 0:
+            if mood_score >= 0.5:
+                max_mood = "Joyful"
+            elif mood_score >= 0.1:
+                max_mood = "Peaceful"
+            elif mood_score <= -0.5:
+                max_mood = "Sad"
+            elif mood_score <= -0.1:
+                max_mood = "Anxious"
+            else:
+                max_mood = "Neutral"
+        
+        return max_mood
+    
+    def analyze(self, text):
+        """
+        Analyze the mood of a text entry.
+        
+        Args:
+            text (str): The journal entry text to analyze.
+            
+        Returns:
+            tuple: (mood_label, mood_score, quote), as returned by analyze_mood.
+        """
+        return self.analyze_clean(clean_text_for_analysis(text))
+    
+    def analyze_clean(self, clean_text):
+        """
+        Analyze the mood of a text that was already cleaned.
+        
+        Args:
+            clean_text (str): Text returned by clean_text_for_analysis.
+            
+        Returns:
+            tuple: (mood_label, mood_score, quote), as returned by analyze_mood.
+        """
+        # Get sentiment scores
+        with metrics.timer("analyze_mood.sentiment") as run:
+            sentiment = self.sia.polarity_scores(clean_text)
+            run.rows, run.nbytes = 1, len(clean_text)
+        mood_score = sentiment['compound']
+        
+        if not self.mood_data:
+            return "Neutral", mood_score, "Error loading mood data"
+        
+        with metrics.timer("analyze_mood.keywords") as run:
+            max_mood = self.pick_mood(self.count_keywords(clean_text), mood_score)
+            run.rows, run.nbytes = 1, len(clean_text)
+        
+        # Get the quote for the detected mood
+        quote = self.mood_data['moods'][max_mood]['quote']
+        
+        return max_mood, mood_score, quote
+    
+    def analyze_batch(self, texts):
+        """
+        Analyze the mood of many text entries at once.
+        
+        Identical texts are analyzed once, keyword hits for all moods are counted
+        with array operations over the tokens of the whole batch, and the result
+        matches calling analyze on each text.
+        
+        Args:
+            texts (iterable): The journal entry texts to analyze. Missing values are
+                treated as empty text.
+            
+        Returns:
+            list: A (mood_label, mood_score, quote) tuple for each text.
+        """
+        # Imported here, so analyzing single texts starts without them
+        import numpy as np
+        import pandas as pd
+        
+        texts = pd.Series(list(texts), dtype=object).fillna('').astype(str)
+        if texts.empty:
+            return []
+        
+        # Clean the texts, the same way clean_text_for_analysis does
+        clean = (
+            texts.str.lower()
+            .str.replace(r'https?://\S+|www\.\S+', '', regex=True)
+            .str.replace(r'\s+', ' ', regex=True)
+            .str.strip()
+        )
+        
+        # Only analyze each distinct text once
+        codes, unique_texts = pd.factorize(clean)
+        unique_texts = pd.Series(unique_texts, dtype=object)
+        
+        # Get sentiment scores
+        with metrics.timer("analyze_moods.sentiment") as run:
+            scores = np.array(
+                [self.sia.polarity_scores(text)['compound'] for text in unique_texts],
+                dtype=float
+            )
+            run.rows, run.nbytes = len(unique_texts), int(unique_texts.str.len().sum())
+        
+        if not self.mood_data:
+            return [("Neutral", score, "Error loading mood data") for score in scores[codes]]
+        
+        moods = self.moods
+        labels = np.array(moods + ["Joyful", "Peaceful", "Sad", "Anxious", "Neutral"], dtype=object)
+        
+        # Pick the mood with the most keyword hits, then fall back to sentiment
+        with metrics.timer("analyze_moods.keywords") as run:
+            counts = self.count_keywords_batch(unique_texts)
+            run.rows, run.nbytes = len(unique_texts), int(unique_texts.str.len().sum())
+        best = counts.argmax(axis=1)
+        fallback = np.select(
+            [scores >= 0.5, scores >= 0.1, scores <= -0.5, scores <= -0.1],
+            [len(moods), len(moods) + 1, len(moods) + 2, len(moods) + 3],
+            default=len(moods) + 4
+        )
+        matched = counts[np.arange(len(unique_texts)), best] > 0
+        unique_moods = labels[np.where(matched, best, fallback)]
+        
+        quotes = {mood: data['quote'] for mood, data in self.mood_data['moods'].items()}
+        return [
+            (mood, score, quotes[mood])
+            for mood, score in zip(unique_moods[codes], scores[codes])
+        ]
+    
+    def count_keywords_batch(self, clean_texts):
+        """
+        Count keyword matches for each mood across many texts.
+        
+        Args:
+            clean_texts (pandas.Series): Cleaned texts.
+            
+        Returns:
+            numpy.ndarray: Matrix of weighted keyword match counts, one row per text
+                and one column per mood in mood_keywords.json order.
+        """
+        import numpy as np
+        import pandas as pd
+        
+        moods = self.moods
+        counts = np.zeros((len(clean_texts), len(moods)), dtype=float)
+        table = self.lexicon['tokens']
+        
+        # One row per (token, mood) of the lexicon
+        lookup = pd.DataFrame(
+            [(token, index, weight)
+             for token, (weights, _) in table.items()
+             for index, weight in weights],
+            columns=['token', 'mood', 'weight']
+        )
+        if not lookup.empty:
+            # One row per (text, token), joined against the lexicon
+            tokens = clean_texts.reset_index(drop=True).str.findall(WORD_PATTERN).explode().dropna()
+            hits = pd.DataFrame({'row': tokens.index, 'token': tokens.values}).merge(lookup, on='token')
+            
+            flat = hits['row'].to_numpy(dtype=np.int64) * len(moods) + hits['mood'].to_numpy(dtype=np.int64)
+            counts += np.bincount(flat, weights=hits['weight'].to_numpy(dtype=float),
+                                  minlength=counts.size).reshape(counts.shape)
+        
+        # Phrases match their words in a row, whatever separates them
+        for _, phrases in table.values():
+            for words, weights in phrases:
+                pattern = r'\b' + r'\W+'.join(re.escape(word) for word in words) + r'\b'
+                matches = clean_texts.str.count(pattern).to_numpy()
+                for index, weight in weights:
+                    counts[:, index] += weight * matches
+        
+        for pattern, index, weight in self.phrase_patterns:
+            counts[:, index] += weight * clean_texts.str.count(pattern.pattern, flags=re.IGNORECASE).to_numpy()
+        
+        return counts
+
+class AnalysisCache:
+    """
+    Bounded LRU cache of analyze_mood results.
+    
+    Results are keyed by a hash of the cleaned text, so the cache holds a fixed-size
+    key per entry rather than the text itself. The whole cache is dropped when the
+    mood keywords version changes.
+    """
+    
+    def __init__(self, maxsize=ANALYSIS_CACHE_SIZE):
+        """
+        Create an empty cache.
+        
+        Args:
+            maxsize (int): The maximum number of results to keep.
+        """
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(clean_text):
+        """Hash a cleaned text into a cache key."""
+        return hashlib.blake2b(clean_text.encode('utf-8'), digest_size=16).digest()
+    
+    def get(self, key, version):
+        """
+        Look up a cached result.
+        
+        Args:
+            key (bytes): Key from make_key.
+            version: The mood keywords version the result must have been computed with.
+            
+        Returns:
+            tuple: The cached (mood_label, mood_score, quote), or None on a miss.
+        """
+        with self._lock:
+            if version != self.version:
+                self._results.clear()
+                self.version = version
+            result = self._results.get(key)
+            if result is None:
+                self.misses += 1
+            else:
+                self._results.move_to_end(key)
+                self.hits += 1
+            return result
+    
+    def put(self, key, version, result):
+        """
+        Store a result, evicting the least recently used ones beyond maxsize.
+        
+        Args:
+            key (bytes): Key from make_key.
+            version: The mood keywords version the result was computed with.
+            result (tuple): The (mood_label, mood_score, quote) to cache.
+        """
+        with self._lock:
+            if version != self.version:
+                return
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop all cached results and reset the counters."""
+        with self._lock:
+            self._results.clear()
+            self.hits = self.misses = self.evictions = 0
+    
+    def stats(self):
+        """
+        Get the cache counters.
+        
+        Returns:
+            dict: hits, misses, evictions, size and maxsize of the cache.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._results),
+                'maxsize': self.maxsize,
+            }
+
+class IncrementalAnalyzer:
+    """
+    Mood analyzer for a text being edited, such as the live preview.
+    
+    Keeps the sentiment and keyword counts of every sentence of the last text it
+    analyzed, so analyzing the next version of the text only analyzes the
+    sentences that changed. Sentence sentiments are summed the way VADER sums word
+    sentiments, so the result is only an estimate: it can differ from
+    analyze_mood's when a negation, "but" or emphasis reaches across sentences.
+    Use it for the live preview only, and analyze_mood for the mood that is saved.
+    
+    Changes are debounced: a text that changed less than debounce seconds after
+    the previous change is not analyzed until it has stayed unchanged that long,
+    so a burst of edits is analyzed once, at its end.
+    """
+    
+    def __init__(self, debounce=PREVIEW_DEBOUNCE):
+        # (valence, keyword counts) of each sentence of the last text
+        self.sentences = {}
+        # Classifier version the sentences were analyzed with
+        self.version = None
+        self.debounce = debounce
+        # Newest text asked for and when it changed to it, and the text and result
+        # of the last analysis
+        self.latest_text = None
+        self.changed_at = None
+        self.result_text = None
+        self.result = None
+    
+    def analyze(self, text, now=None):
+        """
+        Analyze the mood of a text, unless it is still changing.
+        
+        The text is analyzed if it is the first one, or if the previous change was
+        at least debounce seconds earlier. Otherwise the last result is returned and
+        pending() is True until a call with the same text, once it has stayed
+        unchanged for debounce seconds, analyzes it.
+        
+        Args:
+            text (str): The text being edited.
+            now (float, optional): The time.monotonic() time of the call.
+            
+        Returns:
+            tuple: Estimated (mood_label, mood_score, quote) of the last text
+                analyzed.
+        """
+        now = time.monotonic() if now is None else now
+        changing = self.changed_at is not None and now - self.changed_at < self.debounce
+        if text != self.latest_text:
+            self.latest_text = text
+            self.changed_at = now
+        if self.result is None or not changing:
+            self.update(text)
+        return self.result
+    
+    def pending(self):
+        """Tell whether the newest text is waiting to be analyzed."""
+        return self.latest_text is not None and self.latest_text != self.result_text
+    
+    def update(self, text):
+        """
+        Analyze the mood of a text now, reusing the analysis of unchanged sentences.
+        
+        Args:
+            text (str): The text being edited.
+            
+        Returns:
+            tuple: Estimated (mood_label, mood_score, quote) of the text.
+        """
+        if self.result is None or text != self.result_text or self.version != get_classifier().version:
+            self.result = self.analyze_sentences(text)
+            self.result_text = text
+        return self.result
+    
+    def analyze_sentences(self, text):
+        """Analyze a text from the analysis of each of its sentences."""
+        classifier = get_classifier()
+        if classifier.version != self.version:
+            self.sentences = {}
+            self.version = classifier.version
+        
+        clean_text = clean_text_for_analysis(text)
+        sentences = SENTENCE_BOUNDARY.split(clean_text) if clean_text else []
+        known = {}
+        for sentence in sentences:
+            if sentence not in known:
+                known[sentence] = self.sentences.get(sentence) or self.analyze_sentence(classifier, sentence)
+        # Only keep the sentences of this text, so memory follows the text's length
+        self.sentences = known
+        
+        valence = sum(known[sentence][0] for sentence in sentences)
+        mood_score = round(valence / math.sqrt(valence * valence + VADER_ALPHA), 4)
+        
+        if not classifier.mood_data:
+            return "Neutral", mood_score, "Error loading mood data"
+        
+        mood_scores = {mood: 0 for mood in classifier.mood_data['moods'].keys()}
+        for sentence in sentences:
+            for mood, count in known[sentence][1].items():
+                mood_scores[mood] += count
+        max_mood = classifier.pick_mood(mood_scores, mood_score)
+        return max_mood, mood_score, classifier.mood_data['moods'][max_mood]['quote']
+    
+    @staticmethod
+    def analyze_sentence(classifier, sentence):
+        """
+        Get the summed word valence and keyword counts of one cleaned sentence.
+        
+        VADER only reports the normalized compound score, so the valence is
+        recovered by inverting the normalization.
+        """
+        compound = classifier.sia.polarity_scores(sentence)['compound']
+        compound = max(-0.9999, min(0.9999, compound))
+        valence = compound * math.sqrt(VADER_ALPHA / (1 - compound * compound))
+        counts = classifier.count_keywords(sentence) if classifier.mood_data else {}
+        return valence, counts
+
+# Shared cache of analyze_mood results
+analysis_cache = AnalysisCache()
+
+# Process-wide classifier, rebuilt when the mood keywords file changes
+_classifier = None
+_classifier_lock = threading.Lock()
+
+# Thread started by warm_up
+_warm_up_thread = None
+
+def get_classifier():
+    """
+    Get the shared MoodClassifier, building it on first use.
+    
+    Returns:
+        MoodClassifier: A classifier built from the current mood keywords file.
+    """
+    global _classifier
+    if _classifier is None:
+        # Any download happens here, outside the lock
+        ensure_vader_lexicon()
+    with _classifier_lock:
+        if _classifier is None or _classifier.version != mood_data_version():
+            _classifier = MoodClassifier()
+        return _classifier
+
+def warm_up():
+    """
+    Build the shared classifier in a background thread.
+    
+    Importing NLTK and loading the lexicon take a while, so the app calls this once
+    its first page is rendered, and the first analysis then finds them ready.
+    Calling it again does nothing.
+    
+    Returns:
+        threading.Thread: The warm-up thread, or None if the classifier was
+            already built.
+    """
+    global _warm_up_thread
+    with _classifier_lock:
+        if _warm_up_thread is None and _classifier is None:
+            _warm_up_thread = threading.Thread(target=warm_up_now, name="mood-analyzer-warm-up", daemon=True)
+            _warm_up_thread.start()
+        return _warm_up_thread
+
+def warm_up_now():
+    """Build the shared classifier and run it once, reporting failures instead of raising."""
+    try:
+        with metrics.timer("analyze_mood.warm_up"):
+            get_classifier().sia.polarity_scores("warm up")
+    except Exception as e:
+        print(f"Error warming up the mood analyzer: {e}")
+
+@metrics.instrument("analyze_mood")
 def analyze_mood(text):
     """
     Analyze the mood of a text entry using keyword matching and sentiment analysis.
@@ -32,50 +697,51 @@ def analyze_mood(text):
         tuple: (mood_label, mood_score, quote) where mood_label is a string label,
                mood_score is a float between -1 and 1, and quote is a motivational quote.
     """
-    # Initialize the sentiment analyzer
-    sia = SentimentIntensityAnalyzer()
-    
-    # Clean the text
+    classifier = get_classifier()
     clean_text = clean_text_for_analysis(text)
     
-    # Get sentiment scores
-    sentiment = sia.polarity_scores(clean_text)
-    mood_score = sentiment['compound']
-    
-    # Load mood data
-    mood_data = load_mood_data()
-    if not mood_data:
-        return "Neutral", mood_score, "Error loading mood data"
-    
-    # Initialize mood scores
-    mood_scores = {mood: 0 for mood in mood_data['moods'].keys()}
-    
-    # Count keyword matches for each mood
-    for mood, data in mood_data['moods'].items():
-        for keyword in data['keywords']:
-            matches = len(re.findall(r'\b' + keyword + r'\b', clean_text, re.IGNORECASE))
-            mood_scores[mood] += matches
-    
-    # Get the mood with the highest score
-    max_mood = max(mood_scores.items(), key=lambda x: x[1])[0]
-    
-    # If no keywords matched, use sentiment analysis
-    if mood_scores[max_mood] == 0:
-        if mood_score >= 0.5:
-            max_mood = "Joyful"
-        elif mood_score >= 0.1:
-            max_mood = "Peaceful"
-        elif mood_score <= -0.5:
-            max_mood = "Sad"
-        elif mood_score <= -0.1:
-            max_mood = "Anxious"
-        else:
-            max_mood = "Neutral"
-    
-    # Get the quote for the detected mood
-    quote = mood_data['moods'][max_mood]['quote']
-    
-    return max_mood, mood_score, quote
+    # Reuse the result for text analyzed since the keywords last changed
+    key = AnalysisCache.make_key(clean_text)
+    result = analysis_cache.get(key, classifier.version)
+    if result is None:
+        result = classifier.analyze_clean(clean_text)
+        analysis_cache.put(key, classifier.version, result)
+    return result
+
+@metrics.instrument("analyze_moods", measure=lambda results, args, kwargs: (len(results), None))
+def analyze_moods(texts):
+    """
+    Analyze the mood of many text entries, for example a whole journal.
+    
+    Args:
+        texts (iterable): The journal entry texts to analyze.
+        
+    Returns:
+        list: A (mood_label, mood_score, quote) tuple for each text, in order.
+    """
+    texts = list(texts)
+    classifier = get_classifier()
+    results = []
+    for start in range(0, len(texts), BATCH_SIZE):
+        results.extend(classifier.analyze_batch(texts[start:start + BATCH_SIZE]))
+    return results
+
+def analyze_entries(entries_df):
+    """
+    Re-classify journal entries from their content.
+    
+    Args:
+        entries_df (pandas.DataFrame): DataFrame containing journal entries.
+        
+    Returns:
+        pandas.DataFrame: A copy of the entries with the mood and mood_score columns
+            filled in from analyze_moods.
+    """
+    df = entries_df.copy()
+    results = analyze_moods(df['content'])
+    df['mood'] = [mood for mood, _, _ in results]
+    df['mood_score'] = [score for _, score, _ in results]
+    return df
 
 def clean_text_for_analysis(text):
     """
@@ -96,4 +762,23 @@ def clean_text_for_analysis(text):
     # Remove extra whitespace
     text = re.sub(r'\s+', ' ', text).strip()
     
-    return text
\ No newline at end of file
+    return text
+
+if __name__ == "__main__":
+    import sys
+    
+    # python mood_analyzer.py bundle-lexicon [vader_lexicon.txt]
+    if len(sys.argv) >= 2 and sys.argv[1] == "bundle-lexicon":
+        path = sys.argv[2] if len(sys.argv) > 2 else VADER_LEXICON_FILE
+        size = bundle_lexicon(path)
+        print(f"Wrote the VADER lexicon ({size} bytes) to {path}")
+    # python mood_analyzer.py build-lexicon
+    elif len(sys.argv) >= 2 and sys.argv[1] == "build-lexicon":
+        mood_data = load_mood_data()
+        if mood_data is not None:
+            lexicon = compile_lexicon(mood_data, LEXICON_INFLECTIONS, source_hash(MOOD_DATA_FILE))
+            if write_lexicon(lexicon, LEXICON_FILE):
+                print(f"Compiled {len(lexicon['tokens'])} tokens from {MOOD_DATA_FILE} into {LEXICON_FILE}")
+    else:
+        print("Usage: python mood_analyzer.py bundle-lexicon [vader_lexicon.txt]")
+        print("       python mood_analyzer.py build-lexicon")
\ No newline at end of file
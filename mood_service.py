@@ -0,0 +1,434 @@
+"""
+Local HTTP service analyzing the mood of texts, for tools outside the app.
+
+Usage:
+    python mood_service.py [--host 127.0.0.1] [--port 8765] [--workers N]
+        [--batch-size N] [--batch-wait MS]
+
+Endpoints:
+    POST /analyze  {"text": "..."} returns {"mood": ..., "score": ..., "quote": ...};
+                   {"texts": ["...", ...]} returns {"results": [...]} in the same order
+    GET /stats     latency percentiles, throughput and batch sizes, as JSON
+    GET /metrics   the metrics registry in the Prometheus text format
+    GET /health    {"status": "ok"}
+
+Texts of requests arriving together are analyzed as one micro-batch: the batcher
+waits up to --batch-wait for more requests once the first arrives, and sends the
+batch to a pool of worker processes, so the event loop keeps accepting requests
+while they classify. While every worker is busy, new requests queue up and form
+the next, larger batch.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+from mood_analyzer import get_classifier
+
+# Address the service listens on; only expose it beyond localhost behind a proxy
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Most texts analyzed in one batch; a single request with more is still one batch
+MAX_BATCH_SIZE = 256
+
+# Seconds the batcher waits for more requests after the first one of a batch
+BATCH_WAIT = 0.002
+
+# Largest request body accepted, in bytes
+MAX_REQUEST_BYTES = 10 * 1024 * 1024
+
+# Number of recent requests the latency percentiles are computed from
+LATENCY_WINDOW = 10000
+
+# Reason phrases of the status codes the service sends
+STATUS_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+class RequestError(Exception):
+    """A request the service cannot answer, with the HTTP status to reply with."""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def init_worker():
+    """Build the worker's mood classifier before it receives any batch."""
+    get_classifier()
+
+def analyze_texts(texts):
+    """
+    Classify a batch of texts in a worker.
+    
+    Args:
+        texts (list): The texts to classify.
+    
+    Returns:
+        list: A (mood_label, mood_score, quote) tuple for each text, in order.
+    """
+    return [(mood, float(score), quote) for mood, score, quote in get_classifier().analyze_batch(texts)]
+
+class ServiceStats:
+    """Request latencies, counts and batch sizes of the running service."""
+    
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = time.perf_counter()
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.texts = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_texts = 0
+    
+    def record_request(self, seconds, texts, ok=True):
+        """Count a request to /analyze and how long it took."""
+        self.latencies.append(seconds)
+        self.requests += 1
+        self.texts += texts
+        if not ok:
+            self.errors += 1
+    
+    def record_batch(self, texts):
+        """Count a batch sent to the workers."""
+        self.batches += 1
+        self.batched_texts += texts
+    
+    @staticmethod
+    def percentile(values, fraction):
+        """Get the nearest-rank percentile of sorted values, or None without values."""
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+    
+    def summary(self):
+        """
+        Summarize the service's performance so far.
+        
+        Returns:
+            dict: p50_ms and p99_ms over the latest requests, requests and texts
+                per second since the start, and the number and mean size of batches.
+        """
+        latencies = sorted(self.latencies)
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        p50 = self.percentile(latencies, 0.50)
+        p99 = self.percentile(latencies, 0.99)
+        return {
+            'requests': self.requests,
+            'texts': self.texts,
+            'errors': self.errors,
+            'p50_ms': None if p50 is None else p50 * 1000,
+            'p99_ms': None if p99 is None else p99 * 1000,
+            'requests_per_second': self.requests / elapsed,
+            'texts_per_second': self.texts / elapsed,
+            'batches': self.batches,
+            'mean_batch_size': self.batched_texts / self.batches if self.batches else None,
+            'uptime_seconds': elapsed,
+        }
+
+class MicroBatcher:
+    """
+    Coalesces the texts of concurrent requests into batches for a worker pool.
+    
+    Each batch is sent to the pool as soon as it is full or BATCH_WAIT has passed
+    since its first request, and at most one batch per worker is in flight.
+    """
+    
+    def __init__(self, pool, workers, stats, max_batch_size=MAX_BATCH_SIZE, batch_wait=BATCH_WAIT):
+        """
+        Create a batcher; call start from the event loop before analyze.
+        
+        Args:
+            pool (concurrent.futures.Executor): The pool running analyze_texts.
+            workers (int): The number of batches to run at once.
+            stats (ServiceStats): Counts the batches.
+            max_batch_size (int): The most texts per batch.
+            batch_wait (float): Seconds to wait for more requests before sending a batch.
+        """
+        self.pool = pool
+        self.workers = workers
+        self.stats = stats
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self.queue = None
+        self.slots = None
+        self.task = None
+    
+    def start(self):
+        """Start collecting batches in the running event loop."""
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.workers)
+        self.task = asyncio.get_running_loop().create_task(self.collect())
+    
+    async def stop(self):
+        """Stop collecting batches; requests still queued are failed."""
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("The service is shutting down"))
+    
+    async def analyze(self, texts):
+        """
+        Analyze texts as part of the next batch.
+        
+        Args:
+            texts (list): The texts of one request.
+        
+        Returns:
+            list: A (mood_label, mood_score, quote) tuple for each text, in order.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((texts, future))
+        return await future
+    
+    async def collect(self):
+        """Gather queued requests into batches and send them to the pool, forever."""
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free worker first, so requests queue up while all are busy
+            await self.slots.acquire()
+            batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.batch_wait
+            try:
+                while size < self.max_batch_size:
+                    if self.queue.empty():
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        try:
+                            request = await asyncio.wait_for(self.queue.get(), timeout)
+                        except asyncio.TimeoutError:
+                            break
+                    else:
+                        request = self.queue.get_nowait()
+                    batch.append(request)
+                    size += len(request[0])
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.set_exception(RuntimeError("The service is shutting down"))
+                raise
+            loop.create_task(self.dispatch(batch, size))
+    
+    async def dispatch(self, batch, size):
+        """Analyze one batch in the pool and hand each request its results."""
+        loop = asyncio.get_running_loop()
+        try:
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            self.stats.record_batch(size)
+            with metrics.timer("mood_service.batch") as run:
+                results = await loop.run_in_executor(self.pool, analyze_texts, texts)
+                run.rows = size
+            start = 0
+            for request_texts, future in batch:
+                if not future.done():
+                    future.set_result(results[start:start + len(request_texts)])
+                start += len(request_texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.slots.release()
+
+def parse_texts(body):
+    """
+    Get the texts to analyze from a request body.
+    
+    Args:
+        body (bytes): A JSON object with "text" (a string) or "texts" (a list of strings).
+    
+    Returns:
+        tuple: (texts, single), where single tells whether the request had one "text".
+    """
+    try:
+        request = json.loads(body)
+    except ValueError:
+        raise RequestError(400, "The body is not valid JSON")
+    if isinstance(request, dict) and isinstance(request.get('text'), str):
+        return [request['text']], True
+    if (isinstance(request, dict) and isinstance(request.get('texts'), list)
+            and all(isinstance(text, str) for text in request['texts'])):
+        return request['texts'], False
+    raise RequestError(400, 'Send {"text": "..."} or {"texts": ["...", ...]}')
+
+def format_result(result):
+    """Convert an analyzer result tuple to the JSON object the service returns."""
+    mood, score, quote = result
+    return {'mood': mood, 'score': score, 'quote': quote}
+
+class MoodService:
+    """The HTTP server: parses requests, and answers them through a MicroBatcher."""
+    
+    def __init__(self, batcher, stats):
+        self.batcher = batcher
+        self.stats = stats
+    
+    async def handle_connection(self, reader, writer):
+        """Answer the requests of one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.respond(writer, 400, {'error': "Malformed request line"}, close=True)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and (version != 'HTTP/1.0' or headers.get('connection', '').lower() == 'keep-alive'))
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # Without a valid length the body cannot be told from the next request
+                    await self.respond(writer, 400, {'error': "Invalid Content-Length"}, close=True)
+                    break
+                if length > MAX_REQUEST_BYTES:
+                    await self.respond(writer, 413, {'error': "The body is too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                
+                status, payload = await self.route(method, path.split('?')[0], body)
+                await self.respond(writer, status, payload, close=not keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def route(self, method, path, body):
+        """
+        Answer one request.
+        
+        Returns:
+            tuple: (status, payload), where payload is a dict sent as JSON or a str
+                sent as plain text.
+        """
+        if path == '/analyze':
+            if method != 'POST':
+                return 405, {'error': "Use POST"}
+            start = time.perf_counter()
+            texts = []
+            try:
+                texts, single = parse_texts(body)
+                results = await self.batcher.analyze(texts)
+                payload = format_result(results[0]) if single else {'results': [format_result(r) for r in results]}
+                status = 200
+            except RequestError as e:
+                status, payload = e.status, {'error': str(e)}
+            except Exception as e:
+                print(f"Error analyzing texts: {e}")
+                status, payload = 500, {'error': "The analysis failed"}
+            elapsed = time.perf_counter() - start
+            self.stats.record_request(elapsed, len(texts), ok=status == 200)
+            metrics.record("mood_service.request", elapsed, len(texts), len(body))
+            return status, payload
+        if method != 'GET':
+            return 405, {'error': "Use GET"}
+        if path == '/stats':
+            return 200, self.stats.summary()
+        if path == '/metrics':
+            return 200, metrics.to_prometheus()
+        if path == '/health':
+            return 200, {'status': "ok"}
+        return 404, {'error': f"No such endpoint: {path}"}
+    
+    @staticmethod
+    async def respond(writer, status, payload, close=False):
+        """Send a response with a JSON or plain-text body."""
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload).encode('utf-8'), "application/json"
+        head = (
+            f"HTTP/1.1 {status} {STATUS_REASONS.get(status, 'Error')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, max_batch_size=MAX_BATCH_SIZE,
+                batch_wait=BATCH_WAIT, ready=None):
+    """
+    Run the service until it is cancelled.
+    
+    Args:
+        host (str): The address to listen on.
+        port (int): The port to listen on; 0 picks a free one.
+        workers (int, optional): The number of worker processes. Defaults to the
+            number of CPUs; 0 analyzes in one thread of this process instead.
+        max_batch_size (int): The most texts per batch.
+        batch_wait (float): Seconds to wait for more requests before sending a batch.
+        ready (callable, optional): Called with the (host, port) listened on once
+            the service accepts requests.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+    else:
+        pool = ThreadPoolExecutor(max_workers=1, initializer=init_worker)
+    stats = ServiceStats()
+    batcher = MicroBatcher(pool, max(workers, 1), stats, max_batch_size, batch_wait)
+    service = MoodService(batcher, stats)
+    batcher.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    try:
+        # Build the classifier in every worker before the first request needs it
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(pool, analyze_texts, ["warm up"])
+                               for _ in range(max(workers, 1))])
+        address = server.sockets[0].getsockname()[:2]
+        if ready is not None:
+            ready(address)
+        async with server:
+            await server.serve_forever()
+    finally:
+        server.close()
+        await batcher.stop()
+        pool.shutdown(cancel_futures=True)
+        summary = stats.summary()
+        if summary['requests']:
+            print(f"Served {summary['requests']} requests ({summary['texts']} texts): "
+                  f"p50 {summary['p50_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms, "
+                  f"{summary['texts_per_second']:.0f} texts/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve mood analysis over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: CPU count; 0 analyzes in a thread)")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE, help="most texts per batch")
+    parser.add_argument("--batch-wait", type=float, default=BATCH_WAIT * 1000,
+                        help="milliseconds to wait for more requests before sending a batch")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.batch_size, args.batch_wait / 1000,
+                          ready=lambda address: print(f"Serving mood analysis on http://{address[0]}:{address[1]}")))
+    except KeyboardInterrupt:
+        pass
\ No newline at end of file
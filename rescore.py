@@ -0,0 +1,117 @@
+"""
+Re-score every journal entry with the current mood keywords.
+
+Usage:
+    python rescore.py [--workers N] [--chunksize N]
+
+The journal is read in chunks which are classified in a process pool. Each worker
+builds its mood classifier once, and the rescored chunks are written back in their
+original order as they complete.
+
+The new scores replace the journal in one go, so nothing is written if rescoring
+fails. With the SQLite storage mode this holds the database's write transaction
+for the whole run: saves from the app wait until the rescore finishes, or fail
+once SQLite's busy timeout runs out, so rescore while the app is stopped.
+"""
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import mood_analyzer
+from mood_analyzer import get_classifier
+from data_manager import iter_journal_entries, replace_journal_entries
+
+# Number of entries sent to a worker at a time
+DEFAULT_CHUNKSIZE = 5000
+
+def init_worker():
+    """
+    Build the worker's mood classifier before it receives any chunk.
+    
+    Raises:
+        FileNotFoundError: If the mood keywords could not be loaded, which would
+            otherwise rescore every entry as Neutral.
+    """
+    if get_classifier().mood_data is None:
+        raise FileNotFoundError(f"Mood keywords not found in {mood_analyzer.MOOD_DATA_FILE}; nothing was rescored")
+
+def rescore_texts(texts):
+    """
+    Classify a chunk of entry texts in a worker process.
+    
+    Args:
+        texts (list): The entry contents to classify.
+        
+    Returns:
+        tuple: (moods, mood_scores) lists in the same order as the texts.
+    """
+    results = get_classifier().analyze_batch(texts)
+    return [mood for mood, _, _ in results], [float(score) for _, score, _ in results]
+
+def rescore_chunks(pool, chunks, max_pending):
+    """
+    Classify chunks in the pool and yield them back in their original order.
+    
+    Args:
+        pool (concurrent.futures.Executor): The pool running rescore_texts.
+        chunks (iterable): DataFrames of journal entries.
+        max_pending (int): The most chunks submitted but not yet yielded, to bound memory.
+        
+    Yields:
+        pandas.DataFrame: Each chunk with updated mood and mood_score columns.
+    """
+    pending = deque()
+    for chunk in chunks:
+        pending.append((chunk, pool.submit(rescore_texts, chunk['content'].tolist())))
+        if len(pending) >= max_pending:
+            yield finish_chunk(*pending.popleft())
+    while pending:
+        yield finish_chunk(*pending.popleft())
+
+def finish_chunk(chunk, future):
+    """Fill a chunk's mood columns from its completed rescore_texts future."""
+    moods, mood_scores = future.result()
+    chunk = chunk.copy()
+    chunk['mood'] = moods
+    chunk['mood_score'] = mood_scores
+    return chunk
+
+def report_progress(chunks, start_time):
+    """Pass chunks through, printing the running throughput after each one."""
+    count = 0
+    for chunk in chunks:
+        count += len(chunk)
+        elapsed = time.perf_counter() - start_time
+        print(f"Rescored {count} entries ({count / elapsed:.0f} entries/s)")
+        yield chunk
+
+def rescore_journal(workers=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Re-score every journal entry in a process pool.
+    
+    Args:
+        workers (int, optional): The number of worker processes. Defaults to the
+            number of CPUs.
+        chunksize (int): The number of entries per chunk.
+        
+    Returns:
+        int: The number of entries rescored.
+    """
+    workers = workers or os.cpu_count() or 1
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        chunks = rescore_chunks(pool, iter_journal_entries(chunksize), workers * 2)
+        count = replace_journal_entries(report_progress(chunks, start_time))
+    elapsed = time.perf_counter() - start_time
+    print(f"Done: {count} entries in {elapsed:.1f}s with {workers} workers "
+          f"({count / max(elapsed, 1e-9):.0f} entries/s)")
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score all journal entries with the current mood keywords.")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="entries per chunk")
+    args = parser.parse_args()
+    rescore_journal(args.workers, args.chunksize)
\ No newline at end of file
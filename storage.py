@@ -0,0 +1,2544 @@
+"""
+Storage backends for journal entries.
+
+Every backend stores the same entries, with the columns listed in COLUMNS, and
+implements the JournalBackend interface used by data_manager.
+"""
+import numpy as np
+import pandas as pd
+import os
+import json
+import re
+import sqlite3
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import chain
+
+import metrics
+
+# Inter-process file locks: flock on POSIX, msvcrt on Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Columns of a journal entry
+COLUMNS = ['id', 'date', 'title', 'content', 'mood', 'mood_score']
+
+# Moods detected by the analyzer, the categories of the mood column
+MOODS = ['Joyful', 'Peaceful', 'Energetic', 'Creative', 'Neutral',
+         'Reflective', 'Anxious', 'Sad', 'Angry', 'Confused']
+
+# Text columns are held as Arrow strings when pyarrow is installed (Streamlit
+# depends on it), which keeps the characters in one buffer instead of one Python
+# object per value
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    TEXT_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    pa = None
+    TEXT_DTYPE = object
+
+# Words of a search query; each one matches words starting with it
+SEARCH_TERM = re.compile(r'\w+')
+
+# Periods of the mood rollups, with the SQL expression giving the first day of the
+# bucket containing a date
+ROLLUP_PERIODS = {
+    'day': "{date}",
+    'week': "date({date}, '-6 days', 'weekday 1')",
+    'month': "strftime('%Y-%m-01', {date})",
+}
+
+# Number of stored entries read at a time when an import streams the journal
+IMPORT_CHUNKSIZE = 10000
+
+# Types of the text columns when reading CSV files, so ids like "001" stay text
+CSV_DTYPES = {'id': str, 'title': str, 'content': str}
+
+def format_date(value):
+    """
+    Format a date for storage and comparison.
+    
+    Args:
+        value: A date, datetime or YYYY-MM-DD string.
+        
+    Returns:
+        str: The date in YYYY-MM-DD format.
+    """
+    if hasattr(value, 'strftime'):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
+
+def summarize_moods(mood_counts, score_count, score_sum):
+    """
+    Build mood statistics from per-mood entry counts and mood score totals.
+    
+    Args:
+        mood_counts (dict): Number of entries per mood.
+        score_count (int): Number of entries with a mood score.
+        score_sum (float): Sum of the mood scores.
+        
+    Returns:
+        dict: entries (total count), mood_counts, most_common_mood (ties go to the
+            alphabetically first mood, None without entries) and average_score
+            (None without scores).
+    """
+    mood_counts = {mood: int(count) for mood, count in mood_counts.items() if count > 0}
+    most_common_mood = None
+    if mood_counts:
+        most_common_mood = min(mood_counts, key=lambda mood: (-mood_counts[mood], mood))
+    return {
+        'entries': sum(mood_counts.values()),
+        'mood_counts': mood_counts,
+        'most_common_mood': most_common_mood,
+        'average_score': score_sum / score_count if score_count else None,
+    }
+
+def compact_entries(entries):
+    """
+    Convert journal entries to compact column types.
+    
+    date becomes datetime64, mood a categorical over MOODS (plus any other mood
+    present), mood_score float64, and id, title and content use TEXT_DTYPE.
+    Columns that are not present are skipped.
+    
+    Args:
+        entries (pandas.DataFrame): Journal entries with any column types.
+        
+    Returns:
+        pandas.DataFrame: The entries with compact column types.
+    """
+    entries = entries.copy(deep=False)
+    if 'date' in entries:
+        entries['date'] = pd.to_datetime(entries['date'], errors='coerce')
+    
+    if 'mood' in entries:
+        moods = entries['mood']
+        extra_moods = sorted(set(moods.dropna().unique()) - set(MOODS))
+        entries['mood'] = moods.astype(pd.CategoricalDtype(MOODS + extra_moods))
+    
+    if 'mood_score' in entries:
+        entries['mood_score'] = pd.to_numeric(entries['mood_score'], errors='coerce').astype(float)
+    for column in ['id', 'title', 'content']:
+        if column in entries:
+            entries[column] = entries[column].astype(TEXT_DTYPE)
+    return entries
+
+def storable_entries(entries):
+    """
+    Convert journal entries to plain values for storage.
+    
+    Args:
+        entries (pandas.DataFrame): Journal entries, possibly from compact_entries.
+        
+    Returns:
+        pandas.DataFrame: The entries as Python objects, with dates as YYYY-MM-DD
+            strings and None for missing values.
+    """
+    entries = entries[COLUMNS].copy()
+    if pd.api.types.is_datetime64_any_dtype(entries['date']):
+        entries['date'] = entries['date'].dt.strftime('%Y-%m-%d')
+    entries = entries.astype(object)
+    return entries.where(entries.notna(), None)
+
+def append_entry(entries, entry):
+    """
+    Add an entry at the end of a compact DataFrame of entries.
+    
+    Args:
+        entries (pandas.DataFrame): Entries from compact_entries.
+        entry (dict): The new entry, with a value for every column in COLUMNS.
+        
+    Returns:
+        pandas.DataFrame: A new DataFrame with the entry appended.
+    """
+    entries, new_entry = align_entry(entries, entry)
+    return pd.concat([entries, new_entry], ignore_index=True)
+
+def align_entry(entries, entry):
+    """
+    Convert an entry to a one-row DataFrame with the same column types as entries.
+    
+    Args:
+        entries (pandas.DataFrame): Entries from compact_entries.
+        entry (dict): An entry, with a value for every column in COLUMNS.
+        
+    Returns:
+        tuple: (entries, new_entry), where entries gained the entry's mood as a
+            category if it was missing.
+    """
+    new_entry = compact_entries(pd.DataFrame({column: [entry[column]] for column in COLUMNS}))
+    mood = new_entry['mood'].iloc[0]
+    if pd.notna(mood) and mood not in entries['mood'].cat.categories:
+        entries = entries.assign(mood=entries['mood'].cat.add_categories([mood]))
+    new_entry['mood'] = new_entry['mood'].astype(entries['mood'].dtype)
+    return entries, new_entry
+
+def set_entry(entries, entry, position=None):
+    """
+    Replace the entry with the same id in a compact DataFrame of entries.
+    
+    Args:
+        entries (pandas.DataFrame): Entries from compact_entries.
+        entry (dict): The updated entry, with a value for every column in COLUMNS.
+        position (int, optional): The entry's row, if known; otherwise every row
+            with the entry's id is replaced.
+        
+    Returns:
+        pandas.DataFrame: A new DataFrame with the entry replaced.
+    """
+    entries, new_entry = align_entry(entries.copy(), entry)
+    row = new_entry.iloc[0]
+    if position is not None:
+        for column in COLUMNS[1:]:
+            entries.iloc[position, entries.columns.get_loc(column)] = row[column]
+        return entries
+    mask = entries['id'] == entry['id']
+    for column in COLUMNS[1:]:
+        entries.loc[mask, column] = row[column]
+    return entries
+
+def apply_change(entries, op, arg):
+    """
+    Apply one create, update or delete to a compact DataFrame of entries.
+    
+    Args:
+        entries (pandas.DataFrame): Entries from compact_entries.
+        op (str): "create", "update" or "delete".
+        arg: The entry for a create or update, the entry's ID for a delete.
+        
+    Returns:
+        tuple: (entries, result), where result is False if the entry to update or
+            delete was not found, True if it was, and None for a create.
+    """
+    if op == 'create':
+        return append_entry(entries, arg), None
+    entry_id = arg['id'] if op == 'update' else arg
+    if not (entries['id'] == entry_id).any():
+        return entries, False
+    if op == 'update':
+        return set_entry(entries, arg), True
+    return entries[entries['id'] != entry_id].reset_index(drop=True), True
+
+class JournalBackend:
+    """
+    Interface of a journal storage backend.
+    
+    Subclasses implement load, create, update, delete, iter_chunks and replace,
+    and may override write_batch to store several changes in one write. The
+    lookup helpers get, query, search, page, date_range, mood_stats and
+    mood_rollup default to scanning the result of load; backends with indexes override them
+    and set indexed to True.
+    """
+    
+    # Whether the lookup helpers are answered by indexes rather than scans
+    indexed = False
+    
+    # Whether loading some of the columns is much cheaper than loading all of them
+    columnar = False
+    
+    def version(self):
+        """
+        Get a token that changes whenever the stored entries change.
+        
+        Returns:
+            A comparable value, or None if the backend cannot tell.
+        """
+        return None
+    
+    def follows(self, before, after, changes=1):
+        """
+        Check whether a version is the one right after a number of changes.
+        
+        CachedBackend uses this to tell whether its own writes were the only
+        changes between two versions. Backends whose versions cannot tell assume
+        they were.
+        
+        Args:
+            before: Version read just before a write.
+            after: Version read just after it.
+            changes (int): The number of entries the write changed.
+            
+        Returns:
+            bool: True if no other change happened in between.
+        """
+        return True
+    
+    def change_counts(self):
+        """
+        Count the changes made to the journal, to tell new entries apart from edits.
+        
+        Returns:
+            tuple: (creates, edits) counts that only grow, or None if the backend
+                cannot tell.
+        """
+        return None
+    
+    def write_lock(self):
+        """
+        Get the lock that serializes writers, across processes where needed.
+        
+        Held while reading the version, writing and reading it again, so no other
+        writer can get in between. Backends whose storage serializes writes
+        itself return a lock that does nothing.
+        
+        Returns:
+            A context manager holding the lock.
+        """
+        return nullcontext()
+    
+    def load(self, columns=None):
+        """
+        Load all journal entries.
+        
+        Args:
+            columns (list, optional): Only load these columns.
+            
+        Returns:
+            pandas.DataFrame: A DataFrame containing all journal entries.
+        """
+        raise NotImplementedError
+    
+    def create(self, entry):
+        """
+        Store a new entry.
+        
+        Args:
+            entry (dict): The entry, with a value for every column in COLUMNS.
+        """
+        raise NotImplementedError
+    
+    def update(self, entry):
+        """
+        Replace the stored entry with the same id.
+        
+        Args:
+            entry (dict): The updated entry, with a value for every column in COLUMNS.
+            
+        Returns:
+            bool: True if the entry was found and updated, False otherwise.
+        """
+        raise NotImplementedError
+    
+    def delete(self, entry_id):
+        """
+        Delete an entry.
+        
+        Args:
+            entry_id (str): The ID of the entry to delete.
+            
+        Returns:
+            bool: True if the entry was found and deleted, False otherwise.
+        """
+        raise NotImplementedError
+    
+    def write_batch(self, changes):
+        """
+        Store several changes, in order.
+        
+        Args:
+            changes (list): (op, arg) pairs, where op is "create", "update" or
+                "delete" and arg is the entry, or the entry's ID for a delete.
+                
+        Returns:
+            list: The result of each change, as returned by create, update and delete.
+        """
+        return [getattr(self, op)(arg) for op, arg in changes]
+    
+    def iter_chunks(self, chunksize):
+        """
+        Load all journal entries in chunks.
+        
+        Args:
+            chunksize (int): The number of entries per chunk.
+            
+        Yields:
+            pandas.DataFrame: Consecutive chunks of journal entries, in storage order.
+        """
+        raise NotImplementedError
+    
+    def replace(self, chunks):
+        """
+        Replace all journal entries with the given chunks.
+        
+        Args:
+            chunks (iterable): DataFrames of journal entries, in the order to store them.
+            
+        Returns:
+            int: The number of entries written.
+        """
+        raise NotImplementedError
+    
+    def import_entries(self, chunks):
+        """
+        Add entries, skipping those whose id is already stored or came earlier.
+        
+        The default rewrites the journal through replace, streaming the stored
+        entries followed by the new ones, so only the stored ids are held in memory
+        rather than the entries.
+        
+        Args:
+            chunks (iterable): DataFrames of journal entries with every column in COLUMNS.
+            
+        Returns:
+            int: The number of entries added.
+        """
+        with self.write_lock():
+            ids = set()
+            for chunk in self.iter_chunks(IMPORT_CHUNKSIZE):
+                ids.update(chunk['id'])
+            added = 0
+            
+            def new_chunks():
+                nonlocal added
+                for chunk in chunks:
+                    chunk = chunk[~chunk['id'].map(ids.__contains__).astype(bool)].drop_duplicates('id')
+                    ids.update(chunk['id'])
+                    added += len(chunk)
+                    yield chunk
+            self.replace(chain(self.iter_chunks(IMPORT_CHUNKSIZE), new_chunks()))
+            return added
+    
+    def get(self, entry_id):
+        """
+        Look up one entry by id.
+        
+        Args:
+            entry_id (str): The ID of the entry.
+            
+        Returns:
+            dict: The entry, or None if it does not exist.
+        """
+        entries = self.load()
+        matches = entries[entries['id'] == entry_id]
+        if matches.empty:
+            return None
+        return matches.iloc[0].to_dict()
+    
+    def query(self, start_date=None, end_date=None, mood=None, columns=None):
+        """
+        Load the entries matching a date range and mood.
+        
+        Args:
+            start_date (optional): Earliest date to include.
+            end_date (optional): Latest date to include.
+            mood (str, optional): Only include entries with this mood.
+            columns (list, optional): Only load these columns.
+            
+        Returns:
+            pandas.DataFrame: The matching entries, in storage order.
+        """
+        needed = None
+        if columns is not None:
+            needed = list(columns) + [column for column in ['date', 'mood'] if column not in columns]
+        entries = self.load(needed)
+        mask = pd.Series(True, index=entries.index)
+        if start_date is not None:
+            mask &= entries['date'] >= pd.Timestamp(format_date(start_date))
+        if end_date is not None:
+            mask &= entries['date'] <= pd.Timestamp(format_date(end_date))
+        if mood is not None:
+            mask &= entries['mood'] == mood
+        entries = entries[mask]
+        return entries if columns is None else entries[list(columns)]
+    
+    def search(self, text, mood=None, limit=None, offset=0):
+        """
+        Find the entries whose title or content contains every word of a query.
+        
+        Each query word matches words starting with it, case-insensitively. A query
+        without any words is matched as a plain substring instead.
+        
+        Args:
+            text (str): The search query.
+            mood (str, optional): Only include entries with this mood.
+            limit (int, optional): The most entries to return.
+            offset (int): The number of best matches to skip.
+            
+        Returns:
+            pandas.DataFrame: The matching entries, best matches first.
+        """
+        entries = self.query(mood=mood)
+        end = None if limit is None else offset + limit
+        haystack = (
+            entries['title'].fillna('').astype(str) + ' ' + entries['content'].fillna('').astype(str)
+        ).str.lower()
+        
+        terms = SEARCH_TERM.findall(text.lower())
+        if not terms:
+            return entries[haystack.str.contains(text.lower(), regex=False)].iloc[offset:end]
+        
+        # Rank by the total number of word matches
+        mask = pd.Series(True, index=entries.index)
+        score = pd.Series(0, index=entries.index)
+        for term in terms:
+            hits = haystack.str.count(r'\b' + re.escape(term))
+            mask &= hits > 0
+            score += hits
+        order = score[mask].sort_values(ascending=False, kind='stable').index
+        return entries.loc[order[offset:end]]
+    
+    def page(self, mood=None, after=None, limit=None):
+        """
+        Load one page of entries, newest first.
+        
+        Entries are ordered by date, then by id, both descending, with undated
+        entries last. Pages are found by keyset: the next page starts after the
+        (date, id) of the previous page's last entry, so it does not shift when
+        entries are added to earlier pages.
+        
+        Args:
+            mood (str, optional): Only include entries with this mood.
+            after (tuple, optional): (date, id) of the last entry of the previous
+                page, where date is a YYYY-MM-DD string or None if it had no date.
+            limit (int, optional): The most entries to return.
+            
+        Returns:
+            pandas.DataFrame: The entries of the page, in order.
+        """
+        entries = self.query(mood=mood)
+        if after is not None:
+            after_date, after_id = after
+            if after_date is None:
+                entries = entries[entries['date'].isna() & (entries['id'] < after_id)]
+            else:
+                after_date = pd.Timestamp(after_date)
+                entries = entries[
+                    (entries['date'] < after_date)
+                    | ((entries['date'] == after_date) & (entries['id'] < after_id))
+                    | entries['date'].isna()
+                ]
+        entries = entries.sort_values(['date', 'id'], ascending=False, na_position='last')
+        return entries.head(limit) if limit is not None else entries
+    
+    def date_range(self):
+        """
+        Get the dates of the oldest and newest entries.
+        
+        Returns:
+            tuple: (first_date, last_date) as YYYY-MM-DD strings, or None if there are
+                no entries.
+        """
+        entries = self.load(['date'])
+        if entries.empty:
+            return None
+        return format_date(entries['date'].min()), format_date(entries['date'].max())
+    
+    def mood_stats(self, start_date=None, end_date=None):
+        """
+        Summarize the moods of the entries in a date range.
+        
+        Args:
+            start_date (optional): Earliest date to include.
+            end_date (optional): Latest date to include.
+            
+        Returns:
+            dict: Statistics as returned by summarize_moods.
+        """
+        entries = self.query(start_date, end_date, columns=['mood', 'mood_score'])
+        scores = entries['mood_score'].dropna()
+        return summarize_moods(entries['mood'].value_counts().to_dict(), len(scores), scores.sum())
+    
+    def mood_rollup(self, period, start_date=None, end_date=None):
+        """
+        Count entries and total mood scores per mood and period.
+        
+        Args:
+            period (str): "day", "week" (starting on Monday) or "month".
+            start_date (optional): Only include buckets starting on or after this date.
+            end_date (optional): Only include buckets starting on or before this date.
+            
+        Returns:
+            pandas.DataFrame: One row per bucket and mood, with the bucket's first day,
+                the mood, the number of entries, and the count and sum of mood scores.
+        """
+        entries = self.load(['date', 'mood', 'mood_score']).dropna(subset=['date', 'mood'])
+        dates = entries['date']
+        if period == 'week':
+            dates = dates - pd.to_timedelta(dates.dt.weekday, unit='D')
+        elif period == 'month':
+            dates = dates.dt.to_period('M').dt.start_time
+        elif period != 'day':
+            raise ValueError(f"Unknown rollup period: {period}")
+        entries = entries.assign(bucket=dates.dt.strftime('%Y-%m-%d'))
+        if start_date is not None:
+            entries = entries[entries['bucket'] >= format_date(start_date)]
+        if end_date is not None:
+            entries = entries[entries['bucket'] <= format_date(end_date)]
+        rollup = entries.groupby(['bucket', 'mood'], observed=True).agg(
+            entries=('mood', 'size'),
+            score_count=('mood_score', 'count'),
+            score_sum=('mood_score', 'sum'),
+        )
+        rollup = rollup.reset_index()
+        rollup['mood'] = rollup['mood'].astype(object)
+        return rollup
+
+class SnapshotBackend(JournalBackend):
+    """
+    Base of the backends that keep the whole journal in files rewritten on every change.
+    
+    Writers hold an exclusive lock on lock_file, so a read-modify-write from one
+    session or process never overwrites another's change, and a batch of changes
+    is applied to one load and stored with one rewrite. Subclasses implement load
+    and write.
+    """
+    
+    def __init__(self, lock_file):
+        self.lock = FileLock(lock_file)
+    
+    def write_lock(self):
+        return self.lock
+    
+    def write(self, entries):
+        """
+        Store all entries, replacing the previous ones.
+        
+        Args:
+            entries (pandas.DataFrame): The entries to store.
+        """
+        raise NotImplementedError
+    
+    def write_batch(self, changes):
+        with self.lock:
+            entries = self.load()
+            results = []
+            for op, arg in changes:
+                entries, result = apply_change(entries, op, arg)
+                results.append(result)
+            if any(result is not False for result in results):
+                self.write(entries)
+            return results
+    
+    def create(self, entry):
+        return self.write_batch([('create', entry)])[0]
+    
+    def update(self, entry):
+        return self.write_batch([('update', entry)])[0]
+    
+    def delete(self, entry_id):
+        return self.write_batch([('delete', entry_id)])[0]
+
+class CsvBackend(SnapshotBackend):
+    """Stores the journal in one CSV file, rewritten on every change."""
+    
+    def __init__(self, data_file):
+        super().__init__(data_file + ".lock")
+        self.data_file = data_file
+    
+    def version(self):
+        return file_version(self.data_file)
+    
+    def load(self, columns=None):
+        if os.path.exists(self.data_file):
+            return compact_entries(pd.read_csv(self.data_file, usecols=columns, dtype=CSV_DTYPES))[columns or COLUMNS]
+        # Create a new DataFrame if the file doesn't exist
+        return compact_entries(pd.DataFrame(columns=columns or COLUMNS))
+    
+    def write(self, entries):
+        with atomic_file(self.data_file) as temp_file:
+            entries.to_csv(temp_file, index=False)
+    
+    def iter_chunks(self, chunksize):
+        if os.path.exists(self.data_file):
+            for chunk in pd.read_csv(self.data_file, chunksize=chunksize, dtype=CSV_DTYPES):
+                yield compact_entries(chunk)
+    
+    def replace(self, chunks):
+        # Stream the chunks to a temporary file and move it into place at the end
+        count = 0
+        with self.lock, atomic_file(self.data_file) as temp_file:
+            with open(temp_file, 'w', newline='') as f:
+                for i, chunk in enumerate(chunks):
+                    chunk.to_csv(f, index=False, header=(i == 0))
+                    count += len(chunk)
+                if count == 0:
+                    f.write(','.join(COLUMNS) + '\n')
+        return count
+
+class LogBackend(CsvBackend):
+    """
+    Append-only change log on top of a CSV snapshot.
+    
+    Creates, updates and deletes are appended to the log file as JSON lines, so a
+    write costs one small append however large the journal is, and a batch of
+    changes one append and one fsync. Loading replays the log over the snapshot,
+    and once the log holds compact_threshold records it is folded into a new
+    snapshot. Replaying is idempotent, so a crash between writing the snapshot and
+    truncating the log loses nothing.
+    """
+    
+    def __init__(self, data_file, log_file, compact_threshold):
+        super().__init__(data_file)
+        self.log_file = log_file
+        self.compact_threshold = compact_threshold
+        # IDs of the current entries, known after the first load
+        self.ids = None
+        # Number of records in the log
+        self.records = 0
+        # Log size in bytes after our last read or write, to notice other writers
+        self.size = None
+    
+    def version(self):
+        return file_version(self.data_file), file_version(self.log_file)
+    
+    def read_records(self):
+        """
+        Read the change records from the log.
+        
+        Returns:
+            tuple: (records, size) with the list of records and the log size in bytes.
+        """
+        if not os.path.exists(self.log_file):
+            return [], 0
+        with open(self.log_file, 'rb') as f:
+            data = f.read()
+        records = []
+        for line in data.splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Skip a record left incomplete by an interrupted append
+                continue
+        return records, len(data)
+    
+    def load(self, columns=None):
+        entries = super().load()
+        records, size = self.read_records()
+        
+        if records:
+            rows = OrderedDict((row['id'], row) for row in storable_entries(entries).to_dict('records'))
+            for record in records:
+                entry = record['entry']
+                if record['op'] == 'create':
+                    rows[entry['id']] = entry
+                elif record['op'] == 'update' and entry['id'] in rows:
+                    rows[entry['id']] = entry
+                elif record['op'] == 'delete':
+                    rows.pop(entry['id'], None)
+            entries = compact_entries(pd.DataFrame(list(rows.values()), columns=COLUMNS))
+        
+        self.ids = set(entries['id'])
+        self.records = len(records)
+        self.size = size
+        return entries if columns is None else entries[columns]
+    
+    def current_ids(self):
+        """
+        Get the IDs of the current entries, reloading only if the log changed underneath us.
+        
+        Returns:
+            set: The IDs of the stored entries.
+        """
+        size = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+        if self.ids is None or size != self.size:
+            self.load()
+        return self.ids
+    
+    def append(self, records):
+        """
+        Append change records to the log in one write, compacting it when it gets long.
+        
+        Args:
+            records (list): Dicts with the op ("create", "update" or "delete") and
+                the entry written, or just its id for a delete.
+        """
+        data = ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+        with open(self.log_file, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        self.records += len(records)
+        self.size += len(data)
+        
+        if self.records >= self.compact_threshold:
+            self.compact()
+    
+    def write_batch(self, changes):
+        with self.lock:
+            ids = self.current_ids()
+            records = []
+            results = []
+            try:
+                for op, arg in changes:
+                    entry = {'id': arg} if op == 'delete' else arg
+                    if op == 'create':
+                        ids.add(entry['id'])
+                        results.append(None)
+                    elif entry['id'] in ids:
+                        if op == 'delete':
+                            ids.discard(entry['id'])
+                        results.append(True)
+                    else:
+                        results.append(False)
+                        continue
+                    records.append({'op': op, 'entry': entry})
+                if records:
+                    self.append(records)
+            except Exception:
+                # Reload the IDs rather than trust ones the failed append changed
+                self.ids = None
+                raise
+            return results
+    
+    def compact(self):
+        """Fold the log into a new snapshot and empty the log."""
+        with self.lock:
+            self.write(self.load())
+            self.reset()
+    
+    def reset(self):
+        """Empty the log after the snapshot was replaced with all entries."""
+        open(self.log_file, 'wb').close()
+        self.ids = None
+        self.records = 0
+        self.size = 0
+    
+    def replay(self, records, snapshot_ids):
+        """
+        Work out what a log does to the snapshot, the way load replays it.
+        
+        Args:
+            records (list): The change records, as returned by read_records.
+            snapshot_ids (set): Those of the ids in the records that the snapshot holds.
+        
+        Returns:
+            tuple: (removed, replaced, appended): the set of snapshot ids deleted, a
+                dict of the snapshot entries changed in place by id, and an
+                OrderedDict of the entries added after the snapshot's, by id.
+        """
+        removed = set()
+        replaced = {}
+        appended = OrderedDict()
+        for record in records:
+            entry = record['entry']
+            entry_id = entry['id']
+            in_place = entry_id in snapshot_ids and entry_id not in removed
+            if record['op'] == 'delete':
+                if in_place:
+                    removed.add(entry_id)
+                    replaced.pop(entry_id, None)
+                else:
+                    appended.pop(entry_id, None)
+            elif in_place:
+                replaced[entry_id] = entry
+            elif record['op'] == 'create' or entry_id in appended:
+                appended[entry_id] = entry
+        return removed, replaced, appended
+    
+    def iter_chunks(self, chunksize):
+        # Replay the log over the snapshot as it is read, without compacting it,
+        # so only the entries the log touches are held in memory
+        records, _ = self.read_records()
+        if not records:
+            yield from super().iter_chunks(chunksize)
+            return
+        
+        logged_ids = {record['entry']['id'] for record in records}
+        snapshot_ids = set()
+        if os.path.exists(self.data_file):
+            for chunk in pd.read_csv(self.data_file, usecols=['id'], chunksize=chunksize, dtype=CSV_DTYPES):
+                snapshot_ids.update(chunk['id'][chunk['id'].isin(logged_ids)])
+        removed, replaced, appended = self.replay(records, snapshot_ids)
+        
+        if os.path.exists(self.data_file):
+            for chunk in pd.read_csv(self.data_file, chunksize=chunksize, dtype=CSV_DTYPES):
+                chunk = chunk[~chunk['id'].isin(removed)]
+                changed = chunk['id'].isin(replaced)
+                if changed.any():
+                    rows = [replaced[entry_id] for entry_id in chunk.loc[changed, 'id']]
+                    chunk = chunk.astype({'mood_score': float})
+                    chunk.loc[changed, COLUMNS] = pd.DataFrame(rows, columns=COLUMNS, index=chunk.index[changed])
+                if len(chunk):
+                    yield compact_entries(chunk)
+        rows = list(appended.values())
+        for start in range(0, len(rows), chunksize):
+            yield compact_entries(pd.DataFrame(rows[start:start + chunksize], columns=COLUMNS))
+    
+    def replace(self, chunks):
+        with self.lock:
+            count = super().replace(chunks)
+            self.reset()
+            return count
+
+class ArrowBackend(SnapshotBackend):
+    """
+    Stores the journal in memory-mapped Arrow IPC files.
+    
+    Entry contents are kept in a file of their own, next to the ids, so reads that
+    do not need them, like the analytics charts, only map the small file holding
+    the other columns, without parsing it. Turning the mapped columns into a
+    DataFrame still copies the dates, moods and scores; only the requested columns
+    are converted, and strings stay in their Arrow buffers. Every write rewrites
+    both files. Requires pyarrow.
+    """
+    
+    columnar = True
+    
+    def __init__(self, data_file, content_file, import_file=None):
+        """
+        Open the journal files.
+        
+        Args:
+            data_file (str): Path to the Arrow file holding every column but content.
+            content_file (str): Path to the Arrow file holding ids and contents.
+            import_file (str, optional): CSV file imported once when the Arrow files
+                are first created.
+        """
+        if pa is None:
+            raise ImportError("The Arrow storage backend requires pyarrow")
+        super().__init__(data_file + ".lock")
+        self.data_file = data_file
+        self.content_file = content_file
+        if not os.path.exists(data_file) and import_file and os.path.exists(import_file):
+            with self.lock:
+                if not os.path.exists(data_file):
+                    entries = CsvBackend(import_file).load()
+                    self.write(entries)
+                    print(f"Imported {len(entries)} journal entries from {import_file} into {data_file}")
+    
+    def version(self):
+        return file_version(self.data_file), file_version(self.content_file)
+    
+    @staticmethod
+    def read_table(path, columns):
+        """Map an Arrow IPC file and select some of its columns, without reading the others."""
+        with pa.memory_map(path, 'r') as source:
+            return pa.ipc.open_file(source).read_all().select(columns)
+    
+    @staticmethod
+    def write_table(path, table):
+        """Write an Arrow IPC file, replacing it in one step."""
+        with atomic_file(path) as temp_file:
+            with pa.OSFile(temp_file, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+    
+    def load(self, columns=None):
+        columns = list(columns or COLUMNS)
+        if not os.path.exists(self.data_file):
+            return compact_entries(pd.DataFrame(columns=columns))
+        
+        table = self.read_table(self.data_file, [column for column in columns if column != 'content'])
+        if 'content' in columns:
+            ids = table.column('id') if 'id' in columns else self.read_table(self.data_file, ['id']).column('id')
+            contents = self.read_table(self.content_file, ['id', 'content'])
+            content = contents.column('content')
+            if not contents.column('id').equals(ids):
+                # An interrupted write left the files out of step; match contents by id
+                lookup = dict(zip(contents.column('id').to_pylist(), content.to_pylist()))
+                content = pa.array([lookup.get(entry_id) for entry_id in ids.to_pylist()], pa.string())
+            table = table.append_column('content', content)
+        
+        return self.to_entries(table)[columns]
+    
+    @staticmethod
+    def to_entries(table):
+        """
+        Convert an Arrow table of entries to a DataFrame from compact_entries.
+        
+        The table is used up by the conversion and must not be read afterwards.
+        """
+        # Strings stay in their Arrow buffers rather than becoming Python objects.
+        # The other columns are copied, one block per column, each released from
+        # the table as soon as it is converted instead of holding both at once
+        entries = table.to_pandas(
+            types_mapper={pa.string(): TEXT_DTYPE, pa.large_string(): TEXT_DTYPE}.get
+            if TEXT_DTYPE is not object else None,
+            split_blocks=True,
+            self_destruct=True
+        )
+        return compact_entries(entries)
+    
+    def write(self, entries):
+        entries = compact_entries(entries[COLUMNS])
+        data = pa.Table.from_pandas(entries.drop(columns='content'), preserve_index=False)
+        contents = pa.Table.from_pandas(entries[['id', 'content']], preserve_index=False)
+        self.write_table(self.content_file, contents)
+        self.write_table(self.data_file, data)
+    
+    def iter_chunks(self, chunksize):
+        if not os.path.exists(self.data_file):
+            return
+        # Slices of the mapped tables are views, so only the chunk being converted
+        # is copied into memory
+        with pa.memory_map(self.data_file, 'r') as data_source, pa.memory_map(self.content_file, 'r') as content_source:
+            data = pa.ipc.open_file(data_source).read_all()
+            contents = pa.ipc.open_file(content_source).read_all()
+            if not contents.column('id').equals(data.column('id')):
+                # An interrupted write left the files out of step; load matches them by id
+                entries = self.load()
+                for start in range(0, len(entries), chunksize):
+                    yield entries.iloc[start:start + chunksize]
+                return
+            for start in range(0, data.num_rows, chunksize):
+                table = data.slice(start, chunksize).append_column(
+                    'content', contents.column('content').slice(start, chunksize)
+                )
+                yield self.to_entries(table)[COLUMNS]
+    
+    def replace(self, chunks):
+        # Write each chunk as a record batch, so only one is in memory at a time.
+        # Moods are stored as plain strings, since every batch of an IPC file must
+        # share one dictionary; load makes them categorical again
+        schema = pa.schema([
+            ('id', pa.string()), ('date', pa.timestamp('us')), ('title', pa.string()),
+            ('mood', pa.string()), ('mood_score', pa.float64()),
+        ])
+        content_schema = pa.schema([('id', pa.string()), ('content', pa.string())])
+        count = 0
+        with self.lock, atomic_file(self.data_file) as data_temp, atomic_file(self.content_file) as content_temp:
+            with pa.OSFile(data_temp, 'wb') as data_sink, pa.OSFile(content_temp, 'wb') as content_sink:
+                with pa.ipc.new_file(data_sink, schema) as data_writer, \
+                        pa.ipc.new_file(content_sink, content_schema) as content_writer:
+                    for chunk in chunks:
+                        chunk = compact_entries(chunk[COLUMNS]).astype({'mood': object})
+                        data_writer.write_table(pa.Table.from_pandas(
+                            chunk.drop(columns='content'), schema=schema, preserve_index=False
+                        ))
+                        content_writer.write_table(pa.Table.from_pandas(
+                            chunk[['id', 'content']], schema=content_schema, preserve_index=False
+                        ))
+                        count += len(chunk)
+        return count
+
+class SQLiteBackend(JournalBackend):
+    """
+    Stores the journal in an SQLite database.
+    
+    Entries are indexed by id, date and mood, so lookups, date ranges and mood
+    filters are answered by index queries instead of scanning every entry. Titles
+    and contents are also indexed in an FTS5 full-text table, which answers
+    searches, and the mood_rollup table keeps per-day, per-week and per-month
+    entry counts and score totals for each mood, which answer mood statistics.
+    Both are kept in sync with the entries table by triggers, as is the counter
+    in journal_version, which goes up by one for every entry changed.
+    """
+    
+    indexed = True
+    
+    def __init__(self, db_file, import_file=None):
+        """
+        Open the database, creating it if needed.
+        
+        Args:
+            db_file (str): Path to the SQLite database file.
+            import_file (str, optional): CSV file imported once when the database is
+                first created.
+        """
+        self.db_file = db_file
+        # Processes opening a new database at the same time would otherwise both
+        # create and fill the schema
+        with FileLock(db_file + ".lock"):
+            is_new = not os.path.exists(db_file)
+            with self.connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                has_search_index = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'entries_fts'"
+                ).fetchone() is not None
+                has_rollup = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'mood_rollup'"
+                ).fetchone() is not None
+                has_version = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'journal_version'"
+                ).fetchone() is not None
+                rollup_trigger = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE name = 'entries_rollup_insert'"
+                ).fetchone()
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS entries (
+                        seq INTEGER PRIMARY KEY,
+                        id TEXT NOT NULL UNIQUE,
+                        date TEXT,
+                        title TEXT,
+                        content TEXT,
+                        mood TEXT,
+                        mood_score REAL
+                    );
+                    CREATE INDEX IF NOT EXISTS entries_date ON entries (date);
+                    CREATE INDEX IF NOT EXISTS entries_mood ON entries (mood, date);
+                
+                    CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5 (
+                        title, content, content='entries', content_rowid='seq'
+                    );
+                    CREATE TRIGGER IF NOT EXISTS entries_fts_insert AFTER INSERT ON entries BEGIN
+                        INSERT INTO entries_fts (rowid, title, content)
+                        VALUES (new.seq, new.title, new.content);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS entries_fts_delete AFTER DELETE ON entries BEGIN
+                        INSERT INTO entries_fts (entries_fts, rowid, title, content)
+                        VALUES ('delete', old.seq, old.title, old.content);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS entries_fts_update AFTER UPDATE ON entries BEGIN
+                        INSERT INTO entries_fts (entries_fts, rowid, title, content)
+                        VALUES ('delete', old.seq, old.title, old.content);
+                        INSERT INTO entries_fts (rowid, title, content)
+                        VALUES (new.seq, new.title, new.content);
+                    END;
+                """)
+                if not has_search_index:
+                    # Index the entries of a database created before full-text search
+                    conn.execute("INSERT INTO entries_fts (entries_fts) VALUES ('rebuild')")
+            
+                # Triggers from before malformed dates were skipped could not roll up
+                # every entry; replace them and roll the entries up again
+                outdated_rollup = rollup_trigger is not None and "date(new.date)" not in rollup_trigger[0]
+                if outdated_rollup:
+                    for trigger in ('insert', 'delete', 'update_old', 'update_new'):
+                        conn.execute(f"DROP TRIGGER IF EXISTS entries_rollup_{trigger}")
+                    conn.execute("DELETE FROM mood_rollup")
+                conn.executescript(self.rollup_schema())
+                if not has_rollup or outdated_rollup:
+                    # Roll up the entries of a database created before mood rollups
+                    for period, bucket in ROLLUP_PERIODS.items():
+                        conn.execute(
+                            "INSERT INTO mood_rollup "
+                            f"SELECT '{period}', {bucket.format(date='date')}, mood, "
+                            "COUNT(*), COUNT(mood_score), TOTAL(mood_score) "
+                            "FROM entries WHERE date(date) IS NOT NULL AND mood IS NOT NULL "
+                            "GROUP BY 2, 3"
+                        )
+            
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS journal_version (version INTEGER NOT NULL);
+                    CREATE TRIGGER IF NOT EXISTS entries_version_insert AFTER INSERT ON entries BEGIN
+                        UPDATE journal_version SET version = version + 1;
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS entries_version_update AFTER UPDATE ON entries BEGIN
+                        UPDATE journal_version SET version = version + 1;
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS entries_version_delete AFTER DELETE ON entries BEGIN
+                        UPDATE journal_version SET version = version + 1;
+                    END;
+                """)
+                if not has_version:
+                    conn.execute("INSERT INTO journal_version (version) VALUES (0)")
+            if is_new and import_file and os.path.exists(import_file):
+                count = self.import_csv(import_file)
+                print(f"Imported {count} journal entries from {import_file} into {db_file}")
+    
+    @staticmethod
+    def rollup_schema():
+        """
+        Build the SQL creating the mood_rollup table and the triggers maintaining it.
+        
+        Returns:
+            str: The SQL script.
+        """
+        add = []
+        remove = []
+        for period, bucket in ROLLUP_PERIODS.items():
+            add.append(f"""
+                    INSERT INTO mood_rollup (period, bucket, mood, entries, score_count, score_sum)
+                    VALUES ('{period}', {bucket.format(date='new.date')}, new.mood, 1,
+                            new.mood_score IS NOT NULL, coalesce(new.mood_score, 0))
+                    ON CONFLICT (period, bucket, mood) DO UPDATE SET
+                        entries = entries + 1,
+                        score_count = score_count + excluded.score_count,
+                        score_sum = score_sum + excluded.score_sum;""")
+            remove.append(f"""
+                    UPDATE mood_rollup SET
+                        entries = entries - 1,
+                        score_count = score_count - (old.mood_score IS NOT NULL),
+                        score_sum = score_sum - coalesce(old.mood_score, 0)
+                    WHERE period = '{period}' AND bucket = {bucket.format(date='old.date')} AND mood = old.mood;
+                    DELETE FROM mood_rollup
+                    WHERE period = '{period}' AND bucket = {bucket.format(date='old.date')} AND mood = old.mood
+                        AND entries = 0;""")
+        add = "".join(add)
+        remove = "".join(remove)
+        # Entries without a valid date have no bucket, so they are not rolled up
+        new_ok = "date(new.date) IS NOT NULL AND new.mood IS NOT NULL"
+        old_ok = "date(old.date) IS NOT NULL AND old.mood IS NOT NULL"
+        return f"""
+            CREATE TABLE IF NOT EXISTS mood_rollup (
+                period TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                mood TEXT NOT NULL,
+                entries INTEGER NOT NULL,
+                score_count INTEGER NOT NULL,
+                score_sum REAL NOT NULL,
+                PRIMARY KEY (period, bucket, mood)
+            );
+            CREATE TRIGGER IF NOT EXISTS entries_rollup_insert AFTER INSERT ON entries
+            WHEN {new_ok} BEGIN{add}
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_rollup_delete AFTER DELETE ON entries
+            WHEN {old_ok} BEGIN{remove}
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_rollup_update_old AFTER UPDATE ON entries
+            WHEN {old_ok} BEGIN{remove}
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_rollup_update_new AFTER UPDATE ON entries
+            WHEN {new_ok} BEGIN{add}
+            END;
+        """
+    
+    def connect(self):
+        """
+        Open a connection that commits on success when used as a context manager.
+        
+        Returns:
+            ClosingConnection: A context manager yielding the sqlite3 connection.
+        """
+        return ClosingConnection(sqlite3.connect(self.db_file, timeout=30))
+    
+    def version(self):
+        with self.connect() as conn:
+            return conn.execute("SELECT version FROM journal_version").fetchone()[0]
+    
+    def follows(self, before, after, changes=1):
+        return after == before + changes
+    
+    @staticmethod
+    def rows(chunk):
+        """Convert a DataFrame of entries to parameter tuples, with None for missing values."""
+        return storable_entries(chunk).values.tolist()
+    
+    def select(self, where="", params=(), columns=None):
+        """Run a SELECT over the entries in storage order."""
+        sql = f"SELECT {', '.join(columns or COLUMNS)} FROM entries {where} ORDER BY seq"
+        with self.connect() as conn:
+            return compact_entries(pd.read_sql_query(sql, conn, params=params))
+    
+    def load(self, columns=None):
+        return self.select(columns=columns)
+    
+    @staticmethod
+    def execute_change(conn, op, arg):
+        """Run one create, update or delete on a connection and return its result."""
+        if op == 'create':
+            conn.execute(
+                f"INSERT INTO entries ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                [arg[column] for column in COLUMNS]
+            )
+            return None
+        if op == 'update':
+            cursor = conn.execute(
+                "UPDATE entries SET date = ?, title = ?, content = ?, mood = ?, mood_score = ? "
+                "WHERE id = ?",
+                [arg[column] for column in COLUMNS[1:]] + [arg['id']]
+            )
+        else:
+            cursor = conn.execute("DELETE FROM entries WHERE id = ?", (arg,))
+        return cursor.rowcount > 0
+    
+    def create(self, entry):
+        return self.write_batch([('create', entry)])[0]
+    
+    def update(self, entry):
+        return self.write_batch([('update', entry)])[0]
+    
+    def delete(self, entry_id):
+        return self.write_batch([('delete', entry_id)])[0]
+    
+    def write_batch(self, changes):
+        # One transaction, so the whole batch costs a single commit
+        with self.connect() as conn:
+            return [self.execute_change(conn, op, arg) for op, arg in changes]
+    
+    def iter_chunks(self, chunksize):
+        # Page through the table by seq so only one chunk is held at a time
+        last_seq = 0
+        while True:
+            with self.connect() as conn:
+                chunk = pd.read_sql_query(
+                    f"SELECT seq, {', '.join(COLUMNS)} FROM entries WHERE seq > ? ORDER BY seq LIMIT ?",
+                    conn, params=(last_seq, chunksize)
+                )
+            if chunk.empty:
+                return
+            last_seq = int(chunk['seq'].iloc[-1])
+            yield compact_entries(chunk[COLUMNS])
+    
+    def replace(self, chunks):
+        count = 0
+        with self.connect() as conn:
+            conn.execute("DELETE FROM entries")
+            for chunk in chunks:
+                conn.executemany(
+                    f"INSERT INTO entries ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    self.rows(chunk)
+                )
+                count += len(chunk)
+        return count
+    
+    def import_csv(self, csv_file, chunksize=10000):
+        """
+        Import entries from a CSV file, skipping ids that are already stored.
+        
+        Args:
+            csv_file (str): Path to a CSV file of journal entries.
+            chunksize (int): The number of entries read at a time.
+            
+        Returns:
+            int: The number of entries imported.
+        """
+        return self.import_entries(pd.read_csv(csv_file, chunksize=chunksize, dtype=CSV_DTYPES))
+    
+    def import_entries(self, chunks):
+        # The primary key skips ids already stored, without reading them
+        count = 0
+        with self.connect() as conn:
+            for chunk in chunks:
+                cursor = conn.executemany(
+                    f"INSERT OR IGNORE INTO entries ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    self.rows(chunk)
+                )
+                count += cursor.rowcount
+        return count
+    
+    def get(self, entry_id):
+        entries = self.select("WHERE id = ?", (entry_id,))
+        if entries.empty:
+            return None
+        return entries.iloc[0].to_dict()
+    
+    def query(self, start_date=None, end_date=None, mood=None, columns=None):
+        conditions = []
+        params = []
+        if start_date is not None:
+            conditions.append("date >= ?")
+            params.append(format_date(start_date))
+        if end_date is not None:
+            conditions.append("date <= ?")
+            params.append(format_date(end_date))
+        if mood is not None:
+            conditions.append("mood = ?")
+            params.append(mood)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        return self.select(where, params, columns)
+    
+    def search(self, text, mood=None, limit=None, offset=0):
+        terms = SEARCH_TERM.findall(text)
+        if not terms:
+            return super().search(text, mood, limit, offset)
+        
+        # Every term must match the start of a word; titles weigh double in the ranking
+        match = " ".join('"' + term + '"*' for term in terms)
+        sql = (
+            f"SELECT {', '.join('e.' + column for column in COLUMNS)} "
+            "FROM entries_fts JOIN entries e ON e.seq = entries_fts.rowid "
+            "WHERE entries_fts MATCH ?"
+        )
+        params = [match]
+        if mood is not None:
+            sql += " AND e.mood = ?"
+            params.append(mood)
+        sql += " ORDER BY bm25(entries_fts, 2.0, 1.0) LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else int(limit), int(offset)]
+        with self.connect() as conn:
+            return compact_entries(pd.read_sql_query(sql, conn, params=params))
+    
+    def page(self, mood=None, after=None, limit=None):
+        # Dated entries walk the date (or mood, date) index from the cursor; undated
+        # ones, which row values never match, are only read once those run out
+        conditions = []
+        params = []
+        if mood is not None:
+            conditions.append("mood = ?")
+            params.append(mood)
+        limit = -1 if limit is None else int(limit)
+        
+        pages = []
+        if after is None or after[0] is not None:
+            dated = conditions + ["date IS NOT NULL"]
+            dated_params = list(params)
+            if after is not None:
+                dated.append("(date, id) < (?, ?)")
+                dated_params += [format_date(after[0]), after[1]]
+            with self.connect() as conn:
+                pages.append(pd.read_sql_query(
+                    f"SELECT {', '.join(COLUMNS)} FROM entries WHERE {' AND '.join(dated)} "
+                    "ORDER BY date DESC, id DESC LIMIT ?",
+                    conn, params=dated_params + [limit]
+                ))
+        
+        remaining = limit if limit < 0 else limit - sum(len(page) for page in pages)
+        if remaining != 0:
+            undated = conditions + ["date IS NULL"]
+            undated_params = list(params)
+            if after is not None and after[0] is None:
+                undated.append("id < ?")
+                undated_params.append(after[1])
+            with self.connect() as conn:
+                pages.append(pd.read_sql_query(
+                    f"SELECT {', '.join(COLUMNS)} FROM entries WHERE {' AND '.join(undated)} "
+                    "ORDER BY id DESC LIMIT ?",
+                    conn, params=undated_params + [remaining]
+                ))
+        return compact_entries(pd.concat(pages, ignore_index=True))
+    
+    def date_range(self):
+        with self.connect() as conn:
+            first, last = conn.execute("SELECT MIN(date), MAX(date) FROM entries").fetchone()
+        if first is None:
+            return None
+        return first, last
+    
+    def mood_stats(self, start_date=None, end_date=None):
+        start = format_date(start_date) if start_date is not None else '0000-01-01'
+        end = format_date(end_date) if end_date is not None else '9999-12-31'
+        
+        # Whole months inside the range come from the monthly rollup, the days of
+        # partially covered months from the daily rollup
+        month_end = "date({month}, '+1 month', '-1 day')"
+        day_month = "strftime('%Y-%m-01', bucket)"
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT mood, SUM(entries), SUM(score_count), SUM(score_sum) FROM mood_rollup "
+                "WHERE (period = 'month' AND bucket >= :start "
+                f"       AND {month_end.format(month='bucket')} <= :end) "
+                "   OR (period = 'day' AND bucket BETWEEN :start AND :end "
+                f"      AND NOT ({day_month} >= :start AND {month_end.format(month=day_month)} <= :end)) "
+                "GROUP BY mood",
+                {'start': start, 'end': end}
+            ).fetchall()
+            if start_date is None and end_date is None:
+                # Entries without a valid date are in no bucket, but belong to the
+                # whole journal
+                rows += conn.execute(
+                    "SELECT mood, COUNT(*), COUNT(mood_score), TOTAL(mood_score) FROM entries "
+                    "WHERE date(date) IS NULL AND mood IS NOT NULL GROUP BY mood"
+                ).fetchall()
+        mood_counts = {}
+        for mood, count, _, _ in rows:
+            mood_counts[mood] = mood_counts.get(mood, 0) + count
+        return summarize_moods(
+            mood_counts,
+            sum(score_count for _, _, score_count, _ in rows),
+            sum(score_sum for _, _, _, score_sum in rows)
+        )
+    
+    def mood_rollup(self, period, start_date=None, end_date=None):
+        if period not in ROLLUP_PERIODS:
+            raise ValueError(f"Unknown rollup period: {period}")
+        conditions = ["period = ?"]
+        params = [period]
+        if start_date is not None:
+            conditions.append("bucket >= ?")
+            params.append(format_date(start_date))
+        if end_date is not None:
+            conditions.append("bucket <= ?")
+            params.append(format_date(end_date))
+        with self.connect() as conn:
+            return pd.read_sql_query(
+                "SELECT bucket, mood, entries, score_count, score_sum FROM mood_rollup "
+                f"WHERE {' AND '.join(conditions)} ORDER BY bucket, mood",
+                conn, params=params
+            )
+
+# Date of undated entries in EntryIndex, sorting before every real date
+NO_DATE = np.iinfo(np.int64).min
+
+def date_value(value):
+    """Convert a date to the nanoseconds EntryIndex sorts by, or NO_DATE if it is missing."""
+    if value is None or pd.isna(value):
+        return NO_DATE
+    return pd.Timestamp(value).value
+
+def insert_sorted(array, value):
+    """Return a copy of a sorted array with a value inserted in order."""
+    return np.insert(array, np.searchsorted(array, value), value)
+
+def remove_sorted(array, value):
+    """Return a copy of a sorted array without one occurrence of a value in it."""
+    return np.delete(array, np.searchsorted(array, value))
+
+class EntryIndex:
+    """
+    In-memory indexes of a compact DataFrame of journal entries.
+    
+    Every entry gets a label that stays the same while it exists. Labels grow down
+    the DataFrame, so an entry's row is found by binary search over them. On top
+    of that, the index keeps:
+        ids:    a hash of entry ids to labels
+        dates:  the labels of dated entries sorted by date, then id, so date ranges
+                and keyset pages are sliced out by binary search
+        moods:  a posting list of labels per mood, in storage order
+    apply makes a change to the DataFrame and the indexes together, so they are
+    kept up to date without rescanning the entries.
+    """
+    
+    def __init__(self, entries):
+        """
+        Index entries.
+        
+        Args:
+            entries (pandas.DataFrame): Entries from compact_entries.
+        """
+        count = len(entries)
+        labels = np.arange(count, dtype=np.int64)
+        ids = entries['id'].astype(object).to_numpy()
+        dates = entries['date'].astype('datetime64[ns]').to_numpy().view(np.int64)
+        
+        self.entries = entries
+        self.labels = labels
+        self.next_label = count
+        # If an id appears twice, the first entry wins, as with a scan
+        self.ids = dict(zip(ids[::-1].tolist(), labels[::-1].tolist()))
+        
+        dated = dates != NO_DATE
+        order = pd.DataFrame({'date': dates[dated], 'id': ids[dated], 'label': labels[dated]})
+        order = order.sort_values(['date', 'id'], kind='stable')
+        self.date_values = order['date'].to_numpy(dtype=np.int64)
+        self.date_ids = order['id'].to_numpy(dtype=object)
+        self.date_labels = order['label'].to_numpy(dtype=np.int64)
+        # Labels of the undated entries
+        self.undated = labels[~dated]
+        
+        moods = entries['mood'].astype(object)
+        self.moods = {
+            mood: labels[positions]
+            for mood, positions in moods.groupby(moods.to_numpy(), sort=False).indices.items()
+        }
+    
+    def rows(self, labels, columns=None):
+        """
+        Get the entries with some labels.
+        
+        Args:
+            labels (numpy.ndarray): The labels, in the order to return the entries.
+            columns (list, optional): Only return these columns.
+            
+        Returns:
+            pandas.DataFrame: The entries, keeping their row labels in the DataFrame.
+        """
+        entries = self.entries if columns is None else self.entries[list(columns)]
+        return entries.iloc[np.searchsorted(self.labels, labels)]
+    
+    def get(self, entry_id):
+        """Look up one entry by id, returning a dict of its fields or None."""
+        label = self.ids.get(entry_id)
+        if label is None:
+            return None
+        return self.entries.iloc[int(np.searchsorted(self.labels, label))].to_dict()
+    
+    def select(self, start_date=None, end_date=None, mood=None):
+        """
+        Find the entries within a date range and with a mood.
+        
+        Returns:
+            numpy.ndarray: Their labels, in storage order.
+        """
+        labels = None
+        if start_date is not None or end_date is not None:
+            start, end = 0, len(self.date_values)
+            if start_date is not None:
+                start = np.searchsorted(self.date_values, date_value(format_date(start_date)), 'left')
+            if end_date is not None:
+                end = np.searchsorted(self.date_values, date_value(format_date(end_date)), 'right')
+            labels = np.sort(self.date_labels[start:end])
+        if mood is not None:
+            posting = self.moods.get(mood, self.labels[:0])
+            labels = posting if labels is None else np.intersect1d(labels, posting, assume_unique=True)
+        return self.labels if labels is None else labels
+    
+    def page(self, mood=None, after=None, limit=None):
+        """
+        Find one page of entries, ordered as JournalBackend.page orders them.
+        
+        Dated entries are walked from the newest back, in growing chunks, so a page
+        only looks at about as many entries as it returns unless its mood is rare.
+        
+        Returns:
+            numpy.ndarray: The labels of the page's entries, in order.
+        """
+        posting = None if mood is None else self.moods.get(mood, self.labels[:0])
+        after_date, after_id = after if after is not None else (None, None)
+        pages = []
+        found = 0
+        
+        if after is None or after_date is not None:
+            end = len(self.date_values)
+            if after is not None:
+                value = date_value(after_date)
+                start = np.searchsorted(self.date_values, value, 'left')
+                stop = np.searchsorted(self.date_values, value, 'right')
+                end = start + np.searchsorted(self.date_ids[start:stop], after_id, 'left')
+            chunk = max(64, 2 * (limit or 0))
+            while end > 0 and (limit is None or found < limit):
+                start = 0 if limit is None else max(0, end - chunk)
+                labels = self.date_labels[start:end][::-1]
+                if posting is not None:
+                    labels = labels[self.contains(posting, labels)]
+                pages.append(labels)
+                found += len(labels)
+                end = start
+                chunk *= 2
+        
+        if (limit is None or found < limit) and len(self.undated):
+            labels = self.undated
+            if posting is not None:
+                labels = labels[self.contains(posting, labels)]
+            ids = self.rows(labels, ['id'])['id'].astype(object).to_numpy()
+            if after is not None and after_date is None:
+                labels, ids = labels[ids < after_id], ids[ids < after_id]
+            pages.append(labels[np.argsort(ids, kind='stable')[::-1]])
+        
+        labels = np.concatenate(pages) if pages else self.labels[:0]
+        return labels if limit is None else labels[:limit]
+    
+    @staticmethod
+    def contains(posting, labels):
+        """Tell which labels are in a posting list, by binary search."""
+        if not len(posting):
+            return np.zeros(len(labels), dtype=bool)
+        positions = np.minimum(np.searchsorted(posting, labels), len(posting) - 1)
+        return posting[positions] == labels
+    
+    def date_range(self):
+        """Get the first and last dates as YYYY-MM-DD strings, or None without dated entries."""
+        if not len(self.date_values):
+            return None
+        return format_date(pd.Timestamp(self.date_values[0])), format_date(pd.Timestamp(self.date_values[-1]))
+    
+    def apply(self, op, arg):
+        """
+        Apply one create, update or delete to the entries and the indexes.
+        
+        Args:
+            op (str): "create", "update" or "delete".
+            arg: The entry for a create or update, the entry's ID for a delete.
+            
+        Returns:
+            The result apply_change would return; the new entries are in self.entries.
+        """
+        if op == 'create':
+            self.entries = append_entry(self.entries, arg)
+            label = self.next_label
+            self.next_label += 1
+            self.labels = np.append(self.labels, label)
+            self.ids.setdefault(arg['id'], label)
+            self.add(label, self.entries.iloc[-1])
+            return None
+        
+        entry_id = arg['id'] if op == 'update' else arg
+        label = self.ids.get(entry_id)
+        if label is None:
+            return False
+        position = int(np.searchsorted(self.labels, label))
+        self.remove(label, self.entries.iloc[position])
+        if op == 'update':
+            self.entries = set_entry(self.entries, arg, position)
+            self.add(label, self.entries.iloc[position])
+        else:
+            del self.ids[entry_id]
+            self.labels = np.delete(self.labels, position)
+            self.entries = pd.concat(
+                [self.entries.iloc[:position], self.entries.iloc[position + 1:]], ignore_index=True
+            )
+        return True
+    
+    def add(self, label, row):
+        """Add an entry to the date index and its mood's posting list."""
+        value = date_value(row['date'])
+        if value == NO_DATE:
+            self.undated = insert_sorted(self.undated, label)
+        else:
+            start = np.searchsorted(self.date_values, value, 'left')
+            stop = np.searchsorted(self.date_values, value, 'right')
+            i = start + np.searchsorted(self.date_ids[start:stop], row['id'], 'right')
+            self.date_values = np.insert(self.date_values, i, value)
+            self.date_ids = np.insert(self.date_ids, i, row['id'])
+            self.date_labels = np.insert(self.date_labels, i, label)
+        if pd.notna(row['mood']):
+            self.moods[row['mood']] = insert_sorted(self.moods.get(row['mood'], self.labels[:0]), label)
+    
+    def remove(self, label, row):
+        """Remove an entry from the date index and its mood's posting list."""
+        value = date_value(row['date'])
+        if value == NO_DATE:
+            self.undated = remove_sorted(self.undated, label)
+        else:
+            start = np.searchsorted(self.date_values, value, 'left')
+            stop = np.searchsorted(self.date_values, value, 'right')
+            i = start + np.flatnonzero(self.date_labels[start:stop] == label)[0]
+            self.date_values = np.delete(self.date_values, i)
+            self.date_ids = np.delete(self.date_ids, i)
+            self.date_labels = np.delete(self.date_labels, i)
+        if pd.notna(row['mood']):
+            self.moods[row['mood']] = remove_sorted(self.moods[row['mood']], label)
+
+class CachedBackend(JournalBackend):
+    """
+    Process-wide cache of the loaded journal in front of another backend.
+    
+    Every session shares one parsed DataFrame, reloaded only when the backend's
+    version changes, for example after another process wrote to the journal.
+    Writes made through the cache are applied to the cached DataFrame directly
+    instead of reloading it. Lookups go to the wrapped backend if it has indexes,
+    and are otherwise answered from an EntryIndex of the cached DataFrame, kept up
+    to date by the same writes.
+    
+    Writes are group-committed: changes that sessions make while another write is
+    in progress are queued, and the next thread to get the lock stores the whole
+    queue with one write_batch call, so concurrent saves share one rewrite, fsync
+    or transaction instead of waiting for one each.
+    """
+    
+    def __init__(self, backend):
+        """
+        Wrap a backend.
+        
+        Args:
+            backend (JournalBackend): The backend storing the entries.
+        """
+        self.backend = backend
+        self.entries = None
+        self.entries_version = None
+        # EntryIndex of entries, built on the first lookup
+        self.index = None
+        self.lock = threading.RLock()
+        # Changes waiting for the next group commit, and whether a commit is under
+        # way, guarded by queue_ready
+        self.queue = []
+        self.committing = False
+        self.queue_ready = threading.Condition()
+        # Entries created, and entries updated or deleted, through the cache, and
+        # the backend version those counts are up to date with
+        self.creates = 0
+        self.edits = 0
+        self.counts_version = None
+        self.indexed = backend.indexed
+        self.columnar = backend.columnar
+    
+    def version(self):
+        return self.backend.version()
+    
+    def follows(self, before, after, changes=1):
+        return self.backend.follows(before, after, changes)
+    
+    def change_counts(self):
+        """
+        Count the entries created, and the entries updated or deleted, since opening.
+        
+        A change made some other way, such as by another process, replace or
+        import_entries, cannot be told apart, so it counts as an edit.
+        
+        Returns:
+            tuple: (creates, edits).
+        """
+        version = self.backend.version()
+        with self.lock:
+            if version is None or version != self.counts_version:
+                self.edits += 1
+                self.counts_version = version
+            return self.creates, self.edits
+    
+    def write_lock(self):
+        return self.backend.write_lock()
+    
+    def load(self, columns=None):
+        """
+        Load all journal entries from the cache.
+        
+        When only some columns are wanted from a columnar backend and the cache is
+        out of date, they are loaded from the backend without filling the cache.
+        
+        Args:
+            columns (list, optional): Only load these columns.
+            
+        Returns:
+            pandas.DataFrame: A shallow copy of the shared DataFrame; treat its values
+                as read-only.
+        """
+        version = self.backend.version()
+        with self.lock:
+            fresh = self.entries is not None and version is not None and version == self.entries_version
+            if not fresh:
+                if columns is not None and self.columnar:
+                    return self.backend.load(columns)
+                self.entries = self.backend.load()
+                self.entries_version = version
+            entries = self.entries if columns is None else self.entries[columns]
+            return entries.copy(deep=False)
+    
+    def entry_index(self):
+        """
+        Get the EntryIndex of the cached entries, loading them if they are out of date.
+        
+        Call with self.lock held, and use the index before releasing it.
+        
+        Returns:
+            EntryIndex: The index, or None if lookups should not use it: the wrapped
+                backend has indexes of its own, or it is columnar and nothing is
+                cached, so reading a few columns is cheaper than filling the cache.
+        """
+        if self.indexed:
+            return None
+        version = self.backend.version()
+        if self.entries is None or version is None or version != self.entries_version:
+            if self.columnar:
+                return None
+            self.entries = self.backend.load()
+            self.entries_version = version
+        if self.index is None or self.index.entries is not self.entries:
+            self.index = EntryIndex(self.entries)
+        return self.index
+    
+    def submit(self, op, arg):
+        """
+        Queue a change and wait until it is stored.
+        
+        Args:
+            op (str): "create", "update" or "delete".
+            arg: The entry for a create or update, the entry's ID for a delete.
+            
+        Returns:
+            The result of the change, as returned by the backend's create, update
+            or delete.
+        """
+        return self.write_batch([(op, arg)])[0]
+    
+    def write_batch(self, changes):
+        """
+        Queue several changes and wait until they are stored.
+        
+        While one thread is storing a batch, others queue their changes and wait.
+        When the batch is stored, one of the waiting threads stores everything
+        queued meanwhile as the next batch, and threads whose changes were already
+        stored return their results. The changes of one call are always stored in
+        the same batch.
+        
+        Args:
+            changes (list): (op, arg) pairs, where op is "create", "update" or
+                "delete" and arg is the entry, or the entry's ID for a delete.
+                
+        Returns:
+            list: The result of each change, as returned by the backend's create,
+                update and delete.
+        """
+        changes = [PendingChange(op, arg) for op, arg in changes]
+        batch = None
+        with self.queue_ready:
+            self.queue.extend(changes)
+            while self.committing and not all(change.done for change in changes):
+                self.queue_ready.wait()
+            if not all(change.done for change in changes):
+                self.committing = True
+                batch, self.queue = self.queue, []
+        if batch:
+            try:
+                with self.lock:
+                    self.commit(batch)
+            finally:
+                with self.queue_ready:
+                    self.committing = False
+                    self.queue_ready.notify_all()
+        for change in changes:
+            if change.error is not None:
+                raise change.error
+        return [change.result for change in changes]
+    
+    def commit(self, batch):
+        """
+        Store a batch of queued changes and mirror them in the cached DataFrame.
+        
+        If storing the batch fails, each change is retried on its own, so one bad
+        change only fails its own write.
+        
+        Args:
+            batch (list): PendingChange objects, in the order they were queued.
+        """
+        changes = [(change.op, change.arg) for change in batch]
+        try:
+            with self.backend.write_lock(), metrics.timer("storage.write_batch") as run:
+                before = self.backend.version()
+                results = self.backend.write_batch(changes)
+                after = self.backend.version()
+                run.rows = len(changes)
+                run.nbytes = metrics.text_size(
+                    value for _, arg in changes for value in (arg.values() if isinstance(arg, dict) else [arg])
+                )
+        except Exception as e:
+            self.entries = None
+            if len(batch) > 1:
+                for change in batch:
+                    self.commit([change])
+                return
+            batch[0].error = e
+            batch[0].done = True
+            return
+        
+        stored = [change for change, result in zip(changes, results) if result is not False]
+        if stored and before is not None and before == self.counts_version and self.backend.follows(
+                before, after, len(stored)):
+            creates = sum(op == 'create' for op, _ in stored)
+            self.creates += creates
+            self.edits += len(stored) - creates
+            self.counts_version = after
+        if stored:
+            if (self.entries is not None and before is not None and before == self.entries_version
+                    and self.backend.follows(before, after, len(stored))):
+                if self.index is not None and self.index.entries is self.entries:
+                    for op, arg in stored:
+                        self.index.apply(op, arg)
+                    self.entries = self.index.entries
+                else:
+                    entries = self.entries
+                    for op, arg in stored:
+                        entries, _ = apply_change(entries, op, arg)
+                    self.entries = entries
+                self.entries_version = after
+            else:
+                # Another writer got in between; reload on the next read
+                self.entries = None
+        for change, result in zip(batch, results):
+            change.result = result
+            change.done = True
+    
+    def create(self, entry):
+        return self.submit('create', entry)
+    
+    def update(self, entry):
+        return self.submit('update', entry)
+    
+    def delete(self, entry_id):
+        return self.submit('delete', entry_id)
+    
+    def iter_chunks(self, chunksize):
+        return self.backend.iter_chunks(chunksize)
+    
+    def replace(self, chunks):
+        with self.lock:
+            self.entries = None
+            return self.backend.replace(chunks)
+    
+    def import_entries(self, chunks):
+        with self.lock:
+            self.entries = None
+            return self.backend.import_entries(chunks)
+    
+    def get(self, entry_id):
+        if self.indexed:
+            return self.backend.get(entry_id)
+        with self.lock:
+            index = self.entry_index()
+            if index is not None:
+                return index.get(entry_id)
+        return super().get(entry_id)
+    
+    def query(self, start_date=None, end_date=None, mood=None, columns=None):
+        if self.indexed:
+            return self.backend.query(start_date, end_date, mood, columns)
+        with self.lock:
+            index = self.entry_index()
+            if index is not None:
+                return index.rows(index.select(start_date, end_date, mood), columns)
+        return super().query(start_date, end_date, mood, columns)
+    
+    def search(self, text, mood=None, limit=None, offset=0):
+        if self.indexed:
+            return self.backend.search(text, mood, limit, offset)
+        return super().search(text, mood, limit, offset)
+    
+    def page(self, mood=None, after=None, limit=None):
+        if self.indexed:
+            return self.backend.page(mood, after, limit)
+        with self.lock:
+            index = self.entry_index()
+            if index is not None:
+                return index.rows(index.page(mood, after, limit))
+        return super().page(mood, after, limit)
+    
+    def date_range(self):
+        if self.indexed:
+            return self.backend.date_range()
+        with self.lock:
+            index = self.entry_index()
+            if index is not None:
+                return index.date_range()
+        return super().date_range()
+    
+    def mood_stats(self, start_date=None, end_date=None):
+        if self.indexed:
+            return self.backend.mood_stats(start_date, end_date)
+        return super().mood_stats(start_date, end_date)
+    
+    def mood_rollup(self, period, start_date=None, end_date=None):
+        if self.indexed:
+            return self.backend.mood_rollup(period, start_date, end_date)
+        return super().mood_rollup(period, start_date, end_date)
+
+class YearlyBackend(JournalBackend):
+    """
+    Journal split into one backend per year, each in its own directory.
+    
+    Entries are stored in directory/<year>/ by the year of their date, and undated
+    entries in directory/undated/, each by a backend that open_backend creates for
+    that directory. Reads bounded by dates only open the years they cover, and
+    pages are read from the newest year back until they are full.
+    
+    An edit that moves an entry to another year creates it in the new year before
+    deleting it from the old one, so a crash in between leaves the entry twice
+    rather than losing it.
+    """
+    
+    # Name of the directory holding undated entries
+    UNDATED = "undated"
+    
+    def __init__(self, directory, open_backend):
+        """
+        Open a journal split by year.
+        
+        Args:
+            directory (str): The directory holding one subdirectory per year.
+            open_backend (callable): Takes a year's directory and returns the
+                backend storing that year's entries, typically a CachedBackend.
+        """
+        self.directory = directory
+        self.open_backend = open_backend
+        self.backends = {}
+        self.lock = threading.RLock()
+    
+    def names(self):
+        """Get the names of the stored years, oldest first, with undated last if present."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        years = sorted(name for name in names if name.isdigit())
+        return years + ([self.UNDATED] if self.UNDATED in names else [])
+    
+    def shard(self, name):
+        """Get the backend of one year (or UNDATED), creating its directory if needed."""
+        with self.lock:
+            backend = self.backends.get(name)
+            if backend is None:
+                path = os.path.join(self.directory, name)
+                os.makedirs(path, exist_ok=True)
+                backend = self.backends[name] = self.open_backend(path)
+            return backend
+    
+    def shards(self):
+        """Get the backends of every stored year, oldest first, with undated last."""
+        return [self.shard(name) for name in self.names()]
+    
+    def newest_first(self):
+        """Get the names of the stored years in page order: newest first, undated last."""
+        names = self.names()
+        if names and names[-1] == self.UNDATED:
+            return names[-2::-1] + [self.UNDATED]
+        return names[::-1]
+    
+    @classmethod
+    def shard_name(cls, date):
+        """Get the name of the year a date belongs to, or UNDATED if it has none."""
+        date = pd.to_datetime(date, errors='coerce') if date is not None else None
+        if date is None or pd.isna(date):
+            return cls.UNDATED
+        return format_date(date)[:4]
+    
+    def find(self, entry_id):
+        """Get the backend holding an entry, or None if no year has it."""
+        for name in self.newest_first():
+            backend = self.shard(name)
+            if backend.get(entry_id) is not None:
+                return backend
+        return None
+    
+    def version(self):
+        versions = tuple((name, self.shard(name).version()) for name in self.names())
+        return None if any(version is None for _, version in versions) else versions
+    
+    def change_counts(self):
+        # Each year's counts only grow, and years are never removed, so their sums
+        # change whenever one of them does
+        counts = [self.shard(name).change_counts() for name in self.names()]
+        if any(count is None for count in counts):
+            return None
+        return sum(creates for creates, _ in counts), sum(edits for _, edits in counts)
+    
+    def concat(self, frames, columns=None):
+        """Combine entries of several years, with the column types of compact_entries."""
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return compact_entries(pd.DataFrame(columns=columns or COLUMNS))
+        # Years can have different mood categories, so compact the result again
+        return compact_entries(pd.concat(frames, ignore_index=True))
+    
+    def load(self, columns=None):
+        return self.concat([backend.load(columns) for backend in self.shards()], columns)
+    
+    def create(self, entry):
+        return self.shard(self.shard_name(entry['date'])).create(entry)
+    
+    def update(self, entry):
+        backend = self.find(entry['id'])
+        if backend is None:
+            return False
+        target = self.shard(self.shard_name(entry['date']))
+        if target is backend:
+            return backend.update(entry)
+        target.create(entry)
+        return backend.delete(entry['id'])
+    
+    def delete(self, entry_id):
+        backend = self.find(entry_id)
+        if backend is None:
+            return False
+        return backend.delete(entry_id)
+    
+    def write_batch(self, changes):
+        """
+        Store several changes, in order.
+        
+        Consecutive creates in the same year are stored with one write_batch call
+        to that year's backend. Updates and deletes first look up the year holding
+        the entry, so they are stored one at a time.
+        """
+        results = []
+        run_name, run = None, []
+        for op, arg in changes:
+            name = self.shard_name(arg['date']) if op == 'create' else None
+            if run and name != run_name:
+                results.extend(self.shard(run_name).write_batch(run))
+                run = []
+            if name is None:
+                results.append(getattr(self, op)(arg))
+            else:
+                run_name = name
+                run.append((op, arg))
+        if run:
+            results.extend(self.shard(run_name).write_batch(run))
+        return results
+    
+    def iter_chunks(self, chunksize):
+        for backend in self.shards():
+            yield from backend.iter_chunks(chunksize)
+    
+    def replace(self, chunks):
+        # Each year is replaced as a whole, so the chunks are gathered per year first
+        years = {name: [] for name in self.names()}
+        for chunk in chunks:
+            names = chunk['date'].map(self.shard_name) if len(chunk) else pd.Series(dtype=object)
+            for name, part in chunk.groupby(names.values, sort=False):
+                years.setdefault(name, []).append(part)
+        return sum(self.shard(name).replace(parts) for name, parts in years.items())
+    
+    def import_entries(self, chunks):
+        # The new entries are spilled to one CSV file per year, then each year
+        # imports its file, so every year is rewritten once whatever the order
+        ids = set()
+        for chunk in self.iter_chunks(IMPORT_CHUNKSIZE):
+            ids.update(chunk['id'])
+        spill_dir = tempfile.mkdtemp(prefix=".import-", dir=self.directory)
+        try:
+            spills = {}
+            for chunk in chunks:
+                chunk = chunk[~chunk['id'].map(ids.__contains__).astype(bool)].drop_duplicates('id')
+                ids.update(chunk['id'])
+                if chunk.empty:
+                    continue
+                for name, part in chunk.groupby(chunk['date'].map(self.shard_name).values, sort=False):
+                    path = os.path.join(spill_dir, f"{name}.csv")
+                    storable_entries(part).to_csv(path, mode='a', index=False, header=name not in spills)
+                    spills[name] = path
+            return sum(
+                self.shard(name).import_entries(
+                    compact_entries(chunk) for chunk in pd.read_csv(
+                        path, chunksize=IMPORT_CHUNKSIZE, dtype=CSV_DTYPES, keep_default_na=False,
+                        na_values={'date': [''], 'mood': [''], 'mood_score': ['']}
+                    )
+                )
+                for name, path in spills.items()
+            )
+        finally:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+    
+    def get(self, entry_id):
+        for name in self.newest_first():
+            entry = self.shard(name).get(entry_id)
+            if entry is not None:
+                return entry
+        return None
+    
+    def covering(self, start_date=None, end_date=None, later=0):
+        """
+        Get the names of the stored years holding entries in a date range.
+        
+        Args:
+            start_date (optional): Earliest date of the range.
+            end_date (optional): Latest date of the range.
+            later (int): Also include this many years after the range.
+            
+        Returns:
+            list: The names, oldest first, with undated last if the range is unbounded.
+        """
+        first = None if start_date is None else format_date(start_date)[:4]
+        last = None if end_date is None else str(int(format_date(end_date)[:4]) + later)
+        names = []
+        for name in self.names():
+            if name == self.UNDATED:
+                if first is None and last is None:
+                    names.append(name)
+            elif (first is None or name >= first) and (last is None or name <= last):
+                names.append(name)
+        return names
+    
+    def query(self, start_date=None, end_date=None, mood=None, columns=None):
+        return self.concat([self.shard(name).query(start_date, end_date, mood, columns)
+                            for name in self.covering(start_date, end_date)], columns)
+    
+    def page(self, mood=None, after=None, limit=None):
+        names = self.newest_first()
+        after_year = None
+        if after is not None:
+            # Years newer than the one the previous page ended in were already read
+            after_year = self.shard_name(after[0])
+            names = [name for name in names if name == self.UNDATED
+                     or (after_year != self.UNDATED and name <= after_year)]
+        frames = []
+        found = 0
+        for name in names:
+            if limit is not None and found >= limit:
+                break
+            # Only the year the previous page ended in continues from its cursor
+            page = self.shard(name).page(mood, after if name == after_year else None,
+                                         None if limit is None else limit - found)
+            frames.append(page)
+            found += len(page)
+        return self.concat(frames)
+    
+    def date_range(self):
+        ranges = [self.shard(name).date_range() for name in self.names() if name != self.UNDATED]
+        ranges = [date_range for date_range in ranges if date_range is not None]
+        if not ranges:
+            return None
+        return ranges[0][0], ranges[-1][1]
+    
+    def mood_stats(self, start_date=None, end_date=None):
+        # Each year is summarized on its own, from its rollups if it has them;
+        # undated entries are in no rollup
+        moods = {}
+        score_count = 0
+        score_sum = 0.0
+        for name in self.covering(start_date, end_date):
+            backend = self.shard(name)
+            if backend.indexed and name != self.UNDATED:
+                counts = backend.mood_rollup('day', start_date, end_date)
+            else:
+                counts = backend.query(start_date, end_date, columns=['mood', 'mood_score']).groupby(
+                    'mood', observed=True).agg(entries=('mood', 'size'), score_count=('mood_score', 'count'),
+                                               score_sum=('mood_score', 'sum')).reset_index()
+            for mood, entries, count, total in counts[['mood', 'entries', 'score_count', 'score_sum']].itertuples(
+                    index=False):
+                moods[mood] = moods.get(mood, 0) + entries
+                score_count += count
+                score_sum += total
+        return summarize_moods(moods, score_count, score_sum)
+    
+    def mood_rollup(self, period, start_date=None, end_date=None):
+        # A week starting at the end of one year can hold entries of the next
+        frames = [self.shard(name).mood_rollup(period, start_date, end_date)
+                  for name in self.covering(start_date, end_date, later=1) if name != self.UNDATED]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=['bucket', 'mood', 'entries', 'score_count', 'score_sum'])
+        rollup = pd.concat(frames, ignore_index=True).groupby(['bucket', 'mood'], sort=True).sum()
+        return rollup.reset_index()
+
+def file_version(path):
+    """
+    Get a version stamp for a file.
+    
+    Args:
+        path (str): Path to the file.
+        
+    Returns:
+        tuple: (mtime_ns, size) of the file, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class WriteQueue:
+    """
+    Stores changes in the background, after recording them in a queue file.
+    
+    submit appends the change to queue_file as one fsynced JSON line and returns
+    at once; a background thread then stores every change queued meanwhile with
+    one write_batch call to the backend, so a burst of saves shares one rewrite,
+    fsync or transaction, and records each one as done. Changes still queued when
+    the process stops are stored by the next WriteQueue opened on the same file,
+    so only one process should use a queue file at a time (Streamlit serves
+    every session from one process).
+    """
+    
+    def __init__(self, backend, queue_file):
+        """
+        Open the queue, storing any changes left in it.
+        
+        Args:
+            backend (JournalBackend): The backend to store the changes in.
+            queue_file (str): Path to the queue file.
+        """
+        self.backend = backend
+        self.queue_file = queue_file
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-writes")
+        # Changes queued but not yet stored, by sequence number
+        self.pending = OrderedDict()
+        # Changes not yet taken by the background thread, by sequence number, as
+        # (future, recovered) pairs
+        self.waiting = OrderedDict()
+        
+        records = []
+        if os.path.exists(queue_file):
+            with open(queue_file, 'rb') as f:
+                for line in f.read().splitlines():
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # Skip a record left incomplete by an interrupted append
+                        continue
+        for record in records:
+            if 'done' in record:
+                self.pending.pop(record['done'], None)
+            else:
+                self.pending[record['seq']] = (record['op'], record['arg'])
+        self.next_seq = max((record.get('seq', 0) for record in records), default=0) + 1
+        for seq in self.pending:
+            self.waiting[seq] = (Future(), True)
+        if self.waiting:
+            self.executor.submit(self.store)
+    
+    def append(self, *records):
+        """Append records to the queue file and flush them to disk."""
+        with open(self.queue_file, 'ab') as f:
+            f.write(''.join(json.dumps(record) + '\n' for record in records).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def submit(self, op, arg):
+        """
+        Queue a change to be stored in the background.
+        
+        Args:
+            op (str): "create", "update" or "delete".
+            arg: The entry for a create or update, the entry's ID for a delete.
+            
+        Returns:
+            concurrent.futures.Future: Resolves to True once the change is stored,
+                or False if the entry to update or delete was not found.
+        """
+        future = Future()
+        with self.lock:
+            seq = self.next_seq
+            self.append({'seq': seq, 'op': op, 'arg': arg})
+            self.next_seq += 1
+            self.pending[seq] = (op, arg)
+            self.waiting[seq] = (future, False)
+        self.executor.submit(self.store)
+        return future
+    
+    def store(self):
+        """
+        Store every waiting change with one write_batch call and record them as done.
+        
+        If the batch fails, each change is stored on its own, so one bad change
+        only fails its own future. A change that fails is recorded as done too,
+        rather than retried forever; the error is raised to whoever waits on its
+        future.
+        """
+        with self.lock:
+            batch = [(seq, self.pending[seq], future, recovered)
+                     for seq, (future, recovered) in self.waiting.items()]
+            self.waiting = OrderedDict()
+        if not batch:
+            return
+        outcomes = [None] * len(batch)
+        try:
+            changes = []
+            for i, (seq, (op, arg), future, recovered) in enumerate(batch):
+                if recovered and op == 'create' and self.backend.get(arg['id']) is not None:
+                    # Stored before the process stopped, but not yet recorded as done
+                    outcomes[i] = (True, None)
+                else:
+                    changes.append((i, op, arg))
+            try:
+                results = self.backend.write_batch([(op, arg) for _, op, arg in changes])
+                for (i, _, _), result in zip(changes, results):
+                    outcomes[i] = (result is not False, None)
+            except Exception as e:
+                if len(changes) == 1:
+                    outcomes[changes[0][0]] = (None, e)
+                else:
+                    for i, op, arg in changes:
+                        outcomes[i] = self.store_alone(op, arg)
+        except Exception as e:
+            outcomes = [outcome or (None, e) for outcome in outcomes]
+        finally:
+            with self.lock:
+                for seq, _, _, _ in batch:
+                    self.pending.pop(seq, None)
+                if self.pending:
+                    self.append(*({'done': seq} for seq, _, _, _ in batch))
+                else:
+                    # Nothing left to recover; start the file afresh
+                    open(self.queue_file, 'wb').close()
+            for (_, _, future, _), (result, error) in zip(batch, outcomes):
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+    
+    def store_alone(self, op, arg):
+        """
+        Store one change of a batch that failed, as (result, error).
+        
+        Part of the batch may have been stored before it failed, so a create whose
+        entry is already stored is not stored again.
+        """
+        try:
+            if op == 'create' and self.backend.get(arg['id']) is not None:
+                return True, None
+            return getattr(self.backend, op)(arg) is not False, None
+        except Exception as e:
+            return None, e
+    
+    def pending_changes(self):
+        """
+        Get the changes that are queued but not stored yet.
+        
+        Returns:
+            list: (op, arg) pairs, in the order they will be stored.
+        """
+        with self.lock:
+            return list(self.pending.values())
+    
+    def flush(self):
+        """Wait until every change queued so far is stored."""
+        self.executor.submit(lambda: None).result()
+    
+    def close(self):
+        """Store the remaining changes and stop the background thread."""
+        self.executor.shutdown(wait=True)
+
+class PendingChange:
+    """A change queued in a CachedBackend, with its result once it is stored."""
+    
+    def __init__(self, op, arg):
+        self.op = op
+        self.arg = arg
+        self.done = False
+        self.result = None
+        self.error = None
+
+class FileLock:
+    """
+    Exclusive lock on a file, shared by every thread and process that uses it.
+    
+    Re-entrant within a thread, so a method holding the lock can call another one
+    that takes it too. The lock file itself stays empty and is left in place.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.file = None
+    
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            if self.depth == 0:
+                f = open(self.path, 'a+b')
+                try:
+                    if fcntl is not None:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                    else:
+                        f.seek(0)
+                        while True:
+                            try:
+                                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                                break
+                            except OSError:
+                                # LK_LOCK gives up after about 10 seconds; keep waiting
+                                continue
+                except BaseException:
+                    f.close()
+                    raise
+                self.file = f
+            self.depth += 1
+        except BaseException:
+            self.thread_lock.release()
+            raise
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.depth -= 1
+            if self.depth == 0:
+                f, self.file = self.file, None
+                try:
+                    if fcntl is not None:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                    else:
+                        f.seek(0)
+                        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+                finally:
+                    f.close()
+        finally:
+            self.thread_lock.release()
+        return False
+
+@contextmanager
+def atomic_file(path):
+    """
+    Write a file through a temporary file that replaces it in one step.
+    
+    The temporary file sits next to path, named after the writing process and
+    thread so concurrent writers never share one, and is flushed to disk before
+    the rename, so a crash leaves either the old file or the complete new one.
+    
+    Args:
+        path (str): The file to replace.
+        
+    Yields:
+        str: Path of the temporary file to write.
+    """
+    temp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield temp_file
+        with open(temp_file, 'ab') as f:
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+class ClosingConnection:
+    """
+    Context manager around an sqlite3 connection.
+    
+    Commits when the block succeeds, rolls back when it raises, and always closes
+    the connection (sqlite3's own context manager leaves it open).
+    """
+    
+    def __init__(self, conn):
+        self.conn = conn
+    
+    def __enter__(self):
+        return self.conn
+    
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.conn.close()
+        return False
\ No newline at end of file
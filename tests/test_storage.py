@@ -0,0 +1,233 @@
+"""
+Check that every storage mode stores and reads the journal like the plain CSV backend.
+
+Usage:
+    python -m unittest discover tests
+
+The same creates, updates and deletes are stored through the app's write queue in
+each STORAGE_MODE, flat and split by year, and through a bare CsvBackend, whose
+lookups scan the loaded entries. Every lookup the app makes (loading, getting,
+querying, paging, searching, date ranges, statistics and rollups) must then give
+the same results. A queue file left behind by a stopped process must be stored
+the same way when the journal is opened again.
+"""
+import importlib.util
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import data_manager
+from storage import CsvBackend, format_date
+
+# Storage modes to compare with the CSV baseline, and whether each needs pyarrow
+MODES = {'csv': False, 'log': False, 'sqlite': False, 'arrow': True}
+
+# Words the entry contents are made of, and the searches run over them
+WORDS = ["walk", "rain", "coffee", "work", "family", "friends", "music", "tired", "garden", "deadline"]
+SEARCHES = ["rain", "coffee work", "fam", "deadline tired", "nothing"]
+
+MOODS = ["Joyful", "Peaceful", "Sad", "Anxious", "Neutral"]
+
+# Entries per page when paging through the journal
+PAGE_LIMIT = 7
+
+def make_entry(rng, number):
+    """Make a random entry; every tenth one is undated."""
+    date = None
+    if number % 10 != 3:
+        date = f"{rng.choice([2023, 2024, 2025])}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    return {
+        'id': f"{number:04d}-{rng.randrange(16 ** 8):08x}",
+        'date': date,
+        'title': f"Entry {number}",
+        'content': " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))),
+        'mood': rng.choice(MOODS),
+        'mood_score': round(rng.uniform(-1, 1), 4)
+    }
+
+def make_changes(seed, count=60):
+    """
+    Make a reproducible sequence of changes.
+    
+    Returns:
+        list: (op, arg) pairs creating count entries, then updating and deleting
+            some of them, including updates that move entries to another year and
+            an update and a delete of entries that do not exist.
+    """
+    rng = random.Random(seed)
+    entries = [make_entry(rng, number) for number in range(count)]
+    changes = [('create', entry) for entry in entries]
+    for number, entry in enumerate(rng.sample(entries, count // 4), count):
+        changes.append(('update', dict(make_entry(rng, number), id=entry['id'], title=entry['title'])))
+    for entry in rng.sample(entries, count // 6):
+        changes.append(('delete', entry['id']))
+    changes.append(('update', dict(entries[0], id="missing")))
+    changes.append(('delete', "missing"))
+    return changes
+
+def walk_pages(backend, mood=None):
+    """Get the ids of every entry, page by page, the way the app pages through them."""
+    pages = []
+    after = None
+    while True:
+        page = backend.page(mood, after, PAGE_LIMIT)
+        pages.append(list(page['id']))
+        if len(page) < PAGE_LIMIT:
+            return pages
+        last = page.iloc[-1]
+        after = (format_date(last['date']) if pd.notna(last['date']) else None, last['id'])
+
+def rows(frame):
+    """Turn a DataFrame into sorted tuples, with dates as strings and scores rounded."""
+    records = []
+    for record in frame.to_dict('records'):
+        values = []
+        for value in record.values():
+            if value is None or (not isinstance(value, str) and pd.isna(value)):
+                value = None
+            elif isinstance(value, pd.Timestamp):
+                value = format_date(value)
+            elif isinstance(value, float):
+                value = round(value, 4)
+            values.append(value)
+        records.append(tuple(values))
+    return sorted(records, key=repr)
+
+def stats(summary):
+    """Round the average score of a mood summary, which backends sum in different orders."""
+    summary = dict(summary)
+    if summary['average_score'] is not None:
+        summary['average_score'] = round(summary['average_score'], 9)
+    return summary
+
+def snapshot(backend, ids):
+    """
+    Read the journal in every way the app does.
+    
+    Args:
+        backend (storage.JournalBackend): The backend to read.
+        ids (list): Entry ids to look up one by one.
+    
+    Returns:
+        dict: The results, comparable between backends.
+    """
+    result = {
+        'entries': rows(backend.load()),
+        'get': [backend.get(entry_id) and rows(pd.DataFrame([backend.get(entry_id)])) for entry_id in ids],
+        'pages': walk_pages(backend),
+        'sad pages': walk_pages(backend, "Sad"),
+        'query': rows(backend.query("2024-01-01", "2024-12-31")),
+        'query mood': rows(backend.query(mood="Joyful", columns=['id', 'date'])),
+        'search': {text: sorted(backend.search(text)['id']) for text in SEARCHES},
+        'search mood': sorted(backend.search("work", mood="Anxious")['id']),
+        'date range': backend.date_range(),
+        'stats': stats(backend.mood_stats()),
+        'stats 2024': stats(backend.mood_stats("2024-01-01", "2024-12-31")),
+    }
+    for period in ("day", "week", "month"):
+        result[period] = rows(backend.mood_rollup(period))
+        result[period + " 2025"] = rows(backend.mood_rollup(period, "2025-01-01", "2025-06-30"))
+    return result
+
+class StorageModeTest(unittest.TestCase):
+    """Runs the change sequence in every storage mode and compares it with CsvBackend."""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = {
+            name: getattr(data_manager, name)
+            for name in ('STORAGE_MODE', 'SHARD_DIR', 'SHARD_BY_YEAR', 'COMPACT_THRESHOLD')
+        }
+        self.user = data_manager.get_journal_user()
+    
+    def tearDown(self):
+        data_manager.reset_backends()
+        for name, value in self.settings.items():
+            setattr(data_manager, name, value)
+        data_manager.set_journal_user(self.user)
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def baseline(self, changes):
+        """Store changes in a bare CsvBackend and return it with their results."""
+        backend = CsvBackend(os.path.join(self.directory, "baseline.csv"))
+        results = [getattr(backend, op)(arg) is not False for op, arg in changes]
+        return backend, results
+    
+    def open_journal(self, mode, by_year, user):
+        """Point data_manager at a fresh journal of the given storage mode."""
+        data_manager.reset_backends()
+        data_manager.STORAGE_MODE = mode
+        data_manager.SHARD_DIR = os.path.join(self.directory, "journals")
+        data_manager.SHARD_BY_YEAR = by_year
+        # Fold the log often, so reads see both the snapshot and the log
+        data_manager.COMPACT_THRESHOLD = 10
+        data_manager.set_journal_user(user)
+    
+    def modes(self):
+        """Yield each storage mode that can run here, flat and split by year."""
+        for mode, needs_arrow in MODES.items():
+            if needs_arrow and importlib.util.find_spec("pyarrow") is None:
+                continue
+            for by_year in (False, True):
+                yield mode, by_year
+    
+    def test_modes_match_csv(self):
+        changes = make_changes(seed=1)
+        expected_backend, expected_results = self.baseline(changes)
+        ids = [arg['id'] if op != 'delete' else arg for op, arg in changes[::5]] + ["missing"]
+        expected = snapshot(expected_backend, ids)
+        for mode, by_year in self.modes():
+            with self.subTest(mode=mode, by_year=by_year):
+                self.open_journal(mode, by_year, f"{mode}-{by_year}")
+                queue = data_manager.get_write_queue()
+                futures = [queue.submit(op, arg) for op, arg in changes]
+                self.assertEqual([future.result() for future in futures], expected_results)
+                self.assertEqual(snapshot(data_manager.get_backend(), ids), expected)
+                
+                # Reopened from its files, the journal reads the same
+                data_manager.reset_backends()
+                self.assertEqual(snapshot(data_manager.get_backend(), ids), expected)
+    
+    def test_pending_changes_recovered(self):
+        changes = make_changes(seed=2, count=30)
+        stored, queued = changes[:20], changes[20:]
+        expected_backend, _ = self.baseline(changes)
+        expected = snapshot(expected_backend, [])
+        for mode, by_year in self.modes():
+            with self.subTest(mode=mode, by_year=by_year):
+                self.open_journal(mode, by_year, f"recover-{mode}-{by_year}")
+                queue = data_manager.get_write_queue()
+                for future in [queue.submit(op, arg) for op, arg in stored]:
+                    future.result()
+                # The first queued change was stored before the process stopped, but
+                # not recorded as done
+                queue.submit(*queued[0]).result()
+                data_manager.reset_backends()
+                
+                # Leave the queue file as a process stopped in the middle would: every
+                # queued change recorded, one of them already recorded as done (and
+                # stored), and the last append cut short
+                queue_file = os.path.join(data_manager.journal_directory(), os.path.basename(data_manager.QUEUE_FILE))
+                with open(queue_file, 'w', encoding='utf-8') as f:
+                    for seq, (op, arg) in enumerate(queued, 1):
+                        f.write(json.dumps({'seq': seq, 'op': op, 'arg': arg}) + "\n")
+                    f.write(json.dumps({'done': 2}) + "\n")
+                    f.write('{"seq": 99, "op": "cre')
+                data_manager.get_backend().write_batch([queued[1]])
+                
+                data_manager.reset_backends()
+                data_manager.get_write_queue().flush()
+                self.assertEqual(snapshot(data_manager.get_backend(), []), expected)
+                self.assertEqual(data_manager.get_write_queue().pending_changes(), [])
+                self.assertEqual(os.path.getsize(queue_file), 0)
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
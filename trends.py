@@ -0,0 +1,382 @@
+"""
+Mood trends of a journal: rolling averages, streaks, weekday patterns and mood transitions.
+
+MoodTrends keeps the entry count, score total and mood counts of every day in
+NumPy arrays, and the mood of every entry in date order, so each statistic takes
+a few array operations over the days or entries of a date range. Saving an entry
+adds it to those arrays instead of recomputing them from the whole journal:
+journal_trends only reads the journal when its version changes, and then only
+reads the entries newer than the ones it has, unless entries were edited or
+deleted, the only changes that rebuild the trends.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from storage import MOODS
+
+# Entry columns the trends are computed from
+TREND_COLUMNS = ['id', 'date', 'mood', 'mood_score']
+
+# Windows of the rolling mean mood score, in days
+ROLLING_WINDOWS = (7, 30)
+
+# Names of the days of the week, Monday first
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Number of journals whose trends journal_trends keeps
+TRENDS_CACHE_SIZE = 32
+
+# Trends built by journal_trends, with the journal version and change counts they
+# were built for and the (date, id) of their newest entry, least recently used first
+_trends_cache = OrderedDict()
+_trends_cache_lock = threading.Lock()
+
+def day_numbers(dates):
+    """Convert datetime64 dates to days since 1970-01-01."""
+    return dates.values.astype('datetime64[D]').astype(np.int64)
+
+class MoodTrends:
+    """
+    Per-day totals and the mood sequence of a journal, for trend statistics.
+    
+    Undated entries are left out. add never changes the arrays it was built with
+    in place, so a copy made before add keeps its statistics while the arrays of
+    the original grow.
+    """
+    
+    def __init__(self):
+        self.moods = list(MOODS)
+        # Day number of the first element of the day arrays
+        self.first_day = 0
+        # Entries, entries with a score, score total and entries of each mood, per day
+        self.day_entries = np.zeros(0, dtype=np.int64)
+        self.day_scored = np.zeros(0, dtype=np.int64)
+        self.day_score = np.zeros(0, dtype=np.float64)
+        self.day_moods = np.zeros((0, len(self.moods)), dtype=np.int64)
+        # Day number and mood index (-1 without a mood) of every entry, in date order
+        self.sequence_days = np.zeros(0, dtype=np.int64)
+        self.sequence_moods = np.zeros(0, dtype=np.int64)
+    
+    def __len__(self):
+        return len(self.sequence_days)
+    
+    def copy(self):
+        """Get a copy sharing the arrays, which add replaces rather than changes."""
+        trends = MoodTrends.__new__(MoodTrends)
+        trends.__dict__.update(self.__dict__)
+        trends.moods = list(self.moods)
+        return trends
+    
+    def add(self, entries):
+        """
+        Add entries to the trends.
+        
+        Entries dated before some already added are placed in date order; entries
+        of the same day stay in the order they were added.
+        
+        Args:
+            entries (pandas.DataFrame): Entries with date (datetime64), mood and
+                mood_score columns, in the order they were stored.
+        """
+        entries = entries[entries['date'].notna()]
+        if entries.empty:
+            return
+        days = day_numbers(entries['date'])
+        
+        moods = entries['mood'].astype(object)
+        for mood in pd.unique(moods.dropna()):
+            if mood not in self.moods:
+                self.moods.append(mood)
+        codes = pd.Categorical(moods, categories=self.moods).codes.astype(np.int64)
+        scores = entries['mood_score'].to_numpy(dtype=np.float64, na_value=np.nan)
+        
+        # Widen the day arrays to cover the new days, then add the new totals
+        first = min(days.min(), self.first_day) if len(self) else days.min()
+        last = max(days.max(), self.first_day + len(self.day_entries) - 1) if len(self) else days.max()
+        size = last - first + 1
+        offset = self.first_day - first
+        
+        def widen(array):
+            wide = np.zeros((size,) + array.shape[1:], dtype=array.dtype)
+            wide[offset:offset + len(array)] = array
+            return wide
+        day_entries = widen(self.day_entries)
+        day_scored = widen(self.day_scored)
+        day_score = widen(self.day_score)
+        day_moods = widen(np.pad(self.day_moods, ((0, 0), (0, len(self.moods) - self.day_moods.shape[1]))))
+        
+        index = days - first
+        scored = ~np.isnan(scores)
+        day_entries += np.bincount(index, minlength=size)
+        day_scored += np.bincount(index[scored], minlength=size)
+        day_score += np.bincount(index[scored], weights=scores[scored], minlength=size)
+        has_mood = codes >= 0
+        np.add.at(day_moods, (index[has_mood], codes[has_mood]), 1)
+        
+        sequence_days = np.concatenate([self.sequence_days, days])
+        sequence_moods = np.concatenate([self.sequence_moods, codes])
+        if len(self.sequence_days) and days.min() < self.sequence_days[-1] or np.any(np.diff(days) < 0):
+            order = np.argsort(sequence_days, kind='stable')
+            sequence_days = sequence_days[order]
+            sequence_moods = sequence_moods[order]
+        
+        self.first_day = first
+        self.day_entries, self.day_scored, self.day_score, self.day_moods = day_entries, day_scored, day_score, day_moods
+        self.sequence_days, self.sequence_moods = sequence_days, sequence_moods
+    
+    def day_span(self, start_date=None, end_date=None):
+        """
+        Get the positions in the day arrays of a date range.
+        
+        Returns:
+            tuple: (lo, hi), the slice of the days in the range, which is empty if
+                no added day falls in it.
+        """
+        lo, hi = 0, len(self.day_entries)
+        if start_date is not None:
+            lo = min(max(day_numbers(pd.Series([pd.Timestamp(start_date)]))[0] - self.first_day, 0), hi)
+        if end_date is not None:
+            hi = max(min(day_numbers(pd.Series([pd.Timestamp(end_date)]))[0] - self.first_day + 1, hi), lo)
+        return lo, hi
+    
+    def dates(self, lo, hi):
+        """Get the dates of positions lo to hi of the day arrays."""
+        return pd.to_datetime(np.arange(self.first_day + lo, self.first_day + hi).astype('datetime64[D]'))
+    
+    def daily_scores(self, start_date=None, end_date=None):
+        """
+        Get the mean mood score of every day in a date range.
+        
+        Returns:
+            pandas.Series: The mean score per day, indexed by date, NaN on days
+                without scored entries.
+        """
+        lo, hi = self.day_span(start_date, end_date)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.day_score[lo:hi] / self.day_scored[lo:hi]
+        return pd.Series(means, index=self.dates(lo, hi), name='mood_score')
+    
+    def rolling_mean(self, window, start_date=None, end_date=None):
+        """
+        Get the mean mood score of the entries of the window days ending on each day.
+        
+        Days before the range count towards the windows of its first days.
+        
+        Args:
+            window (int): The number of days per window.
+            start_date (optional): First day to return.
+            end_date (optional): Last day to return.
+        
+        Returns:
+            pandas.Series: The rolling mean per day, indexed by date, NaN where the
+                window has no scored entries.
+        """
+        lo, hi = self.day_span(start_date, end_date)
+        score = np.concatenate([[0.0], np.cumsum(self.day_score[:hi])])
+        scored = np.concatenate([[0], np.cumsum(self.day_scored[:hi])])
+        ends = np.arange(lo, hi) + 1
+        starts = np.maximum(ends - window, 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (score[ends] - score[starts]) / (scored[ends] - scored[starts])
+        return pd.Series(means, index=self.dates(lo, hi), name=f'rolling_{window}')
+    
+    def streaks(self, start_date=None, end_date=None):
+        """
+        Find runs of consecutive days whose mean mood score is positive, or negative.
+        
+        A day without scored entries, or with a mean score of 0, ends a run.
+        
+        Returns:
+            dict: longest_positive and longest_negative, each a (days, first_date,
+                last_date) tuple or None, and current, the (sign, days) of the run
+                holding the last day with entries in the range ("positive",
+                "negative" or None for no run).
+        """
+        lo, hi = self.day_span(start_date, end_date)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            signs = np.sign(np.nan_to_num(self.day_score[lo:hi] / self.day_scored[lo:hi])).astype(np.int64)
+        result = {'longest_positive': None, 'longest_negative': None, 'current': (None, 0)}
+        if not len(signs):
+            return result
+        
+        changes = np.flatnonzero(np.diff(signs)) + 1
+        starts = np.concatenate([[0], changes])
+        ends = np.concatenate([changes, [len(signs)]])
+        lengths = ends - starts
+        run_signs = signs[starts]
+        for key, sign in [('longest_positive', 1), ('longest_negative', -1)]:
+            runs = np.flatnonzero(run_signs == sign)
+            if len(runs):
+                # The first of the longest runs
+                run = runs[np.argmax(lengths[runs])]
+                dates = self.dates(lo + starts[run], lo + ends[run])
+                result[key] = (int(lengths[run]), dates[0], dates[-1])
+        
+        written = np.flatnonzero(self.day_entries[lo:hi])
+        if len(written):
+            run = np.searchsorted(starts, written[-1], side='right') - 1
+            if run_signs[run]:
+                result['current'] = ('positive' if run_signs[run] > 0 else 'negative', int(written[-1] - starts[run] + 1))
+        return result
+    
+    def weekday_profile(self, start_date=None, end_date=None):
+        """
+        Summarize the entries of each day of the week in a date range.
+        
+        Returns:
+            pandas.DataFrame: One row per weekday, Monday first, with the number of
+                entries, the average score (NaN without scores), the most common mood
+                (None without moods) and the number of entries of each mood.
+        """
+        lo, hi = self.day_span(start_date, end_date)
+        # 1970-01-01 was a Thursday
+        weekdays = (np.arange(self.first_day + lo, self.first_day + hi) + 3) % 7
+        entries = np.bincount(weekdays, weights=self.day_entries[lo:hi], minlength=7)
+        scored = np.bincount(weekdays, weights=self.day_scored[lo:hi], minlength=7)
+        score = np.bincount(weekdays, weights=self.day_score[lo:hi], minlength=7)
+        moods = np.zeros((7, len(self.moods)), dtype=np.int64)
+        np.add.at(moods, weekdays, self.day_moods[lo:hi])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            average = score / scored
+        profile = pd.DataFrame(moods, index=WEEKDAYS, columns=self.moods)
+        profile.insert(0, 'most_common_mood', [
+            self.moods[row.argmax()] if row.any() else None for row in moods
+        ])
+        profile.insert(0, 'average_score', average)
+        profile.insert(0, 'entries', entries.astype(np.int64))
+        return profile
+    
+    def transitions(self, start_date=None, end_date=None, normalize=True):
+        """
+        Count how often each mood follows another, between consecutive dated entries.
+        
+        Args:
+            start_date (optional): Only count entries on or after this date.
+            end_date (optional): Only count entries on or before this date.
+            normalize (bool): Divide each row by its total, giving the probability
+                of each next mood after the row's mood.
+        
+        Returns:
+            pandas.DataFrame: Rows are the earlier mood, columns the next one, over
+                the moods present in the range.
+        """
+        lo, hi = 0, len(self.sequence_days)
+        if start_date is not None:
+            lo = np.searchsorted(self.sequence_days, day_numbers(pd.Series([pd.Timestamp(start_date)]))[0])
+        if end_date is not None:
+            hi = np.searchsorted(self.sequence_days, day_numbers(pd.Series([pd.Timestamp(end_date)]))[0],
+                                 side='right')
+        codes = self.sequence_moods[lo:hi]
+        codes = codes[codes >= 0]
+        size = len(self.moods)
+        counts = np.bincount(codes[:-1] * size + codes[1:], minlength=size * size).reshape(size, size)
+        present = np.zeros(size, dtype=bool)
+        present[codes] = True
+        counts = counts[present][:, present]
+        names = [mood for mood, shown in zip(self.moods, present) if shown]
+        matrix = pd.DataFrame(counts, index=names, columns=names)
+        if normalize:
+            totals = matrix.sum(axis=1)
+            matrix = matrix.div(totals.where(totals > 0, 1), axis=0)
+        return matrix
+
+def newest_entry(entries):
+    """Get the (date, id) of the newest dated entry, in page order, or None."""
+    entries = entries[entries['date'].notna()]
+    if entries.empty:
+        return None
+    newest = entries['date'].max()
+    return newest, entries.loc[entries['date'] == newest, 'id'].max()
+
+def entries_after(list_page, cursor):
+    """
+    Read the entries newer than an entry, page by page from the newest.
+    
+    Args:
+        list_page (callable): Takes the cursor of the previous page (None for the
+            first) and returns (entries, next_cursor), like
+            data_manager.list_journal_entries.
+        cursor (tuple): The (date, id) of the newest entry already read.
+    
+    Returns:
+        pandas.DataFrame: The newer entries, oldest first.
+    """
+    date, entry_id = cursor
+    pages = []
+    after = None
+    while True:
+        page, after = list_page(after)
+        newer = ((page['date'] > date) | ((page['date'] == date) & (page['id'] > entry_id))).to_numpy()
+        pages.append(page[newer])
+        if not newer.all() or after is None:
+            break
+    return pd.concat(pages, ignore_index=True).iloc[::-1]
+
+def journal_trends(key, version, load, changes=None, list_page=None):
+    """
+    Get the trends of a journal, updated to its current entries.
+    
+    The trends of each journal are kept between calls, with the journal version
+    they were built for, and returned without reading the journal while the
+    version stays the same. When it changes and the change counts show that
+    entries were only created, the entries newer than the newest one already
+    added are read page by page and added; entries of the same day created
+    between two calls are added in id order. Any other change, including an
+    entry created with an older date, loads every entry and builds the trends
+    again.
+    
+    Args:
+        key: Identifies the journal, for example its user.
+        version: A token that changes whenever the journal changes, such as
+            data_manager.get_journal_version(); None always updates the trends.
+        load (callable): Returns all entries of the journal with TREND_COLUMNS, in
+            storage order. Read the version before calling it, so the entries are
+            at least as new as the version.
+        changes (callable, optional): Returns (creates, edits) counts, such as
+            data_manager.get_journal_changes(), or None if they are unknown.
+            Without it every change loads all entries.
+        list_page (callable, optional): Reads pages of entries, newest first, as
+            entries_after describes.
+    
+    Returns:
+        MoodTrends: The trends; treat them as read-only, since they are shared with
+            later calls.
+    """
+    with _trends_cache_lock:
+        cached = _trends_cache.get(key)
+        if cached is not None:
+            _trends_cache.move_to_end(key)
+    if cached is not None and version is not None and cached[0] == version:
+        return cached[2]
+    
+    with metrics.timer("trends.journal_trends") as run:
+        # Read the counts before the entries, so changes made in between are
+        # counted again on the next call rather than missed
+        counts = changes() if changes is not None else None
+        trends = None
+        if cached is not None and counts is not None and list_page is not None:
+            _, cached_counts, cached_trends, cursor = cached
+            if cached_counts is not None and cursor is not None and counts[1] == cached_counts[1]:
+                entries = entries_after(list_page, cursor)
+                if len(entries) == counts[0] - cached_counts[0]:
+                    trends = cached_trends
+                    if len(entries):
+                        trends = trends.copy()
+                        trends.add(entries)
+                        cursor = max(cursor, newest_entry(entries))
+                    run.rows = len(entries)
+        if trends is None:
+            entries = load()[TREND_COLUMNS]
+            trends = MoodTrends()
+            trends.add(entries)
+            cursor = newest_entry(entries)
+            run.rows = len(entries)
+        with _trends_cache_lock:
+            _trends_cache[key] = (version, counts, trends, cursor)
+            while len(_trends_cache) > TRENDS_CACHE_SIZE:
+                _trends_cache.popitem(last=False)
+    return trends
\ No newline at end of file
@@ -1,70 +1,196 @@
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import threading
+from collections import OrderedDict
 
-def plot_mood_history(entries_df):
+import metrics
+from trends import ROLLING_WINDOWS
+
+# Entry columns read by the charts; they never need the entry content
+CHART_COLUMNS = ['date', 'title', 'mood', 'mood_score']
+
+# Most entries plot_mood_history draws one point each for; beyond that it plots
+# per-day (or per-week, per-month) averages so the figure stays small
+MAX_CHART_POINTS = 2000
+
+# Number of figures kept by cached_figure
+FIGURE_CACHE_SIZE = 32
+
+# Color of each mood in the charts
+MOOD_COLORS = {
+    'Joyful': '#2ca02c',     # Green
+    'Peaceful': '#17becf',   # Cyan
+    'Energetic': '#ff7f0e',  # Orange
+    'Creative': '#9467bd',   # Purple
+    'Neutral': '#7f7f7f',    # Gray
+    'Reflective': '#8c564b', # Brown
+    'Anxious': '#e377c2',    # Pink
+    'Sad': '#1f77b4',        # Blue
+    'Angry': '#d62728',      # Red
+    'Confused': '#bcbd22'    # Yellow
+}
+
+# Figures built by cached_figure, most recently used last
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+def cached_figure(key, build):
+    """
+    Get a figure built for the same data before, or build it.
+    
+    Args:
+        key (tuple): Identifies the figure and its data, for example the chart name,
+            the journal version and the date range. Keys containing None are not
+            cached, since the data they describe cannot be told apart.
+        build (callable): Builds the figure on a miss.
+        
+    Returns:
+        plotly.graph_objects.Figure: The figure; treat it as read-only, since it is
+            shared with later calls.
+    """
+    if any(part is None for part in key):
+        return build()
+    with _figure_cache_lock:
+        figure = _figure_cache.get(key)
+        if figure is not None:
+            _figure_cache.move_to_end(key)
+            return figure
+    figure = build()
+    with _figure_cache_lock:
+        _figure_cache[key] = figure
+        while len(_figure_cache) > FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return figure
+
+def chart_size(fig, args, kwargs):
+    """
+    Measure a chart build for the metrics.
+    
+    Returns:
+        tuple: (rows, nbytes), with the number of entries charted.
+    """
+    entries_df = args[0] if args else kwargs.get('entries_df', kwargs.get('trends'))
+    return len(entries_df), None
+
+def aggregate_mood_history(df, max_points):
+    """
+    Summarize mood scores per day, or per week or month if there are too many days.
+    
+    Args:
+        df (pandas.DataFrame): Entries sorted by date, with datetime dates.
+        max_points (int): The most buckets to return, unless even months exceed it.
+        
+    Returns:
+        pandas.DataFrame: One row per bucket with its first day (date), the mean,
+            min and max mood score, the number of entries and the most common mood.
+    """
+    df = df.dropna(subset=['date'])
+    dates = df['date'].dt.normalize()
+    if dates.nunique() > max_points:
+        dates = dates - pd.to_timedelta(dates.dt.weekday, unit='D')
+        if dates.nunique() > max_points:
+            dates = dates.dt.to_period('M').dt.start_time
+    df = df.assign(bucket=dates.values)
+    
+    summary = df.groupby('bucket')['mood_score'].agg(['mean', 'min', 'max', 'size'])
+    moods = df.dropna(subset=['mood']).groupby(['bucket', 'mood'], observed=True).size()
+    summary['mood'] = moods.unstack(fill_value=0).idxmax(axis=1).reindex(summary.index)
+    return summary.rename(columns={'size': 'entries'}).rename_axis('date').reset_index()
+
+@metrics.instrument("visualization.plot_mood_history", measure=chart_size)
+def plot_mood_history(entries_df, max_points=MAX_CHART_POINTS):
     """
     Generate a line plot showing mood scores over time.
     
+    Up to max_points entries are drawn one point each. Beyond that, the plot shows
+    the average score per day (or week, or month) with a band from the lowest to
+    the highest score, colored by the most common mood. Traces are drawn with
+    WebGL.
+    
     Args:
         entries_df (pandas.DataFrame): DataFrame containing journal entries.
+        max_points (int): The most points to draw.
         
     Returns:
         plotly.graph_objects.Figure: A Plotly figure object with the mood history plot.
     """
-    # Convert date to datetime
-    df = entries_df.copy()
-    df['date'] = pd.to_datetime(df['date'])
-    
-    # Sort by date
-    df = df.sort_values(by='date')
-    
-    # Create the mood history line plot
-    fig = px.line(
-        df,
-        x='date',
-        y='mood_score',
-        markers=True,
-        color_discrete_sequence=['#1f77b4'],
-        hover_data=['title', 'mood']
-    )
+    # Plotly is imported on first use, so the app starts without it
+    import plotly.graph_objects as go
+    
+    # Convert date to datetime, unless it already is, and sort by it
+    df = entries_df[CHART_COLUMNS]
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df = df.assign(date=pd.to_datetime(df['date']))
+    df = df.sort_values(by='date', kind='stable')
     
-    # Add colored points based on mood
-    colors = {
-        'Joyful': '#2ca02c',     # Green
-        'Peaceful': '#17becf',   # Cyan
-        'Energetic': '#ff7f0e',  # Orange
-        'Creative': '#9467bd',   # Purple
-        'Neutral': '#7f7f7f',    # Gray
-        'Reflective': '#8c564b', # Brown
-        'Anxious': '#e377c2',    # Pink
-        'Sad': '#1f77b4',        # Blue
-        'Angry': '#d62728',      # Red
-        'Confused': '#bcbd22'    # Yellow
-    }
-    
-    for mood, color in colors.items():
-        mood_df = df[df['mood'] == mood]
-        if not mood_df.empty:
-            fig.add_trace(
-                go.Scatter(
-                    x=mood_df['date'],
-                    y=mood_df['mood_score'],
-                    mode='markers',
-                    marker=dict(color=color, size=10),
-                    name=mood,
-                    hoverinfo='text',
-                    hovertext=[
-                        f"Date: {date}<br>Title: {title}<br>Mood: {mood}<br>Score: {score:.2f}"
-                        for date, title, mood, score in zip(
-                            mood_df['date'].dt.strftime('%Y-%m-%d'),
-                            mood_df['title'],
-                            mood_df['mood'],
-                            mood_df['mood_score']
-                        )
-                    ]
+    fig = go.Figure()
+    if len(df) <= max_points:
+        # Create the mood history line, then add colored points based on mood
+        fig.add_trace(
+            go.Scattergl(
+                x=df['date'],
+                y=df['mood_score'],
+                mode='lines+markers',
+                line=dict(color='#1f77b4'),
+                customdata=df[['title', 'mood']].astype(object).values,
+                hovertemplate="date=%{x|%Y-%m-%d}<br>mood_score=%{y}<br>"
+                              "title=%{customdata[0]}<br>mood=%{customdata[1]}<extra></extra>",
+                showlegend=False
+            )
+        )
+        for mood, color in MOOD_COLORS.items():
+            mood_df = df[df['mood'] == mood]
+            if not mood_df.empty:
+                fig.add_trace(
+                    go.Scattergl(
+                        x=mood_df['date'],
+                        y=mood_df['mood_score'],
+                        mode='markers',
+                        marker=dict(color=color, size=10),
+                        name=mood,
+                        customdata=mood_df['title'].astype(object).values,
+                        hovertemplate=f"Date: %{{x|%Y-%m-%d}}<br>Title: %{{customdata}}<br>"
+                                      f"Mood: {mood}<br>Score: %{{y:.2f}}<extra></extra>"
+                    )
                 )
+    else:
+        summary = aggregate_mood_history(df, max_points)
+        
+        # Band from the lowest to the highest score, then the average line
+        fig.add_trace(
+            go.Scattergl(
+                x=summary['date'], y=summary['min'], mode='lines',
+                line=dict(width=0), hoverinfo='skip', showlegend=False
+            )
+        )
+        fig.add_trace(
+            go.Scattergl(
+                x=summary['date'], y=summary['max'], mode='lines',
+                line=dict(width=0), fill='tonexty', fillcolor='rgba(31, 119, 180, 0.2)',
+                hoverinfo='skip', name="Score range"
+            )
+        )
+        fig.add_trace(
+            go.Scattergl(
+                x=summary['date'], y=summary['mean'], mode='lines',
+                line=dict(color='#1f77b4'), hoverinfo='skip', showlegend=False
             )
+        )
+        for mood, color in MOOD_COLORS.items():
+            mood_summary = summary[summary['mood'] == mood]
+            if not mood_summary.empty:
+                fig.add_trace(
+                    go.Scattergl(
+                        x=mood_summary['date'],
+                        y=mood_summary['mean'],
+                        mode='markers',
+                        marker=dict(color=color, size=6),
+                        name=mood,
+                        customdata=mood_summary[['entries', 'min', 'max']].values,
+                        hovertemplate=f"From: %{{x|%Y-%m-%d}}<br>Entries: %{{customdata[0]}}<br>"
+                                      f"Most common mood: {mood}<br>Average score: %{{y:.2f}}<br>"
+                                      f"Range: %{{customdata[1]:.2f}} to %{{customdata[2]:.2f}}<extra></extra>"
+                    )
+                )
     
     # Add a horizontal line at score = 0
     fig.add_shape(
@@ -96,6 +222,7 @@ def plot_mood_history(entries_df):
     
     return fig
 
+@metrics.instrument("visualization.plot_mood_distribution", measure=chart_size)
 def plot_mood_distribution(entries_df):
     """
     Generate a pie chart showing the distribution of moods.
@@ -106,26 +233,15 @@ def plot_mood_distribution(entries_df):
     Returns:
         plotly.graph_objects.Figure: A Plotly figure object with the mood distribution plot.
     """
-    # Count the occurrences of each mood
-    mood_counts = entries_df['mood'].value_counts().reset_index()
-    mood_counts.columns = ['mood', 'count']
+    import plotly.express as px
     
-    # Define colors for each mood
-    colors = {
-        'Joyful': '#2ca02c',     # Green
-        'Peaceful': '#17becf',   # Cyan
-        'Energetic': '#ff7f0e',  # Orange
-        'Creative': '#9467bd',   # Purple
-        'Neutral': '#7f7f7f',    # Gray
-        'Reflective': '#8c564b', # Brown
-        'Anxious': '#e377c2',    # Pink
-        'Sad': '#1f77b4',        # Blue
-        'Angry': '#d62728',      # Red
-        'Confused': '#bcbd22'    # Yellow
-    }
+    # Count the occurrences of each mood (a categorical mood column also counts absent moods)
+    mood_counts = entries_df['mood'].value_counts()
+    mood_counts = mood_counts[mood_counts > 0].reset_index()
+    mood_counts.columns = ['mood', 'count']
     
     # Create a list of colors based on the moods in the data
-    mood_colors = [colors.get(mood, '#7f7f7f') for mood in mood_counts['mood']]
+    mood_colors = [MOOD_COLORS.get(mood, '#7f7f7f') for mood in mood_counts['mood']]
     
     # Create the pie chart
     fig = px.pie(
@@ -152,4 +268,132 @@ def plot_mood_distribution(entries_df):
         marker=dict(line=dict(color='#FFFFFF', width=2))
     )
     
+    return fig
+
+@metrics.instrument("visualization.plot_rolling_mood", measure=chart_size)
+def plot_rolling_mood(trends, start_date=None, end_date=None):
+    """
+    Generate a line plot of the daily and rolling average mood scores.
+    
+    Args:
+        trends (trends.MoodTrends): The trends of the journal.
+        start_date (optional): First day to plot.
+        end_date (optional): Last day to plot.
+        
+    Returns:
+        plotly.graph_objects.Figure: A Plotly figure object with the rolling averages plot.
+    """
+    import plotly.graph_objects as go
+    
+    daily = trends.daily_scores(start_date, end_date).dropna()
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scattergl(
+            x=daily.index,
+            y=daily.values,
+            mode='markers',
+            marker=dict(color='lightgray', size=4),
+            name="Daily average",
+            hovertemplate="%{x|%Y-%m-%d}<br>Average score: %{y:.2f}<extra></extra>"
+        )
+    )
+    for window, color in zip(ROLLING_WINDOWS, ['#1f77b4', '#d62728']):
+        rolling = trends.rolling_mean(window, start_date, end_date)
+        fig.add_trace(
+            go.Scattergl(
+                x=rolling.index,
+                y=rolling.values,
+                mode='lines',
+                line=dict(color=color, width=2),
+                name=f"{window}-day average",
+                connectgaps=False,
+                hovertemplate=f"%{{x|%Y-%m-%d}}<br>{window}-day average: %{{y:.2f}}<extra></extra>"
+            )
+        )
+    
+    fig.update_layout(
+        xaxis_title="Date",
+        yaxis_title="Mood Score",
+        hovermode="x unified",
+        height=400,
+        xaxis=dict(tickformat="%Y-%m-%d", tickangle=-45),
+        yaxis=dict(range=[-1.1, 1.1], tickvals=[-1, -0.5, 0, 0.5, 1])
+    )
+    
+    return fig
+
+@metrics.instrument("visualization.plot_weekday_profile", measure=chart_size)
+def plot_weekday_profile(trends, start_date=None, end_date=None):
+    """
+    Generate a bar chart of the average mood score on each day of the week.
+    
+    Bars are colored by the weekday's most common mood.
+    
+    Args:
+        trends (trends.MoodTrends): The trends of the journal.
+        start_date (optional): First day to include.
+        end_date (optional): Last day to include.
+        
+    Returns:
+        plotly.graph_objects.Figure: A Plotly figure object with the weekday profile plot.
+    """
+    import plotly.graph_objects as go
+    
+    profile = trends.weekday_profile(start_date, end_date)
+    moods = profile['most_common_mood'].fillna('-')
+    fig = go.Figure(
+        go.Bar(
+            x=profile.index,
+            y=profile['average_score'],
+            marker=dict(color=[MOOD_COLORS.get(mood, '#7f7f7f') for mood in moods]),
+            customdata=list(zip(profile['entries'], moods)),
+            hovertemplate="%{x}<br>Entries: %{customdata[0]}<br>Average score: %{y:.2f}<br>"
+                          "Most common mood: %{customdata[1]}<extra></extra>"
+        )
+    )
+    
+    fig.update_layout(
+        xaxis_title="Day of the Week",
+        yaxis_title="Average Mood Score",
+        height=400,
+        yaxis=dict(range=[-1.1, 1.1])
+    )
+    
+    return fig
+
+@metrics.instrument("visualization.plot_mood_transitions", measure=chart_size)
+def plot_mood_transitions(trends, start_date=None, end_date=None):
+    """
+    Generate a heatmap of how often each mood follows another.
+    
+    Args:
+        trends (trends.MoodTrends): The trends of the journal.
+        start_date (optional): First day to include.
+        end_date (optional): Last day to include.
+        
+    Returns:
+        plotly.graph_objects.Figure: A Plotly figure object with the mood transitions plot.
+    """
+    import plotly.graph_objects as go
+    
+    matrix = trends.transitions(start_date, end_date)
+    fig = go.Figure(
+        go.Heatmap(
+            z=matrix.values,
+            x=matrix.columns,
+            y=matrix.index,
+            zmin=0,
+            zmax=1,
+            colorscale='Blues',
+            hovertemplate="From %{y} to %{x}: %{z:.0%}<extra></extra>"
+        )
+    )
+    
+    fig.update_layout(
+        xaxis_title="Next Mood",
+        yaxis_title="Mood",
+        height=400,
+        yaxis=dict(autorange='reversed')
+    )
+    
     return fig
\ No newline at end of file